@@ -1,49 +1,421 @@
 #!/usr/bin/env python3
 
-# ruff: noqa: BLE001 Do not catch blind exception
+"""Ingests benchmark result payloads submitted as GitHub issues into the results directory.
 
+A payload is a fenced code block containing the base64 encoded, zlib compressed result JSON, as produced by the
+tester. With no arguments, the single issue body in the ISSUE_BODY environment variable is ingested. Otherwise each
+payload in the given files, directories, or stdin ("-") is ingested in one pass, e.g.:
+
+    process_results_issue.py --report report.jsonl issues/
+"""
+
+from __future__ import annotations
+
+import argparse
 import base64
+import binascii
+import glob
 import json
 import logging
 import os
 import re
+import shutil
 import sys
+import tempfile
 import zlib
+from dataclasses import dataclass
+from typing import IO, TYPE_CHECKING, Any, Self
+
+from xemu_perf_renderer.util.data import XemuVersion
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_RESULTS_DIR = "results"
+
+# Payloads that decompress to more than this many bytes are rejected without being decompressed further. Result files
+# are on the order of tens of kilobytes.
+MAX_PAYLOAD_BYTES = 16 * 1024 * 1024
+
+# Exit status when some payloads were rejected. Any valid payloads in the batch are still written.
+EXIT_REJECTED_PAYLOADS = 2
+
+_FENCE = "```"
+
+# Number of base64 characters decoded at a time, a multiple of 4 so that each chunk decodes independently.
+_DECODE_CHUNK_CHARS = 64 * 1024
+
+_VALID_RENDERERS = {"GL", "VK"}
+_MACHINE_TOKEN_RE = re.compile(r"[0-9A-Za-z_-]+")
+# xemu versions become directory names, so must not be able to escape the results directory.
+_XEMU_VERSION_RE = re.compile(r"[^/\\\x00-\x1f]+")
+
+_REQUIRED_FIELDS: dict[str, type | tuple[type, ...]] = {
+    "xemu_version": str,
+    "machine_token": str,
+    "renderer": str,
+    "iso": str,
+    "xemu_machine_info": str,
+    "machine_info": dict,
+    "results": list,
+}
+_REQUIRED_MACHINE_INFO_FIELDS: dict[str, type | tuple[type, ...]] = {
+    "cpu_manufacturer": str,
+    "os_system": str,
+    "cpu_freq_max": (int, float),
+}
+_TIMING_FIELDS = ("iterations", "total_us", "average_us", "min_us", "max_us")
+
+
+class InvalidPayloadError(ValueError):
+    """Raised when a payload cannot be decoded or does not match the result schema."""
+
+
+@dataclass
+class Outcome:
+    """The result of ingesting one payload."""
+
+    source: str
+    status: str
+    path: str | None = None
+    message: str | None = None
+
+    # Statuses
+    WRITTEN = "written"
+    UNCHANGED = "unchanged"
+    REJECTED = "rejected"
+
+
+def _iter_payload_blocks(lines: Iterable[str]) -> Iterator[Iterator[str]]:
+    """Yields the lines of each fenced code block in the given text, reading it incrementally.
+
+    Each block's lines must be consumed before the next block is requested.
+    """
+    lines = iter(lines)
+    for line in lines:
+        if not line.strip().startswith(_FENCE):
+            continue
+
+        def _block_lines() -> Iterator[str]:
+            for block_line in lines:
+                stripped = block_line.strip()
+                if stripped == _FENCE:
+                    return
+                yield stripped
+
+        block = _block_lines()
+        yield block
+        # Skip anything left unconsumed, e.g., if the block was rejected partway through.
+        for _ in block:
+            pass
+
+
+def _decode_payload(block_lines: Iterable[str], max_bytes: int = MAX_PAYLOAD_BYTES) -> bytes:
+    """Decodes and decompresses the base64 lines of a payload, holding at most `max_bytes` of decompressed data."""
+    decompressor = zlib.decompressobj()
+    output = bytearray()
+
+    def _decompress(data: bytes):
+        while data:
+            output.extend(decompressor.decompress(data, max_bytes + 1 - len(output)))
+            if len(output) > max_bytes:
+                msg = f"Payload decompresses to more than {max_bytes} bytes"
+                raise InvalidPayloadError(msg)
+            data = decompressor.unconsumed_tail
+
+    pending = ""
+    try:
+        for line in block_lines:
+            pending += line
+            if len(pending) < _DECODE_CHUNK_CHARS:
+                continue
+            split = len(pending) - len(pending) % _DECODE_CHUNK_CHARS
+            for start in range(0, split, _DECODE_CHUNK_CHARS):
+                _decompress(base64.b64decode(pending[start : start + _DECODE_CHUNK_CHARS], validate=True))
+            pending = pending[split:]
+        _decompress(base64.b64decode(pending, validate=True))
+        output.extend(decompressor.flush())
+    except (binascii.Error, zlib.error) as err:
+        msg = f"Failed to decode payload: {err}"
+        raise InvalidPayloadError(msg) from err
+
+    if not decompressor.eof:
+        msg = "Payload is truncated"
+        raise InvalidPayloadError(msg)
+    if decompressor.unused_data:
+        msg = "Payload has trailing data"
+        raise InvalidPayloadError(msg)
+    if not output:
+        msg = "Payload is empty"
+        raise InvalidPayloadError(msg)
+    return bytes(output)
+
+
+def _check_fields(obj: dict[str, Any], fields: dict[str, type | tuple[type, ...]], context: str):
+    for name, expected_type in fields.items():
+        value = obj.get(name)
+        # bool is a subclass of int but is never a valid timing or frequency.
+        if not isinstance(value, expected_type) or isinstance(value, bool):
+            msg = f"{context}'{name}' is missing or has the wrong type"
+            raise InvalidPayloadError(msg)
+
+
+def validate_result(result: Any):
+    """Checks that a decoded payload has the fields and types that the renderer relies on."""
+    if not isinstance(result, dict):
+        msg = "Payload is not a JSON object"
+        raise InvalidPayloadError(msg)
 
-def main():
-    body = os.environ.get("ISSUE_BODY", "")
+    _check_fields(result, _REQUIRED_FIELDS, "")
+    _check_fields(result["machine_info"], _REQUIRED_MACHINE_INFO_FIELDS, "machine_info.")
 
-    match = re.search(r"```\n(.*?)\n```", body, re.DOTALL)
-    if not match:
-        sys.exit("No payload block found.")
+    if result["renderer"] not in _VALID_RENDERERS:
+        msg = f"Unsupported renderer '{result['renderer']}'"
+        raise InvalidPayloadError(msg)
+    if not _MACHINE_TOKEN_RE.fullmatch(result["machine_token"]):
+        msg = "Invalid machine_token"
+        raise InvalidPayloadError(msg)
+    xemu_version = result["xemu_version"]
+    if not _XEMU_VERSION_RE.fullmatch(xemu_version) or xemu_version in {".", ".."}:
+        msg = f"Invalid xemu_version '{xemu_version}'"
+        raise InvalidPayloadError(msg)
+    try:
+        XemuVersion.parse(xemu_version)
+    except ValueError as err:
+        raise InvalidPayloadError(str(err)) from err
+
+    tests = result["results"]
+    if not tests:
+        msg = "Payload contains no results"
+        raise InvalidPayloadError(msg)
+    for index, test in enumerate(tests):
+        if not isinstance(test, dict) or not isinstance(test.get("name"), str):
+            msg = f"results[{index}] has no name"
+            raise InvalidPayloadError(msg)
+        for field in _TIMING_FIELDS:
+            value = test.get(field)
+            if not isinstance(value, int) or isinstance(value, bool):
+                msg = f"results[{index}].{field} is missing or is not an integer"
+                raise InvalidPayloadError(msg)
+        raw_results = test.get("raw_results")
+        if raw_results is not None and (
+            not isinstance(raw_results, list)
+            or not all(isinstance(value, int) and not isinstance(value, bool) for value in raw_results)
+        ):
+            msg = f"results[{index}].raw_results is not a list of integers"
+            raise InvalidPayloadError(msg)
+
+
+def result_path(results_dir: str, result: dict[str, Any]) -> str:
+    return os.path.join(results_dir, result["xemu_version"], f"{result['machine_token']}-{result['renderer']}.json")
 
-    b64_payload = match.group(1).strip()
 
+def _is_unchanged(path: str, content: bytes, result: dict[str, Any]) -> bool:
+    """Returns True if the file at the given path already holds the given result."""
     try:
-        compressed_data = base64.b64decode(b64_payload)
-        json_data = zlib.decompress(compressed_data).decode("utf-8")
-        results = json.loads(json_data)
-        json_data = json.dumps(results, indent=2)
-    except Exception as e:
-        sys.exit(f"Failed to decode/decompress/parse: {e}")
+        with open(path, "rb") as infile:
+            existing = infile.read()
+    except FileNotFoundError:
+        return False
+    if existing == content:
+        return True
+
+    # Some files were committed with different formatting (e.g., CRLF line endings) and are not rewritten just for that.
+    try:
+        return json.loads(existing) == result
+    except ValueError:
+        return False
+
+
+class BatchIngester:
+    """Validates a batch of payloads and then moves every new or changed result into the results directory at once.
+
+    Accepted results are staged on disk as they are decoded, so memory use is bounded by the size of a single payload
+    regardless of the size of the batch. If the same result file is submitted more than once, the last submission wins.
+    """
+
+    def __init__(self, results_dir: str, *, max_payload_bytes: int = MAX_PAYLOAD_BYTES):
+        self.results_dir = results_dir
+        self.max_payload_bytes = max_payload_bytes
+        self.outcomes: list[Outcome] = []
+        # Maps the path of each accepted result relative to `results_dir` to its staged file.
+        self._staged: dict[str, str] = {}
+        # The staging directory is a sibling of the results directory so that staged files can be moved into place, and
+        # so that it is never mistaken for results.
+        parent_dir = os.path.dirname(os.path.abspath(results_dir))
+        os.makedirs(parent_dir, exist_ok=True)
+        self._staging_dir = tempfile.mkdtemp(prefix=".ingest-", dir=parent_dir)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_args: object):
+        self.close()
+
+    def close(self):
+        shutil.rmtree(self._staging_dir, ignore_errors=True)
+
+    def add_text(self, lines: Iterable[str], source: str):
+        """Ingests every payload block in the given text, e.g., an issue body."""
+        found = False
+        for block_index, block_lines in enumerate(_iter_payload_blocks(lines)):
+            found = True
+            self._add_block(block_lines, source if not block_index else f"{source}#{block_index}")
+        if not found:
+            self.outcomes.append(Outcome(source, Outcome.REJECTED, message="No payload block found"))
+
+    def _add_block(self, block_lines: Iterable[str], source: str):
+        try:
+            content = _decode_payload(block_lines, self.max_payload_bytes)
+            try:
+                result = json.loads(content)
+            except ValueError as err:
+                msg = f"Failed to parse payload: {err}"
+                raise InvalidPayloadError(msg) from err
+            validate_result(result)
+        except InvalidPayloadError as err:
+            logger.warning("Rejected %s: %s", source, err)
+            self.outcomes.append(Outcome(source, Outcome.REJECTED, message=str(err)))
+            return
+
+        output = json.dumps(result, indent=2).encode()
+        path = result_path(self.results_dir, result)
+        relative_path = os.path.relpath(path, self.results_dir)
+
+        if _is_unchanged(path, output, result):
+            logger.info("%s duplicates %s", source, path)
+            self._staged.pop(relative_path, None)
+            self.outcomes.append(Outcome(source, Outcome.UNCHANGED, path=path))
+            return
+
+        staged_file = self._staged.get(relative_path)
+        if staged_file is None:
+            staged_file = os.path.join(self._staging_dir, str(len(self._staged)))
+            self._staged[relative_path] = staged_file
+        with open(staged_file, "wb") as outfile:
+            outfile.write(output)
+        logger.info("Accepted %s as %s", source, path)
+        self.outcomes.append(Outcome(source, Outcome.WRITTEN, path=path))
+
+    def commit(self) -> list[str]:
+        """Moves the accepted results into the results directory, returning their paths."""
+        written = []
+        for relative_path, staged_file in sorted(self._staged.items()):
+            path = os.path.join(self.results_dir, relative_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.move(staged_file, path)
+            written.append(path)
+        self._staged.clear()
+        return written
+
+
+def _iter_payload_files(paths: Iterable[str]) -> Iterator[str]:
+    for path in paths:
+        if os.path.isdir(path):
+            files = glob.glob("**/*", root_dir=path, recursive=True)
+            yield from (os.path.join(path, file) for file in sorted(files) if os.path.isfile(os.path.join(path, file)))
+        else:
+            yield path
+
+
+def _write_report(outcomes: Iterable[Outcome], report: IO[str]):
+    for outcome in outcomes:
+        entry = {"source": outcome.source, "status": outcome.status}
+        if outcome.path:
+            entry["path"] = outcome.path
+        if outcome.message:
+            entry["message"] = outcome.message
+        report.write(json.dumps(entry) + "\n")
+
+
+def encode_payload(result_file: str, machine_token: str | None = None) -> str:
+    """Returns an issue body carrying the given result JSON file, as the tester submits it.
+
+    If `machine_token` is given, it replaces the token in the result. Most archived results predate the field.
+    """
+    with open(result_file, "rb") as infile:
+        result = json.load(infile)
+    if machine_token is not None:
+        result["machine_token"] = machine_token
+    content = json.dumps(result).encode()
+    encoded = base64.b64encode(zlib.compress(content, 9)).decode("ascii")
+    return f"{_FENCE}\n{encoded}\n{_FENCE}\n"
+
+
+def ingest(sources: Iterable[str], results_dir: str, report_file: str | None = None) -> int:
+    """Ingests the payloads in the given files, directories, or "-" for stdin. Returns the process exit status."""
+    with BatchIngester(results_dir) as ingester:
+        for source in _iter_payload_files(sources):
+            if source == "-":
+                ingester.add_text(sys.stdin, "<stdin>")
+                continue
+            with open(source, encoding="utf-8", errors="replace") as infile:
+                ingester.add_text(infile, source)
+
+        written = ingester.commit()
+        outcomes = ingester.outcomes
+
+    if report_file:
+        with open(report_file, "w", encoding="utf-8") as report:
+            _write_report(outcomes, report)
+
+    rejected = sum(outcome.status == Outcome.REJECTED for outcome in outcomes)
+    logger.info(
+        "Ingested %d payload(s): %d result file(s) written, %d unchanged, %d rejected",
+        len(outcomes),
+        len(written),
+        sum(outcome.status == Outcome.UNCHANGED for outcome in outcomes),
+        rejected,
+    )
+    return EXIT_REJECTED_PAYLOADS if rejected else 0
+
 
-    xemu_version = results["xemu_version"]
-    machine_token = results["machine_token"]
-    renderer = results["renderer"]
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Ingests benchmark result payloads into the results directory.")
+    parser.add_argument(
+        "sources",
+        nargs="*",
+        help="Files or directories of issue bodies containing payloads, or '-' to read from stdin. "
+        "If omitted, the issue body in the ISSUE_BODY environment variable is ingested.",
+    )
+    parser.add_argument("--results-dir", default=DEFAULT_RESULTS_DIR, help="Directory into which results are written")
+    parser.add_argument(
+        "--report",
+        metavar="FILE",
+        help="Write the outcome of each payload to the given file as JSON lines",
+    )
+    parser.add_argument(
+        "--encode",
+        metavar="RESULT_JSON",
+        help="Print an issue body carrying the given result file, e.g., to create fixture payloads, and exit",
+    )
+    parser.add_argument(
+        "--machine-token",
+        help="With --encode, the machine_token to give the result, e.g., for archived results that have none",
+    )
+    args = parser.parse_args()
 
-    logger.info("Received JSON data:\n\n%s", json_data)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
 
-    output_dir = f"results/{xemu_version}"
+    if args.machine_token is not None and not args.encode:
+        parser.error("--machine-token requires --encode")
+    if args.encode:
+        sys.stdout.write(encode_payload(args.encode, args.machine_token))
+        return 0
 
-    os.makedirs(output_dir, exist_ok=True)
-    filename = os.path.join(output_dir, f"{machine_token}-{renderer}.json")
+    if args.sources:
+        return ingest(args.sources, args.results_dir, args.report)
 
-    with open(filename, "w") as f:
-        f.write(json_data)
+    with BatchIngester(args.results_dir) as ingester:
+        ingester.add_text(os.environ.get("ISSUE_BODY", "").splitlines(), "ISSUE_BODY")
+        ingester.commit()
+    for outcome in ingester.outcomes:
+        if outcome.status == Outcome.REJECTED:
+            sys.exit(f"Failed to ingest payload: {outcome.message}")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
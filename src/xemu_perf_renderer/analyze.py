@@ -4,16 +4,38 @@ from __future__ import annotations
 
 # ruff: noqa: T201 `print` found
 import argparse
+import itertools
 import logging
 import os
 import sys
 
 import pandas as pd
 
-from xemu_perf_renderer.util.data import FlatResults, load_results
+from xemu_perf_renderer.util import profiling
+from xemu_perf_renderer.util.bootstrap import (
+    DEFAULT_CONFIDENCE,
+    DEFAULT_NUM_RESAMPLES,
+    RawSamples,
+    bootstrap_version_scores,
+)
+from xemu_perf_renderer.util.changepoints import detect_change_points
+from xemu_perf_renderer.util.data import FlatResults, is_results_source, iter_flattened_results, iter_results
+from xemu_perf_renderer.util.machines import hardware_change_points
+from xemu_perf_renderer.util.result_cache import ResultCache
 
 logger = logging.getLogger(__name__)
 
+# Fields of the flattened results that are used by `rank_versions`.
+_RANKING_FIELDS = ("xemu_version", "machine_id", "suite", "test_name", "average_us_exmax")
+
+
+def build_ranking_frame(results: FlatResults, start_ordinal: int = 0, end_ordinal: int | None = None) -> pd.DataFrame:
+    """Builds the DataFrame consumed by `rank_versions` from the results between the given version ordinals."""
+    query = results.query().ordinals(start_ordinal, end_ordinal)
+    return pd.DataFrame(
+        {field: values.tolist() for field, values in query.select(*_RANKING_FIELDS, "xemu_version_ordinal").items()}
+    )
+
 
 def rank_versions(df: pd.DataFrame) -> pd.Series:
     df["baseline_perf"] = df.groupby(["machine_id", "suite", "test_name"])["average_us_exmax"].transform("mean")
@@ -22,6 +44,112 @@ def rank_versions(df: pd.DataFrame) -> pd.Series:
     return df.groupby("xemu_version")["normalized_perf"].mean().sort_values()
 
 
+def find_change_points(results: FlatResults, start_ordinal: int = 0, end_ordinal: int | None = None) -> pd.DataFrame:
+    """Returns the change points of every (test, machine) series between the given versions, largest change first.
+
+    Change points across which the machine's hardware changed are flagged, as they likely reflect the new hardware
+    rather than xemu.
+    """
+    ordinals = results.column("xemu_version_ordinal")
+    _codes, change_points = detect_change_points(
+        results.column("test_name"),
+        results.column("machine_id_with_renderer"),
+        ordinals,
+        results.column("average_us_exmax"),
+    )
+
+    if end_ordinal is None:
+        end_ordinal = len(results.versions) - 1
+    change_points = [
+        change_point
+        for change_point in change_points
+        if start_ordinal <= ordinals[change_point.before_row] and ordinals[change_point.after_row] <= end_ordinal
+    ]
+
+    versions = results.column("xemu_version")
+    df = pd.DataFrame(
+        {
+            "test_name": [change_point.test_name for change_point in change_points],
+            "machine_id_with_renderer": [change_point.machine_id for change_point in change_points],
+            "from_version": [versions[change_point.before_row] for change_point in change_points],
+            "to_version": [versions[change_point.after_row] for change_point in change_points],
+            "before_us": [change_point.before_mean for change_point in change_points],
+            "after_us": [change_point.after_mean for change_point in change_points],
+            "change": [change_point.change for change_point in change_points],
+            "hardware_changed": hardware_change_points(
+                results.column("environment"),
+                [change_point.before_row for change_point in change_points],
+                [change_point.after_row for change_point in change_points],
+            ),
+        }
+    )
+    return df.reindex(df["change"].abs().sort_values(ascending=False).index).reset_index(drop=True)
+
+
+def find_hardware_changes(results: FlatResults, start_ordinal: int = 0, end_ordinal: int | None = None) -> pd.DataFrame:
+    """Returns the versions at which each machine's hardware changed within the given version range."""
+    if end_ordinal is None:
+        end_ordinal = len(results.versions) - 1
+    changes = [
+        change
+        for change in results.hardware_changes()
+        if start_ordinal <= results.versions.ordinal(change.previous_version)
+        and results.versions.ordinal(change.version) <= end_ordinal
+    ]
+    return pd.DataFrame(
+        {
+            "machine_id_with_renderer": [change.machine_id_with_renderer for change in changes],
+            "from_version": [change.previous_version for change in changes],
+            "to_version": [change.version for change in changes],
+            "changed_fields": [", ".join(change.changed_fields) for change in changes],
+            "gpu_renderer": [change.current.gpu_renderer for change in changes],
+        }
+    )
+
+
+def bootstrap_rankings(
+    results: FlatResults,
+    samples: RawSamples,
+    *,
+    num_resamples: int = DEFAULT_NUM_RESAMPLES,
+    confidence: float = DEFAULT_CONFIDENCE,
+    seed: int = 0,
+    jobs: int = 1,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Calculates confidence intervals on each version's normalized score and on the change between adjacent versions.
+
+    Returns a frame of version scores sorted as `rank_versions` and a frame of the deltas between each version and the
+    one preceding it. Deltas whose interval excludes zero are flagged as significant.
+    """
+    bootstrap = bootstrap_version_scores(samples, num_resamples, seed=seed, jobs=jobs)
+
+    low, high = bootstrap.score_intervals(confidence)
+    scores = pd.DataFrame(
+        {
+            "normalized_perf": bootstrap.scores,
+            "ci_low": low,
+            "ci_high": high,
+            "num_results": bootstrap.num_results,
+        },
+        index=pd.Index(bootstrap.versions, name="xemu_version"),
+    ).sort_values("normalized_perf")
+
+    ordered_versions = sorted(bootstrap.versions, key=results.versions.ordinal)
+    pairs = list(itertools.pairwise(ordered_versions))
+    delta, low, high = bootstrap.delta_intervals(pairs, confidence)
+    deltas = pd.DataFrame(
+        {
+            "from_version": [a for a, _b in pairs],
+            "to_version": [b for _a, b in pairs],
+            "delta": delta,
+            "ci_low": low,
+            "ci_high": high,
+            "significant": (low > 0) | (high < 0),
+        }
+    )
+    return scores, deltas
+
+
 def entrypoint():
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -33,28 +161,144 @@ def entrypoint():
     parser.add_argument(
         "results",
         nargs="+",
-        help="Path to the root of the results to process.",
+        help="Path to the root of the results to process, or to a pack file written by util/pack_results.py.",
+    )
+    parser.add_argument(
+        "--cache",
+        metavar="cache_file",
+        help="Path to a file used to cache parsed results between runs so only new or modified results are loaded.",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of worker processes used to load results and resample them. 0 uses one process per CPU.",
     )
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="Hold results in a compact columnar store rather than one dict per row to reduce memory use.",
+    )
+    parser.add_argument(
+        "--start-version",
+        metavar="version",
+        help="Only consider results from this xemu version (full version string or short name, e.g. 0.8.92) onward.",
+    )
+    parser.add_argument(
+        "--end-version",
+        metavar="version",
+        help="Only consider results up to and including this xemu version.",
+    )
+    parser.add_argument(
+        "--change-points",
+        action="store_true",
+        help="List the versions at which the performance of each test on each machine shifted.",
+    )
+    parser.add_argument(
+        "--hardware-changes",
+        action="store_true",
+        help="List the versions at which the hardware of each machine changed between runs.",
+    )
+    parser.add_argument(
+        "--bootstrap",
+        action="store_true",
+        help="Resample the raw iterations of each result to calculate confidence intervals on each version's score and "
+        "on the change between adjacent versions.",
+    )
+    parser.add_argument(
+        "--resamples",
+        type=int,
+        default=DEFAULT_NUM_RESAMPLES,
+        help="Number of bootstrap resamples.",
+    )
+    parser.add_argument(
+        "--confidence",
+        type=float,
+        default=DEFAULT_CONFIDENCE,
+        help="Confidence level of bootstrap intervals.",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed used to draw bootstrap resamples.",
+    )
+    profiling.add_arguments(parser)
 
     args = parser.parse_args()
 
     log_level = logging.DEBUG if args.verbose else logging.INFO
     logging.basicConfig(level=log_level)
 
+    with profiling.profile_from_args(args):
+        return _analyze(args)
+
+
+def _analyze(args: argparse.Namespace) -> int:
     result_paths = [os.path.abspath(os.path.expanduser(p)) for p in args.results]
     for path in result_paths:
-        if not os.path.isdir(path):
-            logger.error("Results directory '%s' does not exist", path)
+        if not is_results_source(path):
+            logger.error("Results directory or pack file '%s' does not exist", path)
             return 1
 
-    results = FlatResults(load_results(result_paths))
+    jobs = args.jobs or os.cpu_count() or 1
+    cache = ResultCache(os.path.abspath(os.path.expanduser(args.cache))) if args.cache else None
+    results = FlatResults(
+        flattened_results=iter_flattened_results(result_paths, cache=cache, jobs=jobs),
+        columnar=args.columnar,
+    )
 
     try:
-        performance_df = pd.DataFrame(results.flattened_results)
+        start_ordinal, end_ordinal = results.versions.ordinal_range(args.start_version, args.end_version)
+    except ValueError:
+        logger.exception("Invalid version range")
+        return 1
 
-        version_ranking = rank_versions(performance_df.copy())
+    try:
+        with profiling.stage("build_ranking_frame"):
+            performance_df = build_ranking_frame(results, start_ordinal, end_ordinal)
+        profiling.count("build_ranking_frame", rows=len(performance_df))
+
+        with profiling.stage("rank_versions"):
+            version_ranking = rank_versions(performance_df.copy())
         print(version_ranking)
 
+        if args.change_points:
+            with profiling.stage("change_points"):
+                change_points = find_change_points(results, start_ordinal, end_ordinal)
+            with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", None):
+                print(f"\n{len(change_points)} change points")
+                print(change_points)
+
+        if args.hardware_changes:
+            hardware_changes = find_hardware_changes(results, start_ordinal, end_ordinal)
+            with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", None):
+                print(f"\n{len(hardware_changes)} hardware changes")
+                print(hardware_changes)
+
+        if args.bootstrap:
+            # Raw iterations are not retained by the flattened results, so they are read again.
+            versions = set(results.versions.sorted()[start_ordinal : end_ordinal + 1])
+            with profiling.stage("load_raw_samples"):
+                samples = RawSamples.from_results(iter_results(result_paths), versions)
+            profiling.count("load_raw_samples", rows=len(samples))
+
+            with profiling.stage("bootstrap"):
+                scores, deltas = bootstrap_rankings(
+                    results,
+                    samples,
+                    num_resamples=args.resamples,
+                    confidence=args.confidence,
+                    seed=args.seed,
+                    jobs=jobs,
+                )
+            with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", None):
+                print(f"\nNormalized score by version ({args.confidence:.0%} confidence intervals)")
+                print(scores)
+                print("\nChange between adjacent versions")
+                print(deltas)
+
     except FileNotFoundError:
         print("Error: The 'perf_data' directory was not found. Please create it and add your JSON files.")
 
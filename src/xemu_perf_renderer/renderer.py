@@ -1,34 +1,56 @@
 #!/usr/bin/env python3
 
-# ruff: noqa: PLR2004 Magic value used in comparison
-
 from __future__ import annotations
 
 import argparse
-import gzip
+import hashlib
 import importlib.resources as pkg_resources
-import json
 import logging
 import os
+import re
 import sys
-from collections import defaultdict
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 from jinja2 import Environment, FileSystemLoader
 
-from xemu_perf_renderer.util.data import FlatResults, load_results
+from xemu_perf_renderer.util import profiling
+from xemu_perf_renderer.util.assets import bundle_modules, minify_css, minify_js
+from xemu_perf_renderer.util.changepoints import detect_change_points
+from xemu_perf_renderer.util.compact_format import encode_compact
+from xemu_perf_renderer.util.data import FlatResults, is_results_source, iter_flattened_results
+from xemu_perf_renderer.util.result_cache import ResultCache
+from xemu_perf_renderer.util.search_index import compute_search_index
+from xemu_perf_renderer.util.site_writer import SiteWriter
+from xemu_perf_renderer.util.summary import compute_summary_aggregates
 from xemu_perf_renderer.util.test_suite_descriptor_loader import TestSuiteDescriptor, TestSuiteDescriptorLoader
+from xemu_perf_renderer.util.trends import classify_trends
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+
+    from xemu_perf_renderer.util.compact_format import ColumnSource
+    from xemu_perf_renderer.util.query import ResultQuery
 
 logger = logging.getLogger(__name__)
 
-_TREND_MIN_CHANGE_PERCENTAGE = 0.08
+# Formats in which the results data file may be emitted.
+DATA_FORMAT_COMPACT = "compact"
+DATA_FORMAT_LEGACY = "legacy"
+
+# Static JavaScript modules that are bundled with the rendered script.js as-is.
+_STATIC_JS_MODULES = ("app.js", "data.js", "search_index.js", "xemu_version.js")
 
-# Keep in sync with script
-_NO_TREND = "N"
-_STABLE_TREND = "S"
-_IMPROVING_TREND = "I"
-_WORSENING_TREND = "W"
+# Ways in which the results data may be split into separately fetched files.
+SHARD_BY_NONE = "none"
+SHARD_BY_SUITE = "suite"
+SHARD_BY_SUITE_AND_RENDERER = "suite-renderer"
+
+# Keep in sync with data.js
+MANIFEST_FORMAT_NAME = "xemu-perf-manifest"
+MANIFEST_FORMAT_VERSION = 1
 
 
 def _flatten_test_suite_descriptor(
@@ -45,56 +67,161 @@ def _flatten_test_suite_descriptor(
     return ret
 
 
-class FlatResultsRenderer(FlatResults):
-    def __init__(self, flat_results: list[dict[str, Any]]):
-        super().__init__(flat_results)
-        self.analyze()
+def _json_indent(data_format: str) -> int | None:
+    """The legacy data format is emitted indented, as it always has been."""
+    return 2 if data_format == DATA_FORMAT_LEGACY else None
 
-    def _calculate_slope(self, points: list[tuple[int, float]]) -> float:
-        """Calculates the slope of the line of best fit for a set of points."""
-        n = len(points)
-        if n < 2:
-            return 0.0
 
-        sum_x = sum(p[0] for p in points)
-        sum_y = sum(p[1] for p in points)
-        sum_xy = sum(p[0] * p[1] for p in points)
-        sum_x_squared = sum(p[0] ** 2 for p in points)
+def _shard_file_names(shard_keys: Iterable[tuple[str, str | None]]) -> dict[tuple[str, str | None], str]:
+    """Returns the base file name of each (suite, renderer) shard.
 
-        numerator = n * sum_xy - sum_x * sum_y
-        denominator = n * sum_x_squared - sum_x**2
+    Names depend only on the shard's own key, so shards keep their names (and cached copies) as other suites are added.
+    A short hash of the suite name distinguishes suites whose sanitized names would otherwise collide.
+    """
+    shard_keys = list(shard_keys)
+    sanitized = {suite: re.sub(r"[^A-Za-z0-9]+", "_", suite).strip("_") for suite, _renderer in shard_keys}
+    counts = Counter(sanitized.values())
 
-        return numerator / denominator if denominator != 0 else 0.0
+    ret = {}
+    for suite, renderer in shard_keys:
+        name = sanitized[suite]
+        name_parts = ["results", name]
+        if not name or counts[name] > 1:
+            name_parts.append(hashlib.sha256(suite.encode()).hexdigest()[:8])
+        if renderer:
+            name_parts.append(renderer)
+        ret[(suite, renderer)] = "-".join(part for part in name_parts if part)
+    return ret
 
-    def analyze(self):
-        grouped_by_test_and_machine = defaultdict(list)
-        for entry in self.flattened_results:
-            key = (entry["test_name"], entry["machine_id_with_renderer"])
-            grouped_by_test_and_machine[key].append(entry)
 
-        for data_points in grouped_by_test_and_machine.values():
-            if len(data_points) < 3:
-                continue
+class _ColumnSnapshot:
+    """Caches the columns of a `FlatResults` so that subsets may be encoded repeatedly without rebuilding them."""
+
+    def __init__(self, results: FlatResults):
+        self._results = results
+        self._columns: dict[str, Sequence[Any]] = {}
+        self.friendly_names = results.friendly_names
 
-            data_points.sort(key=lambda entry: entry["xemu_version"])
-            regression_points = [(idx, entry["average_us_exmax"]) for idx, entry in enumerate(data_points)]
-            slope = self._calculate_slope(regression_points)
+    def column(self, name: str) -> Sequence[Any]:
+        values = self._columns.get(name)
+        if values is None:
+            values = self._results.column(name)
+            self._columns[name] = values
+        return values
 
-            average_y = sum(p[1] for p in regression_points) / len(regression_points)
-            threshold = average_y * _TREND_MIN_CHANGE_PERCENTAGE
 
-            trend = _STABLE_TREND
-            if slope > threshold:
-                trend = _WORSENING_TREND
-            elif slope < -threshold:
-                trend = _IMPROVING_TREND
+class FlatResultsRenderer(FlatResults):
+    def __init__(
+        self,
+        flat_results: Iterable[dict[str, Any]] = (),
+        *,
+        flattened_results: Iterable[dict[str, Any]] | None = None,
+        columnar: bool = False,
+    ):
+        """See `FlatResults`."""
+        super().__init__(flat_results, flattened_results=flattened_results, columnar=columnar)
+        self.analyze()
 
-            for entry in data_points:
-                entry["trend"] = trend
+    def analyze(self):
+        with profiling.stage("analyze"):
+            test_names = self.column("test_name")
+            machine_ids = self.column("machine_id_with_renderer")
+            average_us_exmax = self.column("average_us_exmax")
+
+            trends = classify_trends(
+                test_names, machine_ids, self.column("xemu_version_ordinal"), average_us_exmax
+            ).tolist()
+
+            self.set_column("trend", trends)
+
+        with profiling.stage("change_points"):
+            change_points, _ = detect_change_points(
+                test_names, machine_ids, self.column("xemu_version_ordinal"), average_us_exmax
+            )
+            self.set_column("change_point", change_points.tolist())
+
+        profiling.count("analyze", rows=len(trends))
+
+    def _legacy_row(self, row: dict[str, Any]) -> dict[str, Any]:
+        """Returns a copy of the given row with the fields of its machine environment in place of the environment."""
+        ret = {}
+        for key, value in row.items():
+            if key == "environment":
+                ret.update(value.to_dict())
+            else:
+                ret[key] = value
+        ret["xemu_version_obj"] = self.versions.version_object(row["xemu_version"])
+        return ret
+
+    def _encode_results_data(
+        self, data_format: str, indices: list[int] | None = None, columns: ColumnSource | None = None
+    ) -> dict[str, Any]:
+        if data_format == DATA_FORMAT_COMPACT:
+            with profiling.stage("encode_results"):
+                data = encode_compact(columns or self, indices)
+            profiling.count("encode_results", rows=len(self.flattened_results) if indices is None else len(indices))
+            return data
+
+        if data_format == DATA_FORMAT_LEGACY:
+            rows = self.flattened_results
+            return {
+                # Rows are generated as they are written so that a copy of every row is never held at once.
+                "results": (
+                    self._legacy_row(row) for row in (rows if indices is None else (rows[index] for index in indices))
+                ),
+                "tags": self.friendly_names,
+            }
+
+        msg = f"Unsupported data format '{data_format}'"
+        raise ValueError(msg)
+
+    def _write_sharded_results(self, writer: SiteWriter, data_format: str, shard_by: str) -> str:
+        """Writes one results data file per shard along with a manifest describing them, returning the manifest name."""
+        columns = _ColumnSnapshot(self)
+
+        shards: dict[tuple[str, str | None], ResultQuery] = {}
+        for suite, suite_query in self.query().group_by("suite").items():
+            if shard_by == SHARD_BY_SUITE_AND_RENDERER:
+                for renderer, shard_query in suite_query.group_by("renderer").items():
+                    shards[(suite, renderer)] = shard_query
+            else:
+                shards[(suite, None)] = suite_query
+
+        shard_names = _shard_file_names(shards)
+        shard_descriptors = []
+        for suite, renderer in sorted(shards, key=lambda key: (key[0], key[1] or "")):
+            shard_query = shards[(suite, renderer)]
+            indices = shard_query.rows.tolist()
+
+            shard_descriptors.append(
+                {
+                    "file": writer.write_json(
+                        shard_names[(suite, renderer)],
+                        self._encode_results_data(data_format, indices, columns),
+                        indent=_json_indent(data_format),
+                    ),
+                    "suite": suite,
+                    "renderer": renderer,
+                    "row_count": len(indices),
+                    "test_names": sorted(set(shard_query.column("test_name"))),
+                }
+            )
+
+        versions: dict[str, dict[str, Any]] = {}
+        for version, version_obj in zip(
+            columns.column("xemu_version"), columns.column("xemu_version_obj"), strict=True
+        ):
+            versions.setdefault(version, version_obj)
+
+        manifest = {
+            "format": MANIFEST_FORMAT_NAME,
+            "format_version": MANIFEST_FORMAT_VERSION,
+            "tags": self.friendly_names,
+            "versions": list(versions.values()),
+            "shards": shard_descriptors,
+        }
 
-        for entry in self.flattened_results:
-            if "trend" not in entry:
-                entry["trend"] = _NO_TREND
+        return writer.write_json("results_manifest", manifest)
 
     def render(
         self,
@@ -104,70 +231,103 @@ class FlatResultsRenderer(FlatResults):
         local_site_mode: bool = False,
         test_suite_descriptors: dict[str, Any] | None = None,
         source_repo_url_prefix: str | None = None,
+        data_format: str = DATA_FORMAT_COMPACT,
+        shard_by: str = SHARD_BY_SUITE,
+        incremental: bool = False,
+        minify: bool = True,
     ):
+        """Renders the report into the given directory.
+
+        If `incremental` is True, files whose content has not changed since the last incremental render into the same
+        directory are left untouched and data files are given content-hashed names. See `SiteWriter`.
+
+        The JavaScript modules are bundled into a single script and, with the stylesheet, minified unless `minify` is
+        False and written under content-hashed names. See `_write_assets`.
+        """
         env = _get_jinja2_env()
 
         if test_suite_descriptors is None:
             test_suite_descriptors = {}
 
-        os.makedirs(output_dir, exist_ok=True)
-
-        results_data = {
-            "results": self.flattened_results,
-            "tags": self.friendly_names,
-        }
+        writer = SiteWriter(output_dir, local_site_mode=local_site_mode, incremental=incremental)
 
-        if local_site_mode:
-            results_filename = "results.json"
-            results_path = os.path.join(output_dir, results_filename)
-            with open(results_path, "w", encoding="utf-8") as outfile:
-                json.dump(results_data, outfile, indent=2)
+        if shard_by == SHARD_BY_NONE:
+            results_filename = writer.write_json(
+                "results",
+                self._encode_results_data(data_format),
+                indent=_json_indent(data_format),
+            )
         else:
-            results_filename = "results.json.gz"
-            results_path = os.path.join(output_dir, results_filename)
-            with gzip.open(results_path, "wt", encoding="utf-8") as outfile:
-                json.dump(results_data, outfile, indent=2)
+            results_filename = self._write_sharded_results(writer, data_format, shard_by)
+
+        with profiling.stage("summary_aggregates"):
+            summary = compute_summary_aggregates(self)
+        summary_filename = writer.write_json("summary", summary)
+
+        with profiling.stage("search_index"):
+            search_index = compute_search_index(self)
+        search_index_filename = writer.write_json("search_index", search_index)
 
         template_context = {
             "title": "xemu perf tester results",
             "results_filename": results_filename,
+            "summary_filename": summary_filename,
+            "search_index_filename": search_index_filename,
             "test_suite_descriptors": {
                 key: _flatten_test_suite_descriptor(value, source_repo_url_prefix)
                 for key, value in test_suite_descriptors.items()
             },
         }
 
-        template = env.get_template("report_template.html.jinja2")
-        html_output = template.render(template_context)
-        with open(os.path.join(output_dir, html_file_name), "w", encoding="utf-8") as f:
-            f.write(html_output)
+        with profiling.stage("render_templates"):
+            stylesheet = env.get_template("style.css.jinja2").render(template_context)
+            script = env.get_template("script.js.jinja2").render(template_context)
 
-        css_template = env.get_template("style.css.jinja2")
-        with open(os.path.join(output_dir, "style.css"), "w", encoding="utf-8") as f:
-            f.write(css_template.render(template_context))
+        stylesheet_filename, script_filename = _write_assets(writer, stylesheet, script, minify=minify)
+        template_context["stylesheet_filename"] = stylesheet_filename
+        template_context["script_filename"] = script_filename
 
-        for js_template_file in ("script",):
-            js_template = env.get_template(f"{js_template_file}.js.jinja2")
-            with open(os.path.join(output_dir, f"{js_template_file}.js"), "w", encoding="utf-8") as f:
-                f.write(js_template.render(template_context))
+        with profiling.stage("render_templates"):
+            template = env.get_template("report_template.html.jinja2")
+            writer.write_text(html_file_name, template.render(template_context))
 
-        # TODO: Just copy the files directly instead of nop rendering.
-        for js_file in ("app", "data", "xemu_version"):
-            js_template = env.get_template(f"{js_file}.js")
-            with open(os.path.join(output_dir, f"{js_file}.js"), "w", encoding="utf-8") as f:
-                f.write(js_template.render({}))
+        writer.finish()
 
         logger.debug("Generated HTML report into '%s'", output_dir)
 
 
-def _get_jinja2_env() -> Environment:
+def _get_template_dir() -> str:
     try:
         template_dir_path = pkg_resources.files("xemu_perf_renderer") / "templates"
     except ModuleNotFoundError:
         script_dir = Path(__file__).parent
         template_dir_path = script_dir / "templates"
+    return str(template_dir_path)
+
+
+def _get_jinja2_env() -> Environment:
+    return Environment(loader=FileSystemLoader(_get_template_dir()), autoescape=True)
+
 
-    return Environment(loader=FileSystemLoader(str(template_dir_path)), autoescape=True)
+def _write_assets(writer: SiteWriter, stylesheet: str, script: str, *, minify: bool) -> tuple[str, str]:
+    """Writes the rendered stylesheet and script.js, with the static modules that it imports, as site assets.
+
+    The static modules are read directly from the templates directory and bundled with the script into a single file
+    so that the page fetches one script rather than a chain of imports. Returns the names of the stylesheet and script.
+    """
+    template_dir = _get_template_dir()
+    with profiling.stage("build_assets"):
+        modules = {"script.js": script}
+        for module in _STATIC_JS_MODULES:
+            with open(os.path.join(template_dir, module), encoding="utf-8") as infile:
+                modules[module] = infile.read()
+        bundle = bundle_modules(modules, "script.js")
+
+        if minify:
+            stylesheet = minify_css(stylesheet)
+            bundle = minify_js(bundle)
+
+        return writer.write_asset("style", "css", stylesheet), writer.write_asset("app", "js", bundle)
 
 
 def entrypoint():
@@ -183,7 +343,7 @@ def entrypoint():
     parser.add_argument(
         "results",
         nargs="+",
-        help="Path to the root of the results to process.",
+        help="Path to the root of the results to process, or to a pack file written by util/pack_results.py.",
     )
     parser.add_argument(
         "--local_site_mode",
@@ -196,30 +356,105 @@ def entrypoint():
         default="https://raw.githubusercontent.com/abaire/xemu-perf-tests/pages_doxygen/xml/tests_registry.json",
         help="URL at which the JSON test suite registry describing tests may be publicly accessed.",
     )
+    parser.add_argument(
+        "--test-descriptor-cache",
+        metavar="cache_file",
+        help="Path to a file used to cache the test suite registry. The registry is only downloaded again if it has "
+        "changed, and the cached copy is used if it cannot be fetched.",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Do not fetch the test suite registry, using the copy in --test-descriptor-cache if there is one.",
+    )
     parser.add_argument(
         "--test-source-url-prefix",
         default="https://github.com/abaire/xemu-perf-tests/blob/main",
         help="URL at which the test suite source files may be accessed.",
     )
+    parser.add_argument(
+        "--cache",
+        metavar="cache_file",
+        help="Path to a file used to cache parsed results between runs so only new or modified results are loaded.",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of worker processes used to load results. 0 uses one process per CPU.",
+    )
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="Hold results in a compact columnar store rather than one dict per row to reduce memory use.",
+    )
+    parser.add_argument(
+        "--data-format",
+        choices=(DATA_FORMAT_COMPACT, DATA_FORMAT_LEGACY),
+        default=DATA_FORMAT_COMPACT,
+        help="Encoding of the results data file. 'legacy' emits one JSON object per result row.",
+    )
+    parser.add_argument(
+        "--shard-by",
+        choices=(SHARD_BY_NONE, SHARD_BY_SUITE, SHARD_BY_SUITE_AND_RENDERER),
+        default=SHARD_BY_SUITE,
+        help="Split the results data into files that the report fetches only when they are needed.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only rewrite output files whose content has changed since the last incremental build and give data "
+        "files content-hashed names.",
+    )
+    parser.add_argument(
+        "--no-minify",
+        action="store_true",
+        help="Write the bundled JavaScript and the stylesheet without minifying them, e.g., for debugging.",
+    )
+    profiling.add_arguments(parser)
 
     args = parser.parse_args()
 
     log_level = logging.DEBUG if args.verbose else logging.INFO
     logging.basicConfig(level=log_level)
 
+    with profiling.profile_from_args(args):
+        return _render(args)
+
+
+def _render(args: argparse.Namespace) -> int:
     result_paths = [os.path.abspath(os.path.expanduser(p)) for p in args.results]
     for path in result_paths:
-        if not os.path.isdir(path):
-            logger.error("Results directory '%s' does not exist", path)
+        if not is_results_source(path):
+            logger.error("Results directory or pack file '%s' does not exist", path)
             return 1
 
-    test_suite_descriptors = (
-        TestSuiteDescriptorLoader(args.test_descriptor_registry_url).process()
+    descriptor_loader = (
+        TestSuiteDescriptorLoader(
+            args.test_descriptor_registry_url,
+            cache_file=(
+                os.path.abspath(os.path.expanduser(args.test_descriptor_cache)) if args.test_descriptor_cache else None
+            ),
+            offline=args.offline,
+        )
         if args.test_descriptor_registry_url
-        else {}
+        else None
     )
 
-    results = FlatResultsRenderer(load_results(result_paths))
+    cache = ResultCache(os.path.abspath(os.path.expanduser(args.cache))) if args.cache else None
+
+    # The registry is fetched while the results are loaded so that the request does not add to the render time.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        descriptors_future = executor.submit(descriptor_loader.process) if descriptor_loader else None
+
+        results = FlatResultsRenderer(
+            flattened_results=iter_flattened_results(result_paths, cache=cache, jobs=args.jobs or os.cpu_count() or 1),
+            columnar=args.columnar,
+        )
+
+        with profiling.stage("wait_for_test_descriptors"):
+            test_suite_descriptors = descriptors_future.result() if descriptors_future else {}
 
     output_dir = os.path.abspath(os.path.expanduser(args.output_dir))
     results.render(
@@ -228,6 +463,10 @@ def entrypoint():
         local_site_mode=args.local_site_mode,
         test_suite_descriptors=test_suite_descriptors,
         source_repo_url_prefix=args.test_source_url_prefix,
+        data_format=args.data_format,
+        shard_by=args.shard_by,
+        incremental=args.incremental,
+        minify=not args.no_minify,
     )
 
     return 0
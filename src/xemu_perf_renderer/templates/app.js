@@ -1,4 +1,8 @@
-import { augmentMinMax, processData } from "./data.js";
+import {
+  augmentMinMax,
+  processData,
+  summarizeAggregates,
+} from "./data.js";
 
 const kPalette = [
   "#0C7BDC",
@@ -48,6 +52,7 @@ const kSearchableDataFields = [
   "xemu_short_version",
   "machine_id",
   "trend",
+  "change_point",
 ];
 
 const kDataSlices = {
@@ -101,11 +106,60 @@ function loadDataFilters(positiveFilterArray, negativeFilterArray) {
   });
 }
 
+function searchableDataString(d) {
+  return kSearchableDataFields
+    .map((key) => d[key])
+    .join(" ")
+    .toLowerCase();
+}
+
+/**
+ * Filters rows using the search index to find the searchable values that match
+ * each filter term, so that each row is tested by value lookups rather than
+ * string matching.
+ *
+ * Terms are matched against a row's searchable values joined by spaces, so a
+ * term containing a space may span two values (e.g., "gl windows"). Such terms
+ * are matched against the joined string, as by the unindexed path.
+ */
+function applyIndexedDataFilters(
+  loadedData,
+  filterText,
+  positiveFilters,
+  negativeFilters,
+  searchIndex,
+) {
+  function rowMatcher(term) {
+    if (term.includes(" ")) {
+      return (d) => searchableDataString(d).includes(term);
+    }
+    const values = searchIndex.matchingDataValues(term);
+    return (d) => kSearchableDataFields.some((key) => values.has(d[key]));
+  }
+
+  const required = positiveFilters.map(rowMatcher);
+  const excluded = negativeFilters.map(rowMatcher);
+  if (filterText.startsWith("!")) {
+    if (filterText.length > 1) {
+      excluded.push(rowMatcher(filterText.substring(1)));
+    }
+  } else if (filterText) {
+    required.push(rowMatcher(filterText));
+  }
+
+  return loadedData.filter(
+    (d) =>
+      required.every((matches) => matches(d)) &&
+      !excluded.some((matches) => matches(d)),
+  );
+}
+
 function applyDataFilters(
   loadedData,
   filterText,
   positiveFilters,
   negativeFilters,
+  searchIndex,
 ) {
   if (
     !loadedData ||
@@ -114,11 +168,18 @@ function applyDataFilters(
     return loadedData;
   }
 
+  if (searchIndex) {
+    return applyIndexedDataFilters(
+      loadedData,
+      filterText,
+      positiveFilters,
+      negativeFilters,
+      searchIndex,
+    );
+  }
+
   return loadedData.filter((d) => {
-    const searchableString = kSearchableDataFields
-      .map((key) => d[key])
-      .join(" ")
-      .toLowerCase();
+    const searchableString = searchableDataString(d);
 
     if (filterText) {
       if (filterText.startsWith("!")) {
@@ -282,6 +343,18 @@ function addChartContainer(name, chartsContainer) {
 }
 
 function buildCustomData(machineData) {
+  function sampleDistribution(data) {
+    if (data.p50_us == null) {
+      return "";
+    }
+
+    const toMs = (us) => (us / 1000.0).toFixed(2);
+    return (
+      `p50 ${toMs(data.p50_us)} ms, p90 ${toMs(data.p90_us)} ms, ` +
+      `stddev ${toMs(data.stddev_us)} ms<br>`
+    );
+  }
+
   function tagInfo(data) {
     if (!data.xemu_version.startsWith("xemu-0.0.0-")) {
       return "";
@@ -314,6 +387,8 @@ function buildCustomData(machineData) {
     d.display_refresh_rate_hz != null
       ? `Display ${d.display_refresh_rate_hz} Hz<br>`
       : "",
+    d.change_point ? `<b>${d.change_point}</b><br>` : "",
+    sampleDistribution(d),
   ]);
 }
 
@@ -329,6 +404,8 @@ function buildHoverTemplate() {
     "%{customdata[9]} - %{customdata[10]}<br>" +
     "%{customdata[7]}<br>" +
     "%{customdata[5]}<br>" +
+    "%{customdata[13]}" +
+    "%{customdata[14]}" +
     "<extra></extra>"
   );
 }
@@ -428,7 +505,7 @@ function highlightMatch(fullText, filterText) {
   return result.join("");
 }
 
-function filteredTestsByName(processedData, filterText) {
+function filteredTestsByName(processedData, filterText, matchingTestNames) {
   const testsByName = processedData.reduce((acc, d) => {
     const arr = acc[d.test_name] || [];
     arr.push(d);
@@ -442,20 +519,19 @@ function filteredTestsByName(processedData, filterText) {
 
   const filteredTests = {};
   for (const testName in testsByName) {
-    if (testName.toLowerCase().includes(filterText)) {
+    if (
+      matchingTestNames
+        ? matchingTestNames.has(testName)
+        : testName.toLowerCase().includes(filterText)
+    ) {
       filteredTests[testName] = testsByName[testName];
     }
   }
   return filteredTests;
 }
 
-function getAllVersions(allData) {
-  const versionMap = new Map();
-  allData.forEach((d) => {
-    versionMap.set(d.xemu_version_obj.compare_name, d.xemu_version_obj);
-  });
-
-  return Array.from(versionMap.values()).sort((a, b) => a.localeCompare(b));
+function getAllVersions(resultsProvider) {
+  return resultsProvider.versions().sort((a, b) => a.localeCompare(b));
 }
 
 function tomSelectScrollToCurrentValue() {
@@ -509,8 +585,41 @@ function getTestDescriptor(fullyQualifiedTestName, testSuiteDescriptors) {
   };
 }
 
-export function initializeApp(loadedData, testSuiteDescriptors) {
+function summarizeRows(selectedSchemeKey, scheme, processedData) {
+  const means = {};
+  for (const d of processedData) {
+    const raw_category = d[scheme.field];
+    const category =
+      selectedSchemeKey === "by-version"
+        ? raw_category.compare_name
+        : raw_category;
+    if (!means[category]) {
+      means[category] = {
+        raw_category: raw_category,
+        total_us: 0,
+        min_us: Infinity,
+        max_us: -Infinity,
+        count: 0,
+        machine_ids: new Set(),
+      };
+    }
+    means[category].total_us += d.average_us;
+    means[category].min_us = Math.min(means[category].min_us, d.average_us);
+    means[category].max_us = Math.max(means[category].max_us, d.average_us);
+    ++means[category].count;
+    means[category].machine_ids.add(d.machine_id);
+  }
+  return means;
+}
+
+export function initializeApp(
+  resultsProvider,
+  testSuiteDescriptors,
+  summaryAggregates,
+  searchIndex,
+) {
   let debounceTimer;
+  let renderGeneration = 0;
   const pendingCharts = new Map();
 
   const chartsContainer = document.getElementById("charts-container");
@@ -535,8 +644,7 @@ export function initializeApp(loadedData, testSuiteDescriptors) {
 
   const suggestionsOverlay = document.getElementById("data-filter-suggestions");
 
-  const loadedResults = loadedData.results;
-  const allVersions = getAllVersions(loadedResults);
+  const allVersions = getAllVersions(resultsProvider);
 
   const versionOptions = allVersions.map((version, index) => ({
     value: index,
@@ -887,33 +995,14 @@ export function initializeApp(loadedData, testSuiteDescriptors) {
     return ret;
   }
 
-  function renderSummaryChart(selectedSchemeKey, scheme, processedData) {
+  /** Renders the summary chart from totals produced by summarizeRows. */
+  function renderSummaryChart(scheme, means) {
     if (!scheme) {
       throw Error("renderSummaryChart called with invalid scheme");
     }
 
     const summaryChartDiv = addChartContainer("summary-chart", chartsContainer);
 
-    const means = {};
-    for (const d of processedData) {
-      const raw_category = d[scheme.field];
-      const category =
-        selectedSchemeKey === "by-version"
-          ? raw_category.compare_name
-          : raw_category;
-      if (!means[category]) {
-        means[category] = {
-          raw_category: raw_category,
-          total_us: 0,
-          count: 0,
-          machine_ids: new Set(),
-        };
-      }
-      means[category].total_us += d.average_us;
-      ++means[category].count;
-      means[category].machine_ids.add(d.machine_id);
-    }
-
     const summaryData = Object.entries(means)
       .map(([category, totals]) => {
         return {
@@ -921,6 +1010,8 @@ export function initializeApp(loadedData, testSuiteDescriptors) {
           tickval: category,
           ticktext: totals.raw_category.toString(),
           score: totals.total_us / totals.count / 1000.0,
+          min: totals.min_us / 1000.0,
+          max: totals.max_us / 1000.0,
           points: totals.count,
           uniqueMachineCount: totals.machine_ids.size,
         };
@@ -940,9 +1031,16 @@ export function initializeApp(loadedData, testSuiteDescriptors) {
       },
       x: summaryData.map((d) => d.category),
       y: summaryData.map((d) => d.score),
-      customdata: summaryData.map((d) => [d.points, d.uniqueMachineCount]),
+      customdata: summaryData.map((d) => [
+        d.points,
+        d.uniqueMachineCount,
+        d.min,
+        d.max,
+      ]),
       hovertemplate:
         "<b>%{y:.2f}</b><br>" +
+        "Min: %{customdata[2]:.2f}<br>" +
+        "Max: %{customdata[3]:.2f}<br>" +
         "Num data points: %{customdata[0]}<br>" +
         "Unique machines: %{customdata[1]}" +
         "<extra></extra>",
@@ -973,10 +1071,15 @@ export function initializeApp(loadedData, testSuiteDescriptors) {
     scheme,
     processedData,
     filterText,
+    matchingTestNames,
     showErrorBars,
     highlightMinMax,
   ) {
-    const testsByName = filteredTestsByName(processedData, filterText);
+    const testsByName = filteredTestsByName(
+      processedData,
+      filterText,
+      matchingTestNames,
+    );
 
     for (const testName in testsByName) {
       const testData = testsByName[testName];
@@ -1089,7 +1192,8 @@ export function initializeApp(loadedData, testSuiteDescriptors) {
     }
   }
 
-  function renderAllCharts() {
+  async function renderAllCharts() {
+    const generation = ++renderGeneration;
     const excludeOutliers = outlierCheckbox.checked;
     const showErrorBars = showErrorBarsCheckbox.checked;
     const highlightMinMax = highlightMinMaxCheckbox.checked;
@@ -1120,6 +1224,51 @@ export function initializeApp(loadedData, testSuiteDescriptors) {
     const endVersion =
       allVersions[Number.isNaN(endIdx) ? allVersions.length - 1 : endIdx];
 
+    const showSummary =
+      !testFilterText &&
+      !(
+        dataFilterText ||
+        positiveFilters.length > 0 ||
+        negativeFilters.length > 0
+      );
+
+    // Draw the summary from the precomputed aggregates, if possible, so that it
+    // appears without waiting for the per-test results to load.
+    let renderedSummary = false;
+    if (showSummary && summaryAggregates) {
+      const means = summarizeAggregates(
+        summaryAggregates,
+        selectedSchemeKey,
+        scheme,
+        excludeOutliers,
+        startVersion,
+        endVersion,
+      );
+      if (means) {
+        renderSummaryChart(scheme, means);
+        renderedSummary = true;
+      }
+    }
+
+    const loadingSpinner = document.createElement("div");
+    loadingSpinner.className = "loading-spinner";
+    chartsContainer.appendChild(loadingSpinner);
+
+    // Without the search index, test names are matched by scanning the rows.
+    const matchingTestNames =
+      testFilterText && searchIndex
+        ? searchIndex.matchingTestNames(testFilterText)
+        : null;
+    const loadedResults = await resultsProvider.rowsMatchingTestFilter(
+      testFilterText,
+      matchingTestNames,
+    );
+    if (generation !== renderGeneration) {
+      // A newer render was started while waiting for data.
+      return;
+    }
+    loadingSpinner.remove();
+
     const versionFilteredData = loadedResults.filter((d) => {
       const versionObj = d.xemu_version_obj;
       return (
@@ -1133,6 +1282,7 @@ export function initializeApp(loadedData, testSuiteDescriptors) {
       dataFilterText,
       positiveFilters,
       negativeFilters,
+      searchIndex,
     );
     if (!filteredRawData || filteredRawData.length === 0) {
       chartsContainer.innerHTML = "<p>No data available to display.</p>";
@@ -1141,26 +1291,45 @@ export function initializeApp(loadedData, testSuiteDescriptors) {
 
     const processedData = processData(filteredRawData, excludeOutliers);
 
-    if (
-      !testFilterText &&
-      !(
-        dataFilterText ||
-        positiveFilters.length > 0 ||
-        negativeFilters.length > 0
-      )
-    ) {
-      renderSummaryChart(selectedSchemeKey, scheme, processedData);
+    if (showSummary && !renderedSummary) {
+      renderSummaryChart(
+        scheme,
+        summarizeRows(selectedSchemeKey, scheme, processedData),
+      );
     }
     renderTestResultCharts(
       selectedSchemeKey,
       scheme,
       processedData,
       testFilterText,
+      matchingTestNames,
       showErrorBars,
       highlightMinMax,
     );
   }
 
+  /**
+   * Returns [value, number of machines] for each searchable value of the
+   * loaded rows that contains the given text, ordered by value.
+   */
+  function scanFilterSuggestions(filterText) {
+    const matchCounts = {};
+    resultsProvider.loadedRows().forEach((d) => {
+      for (const field of kSearchableDataFields) {
+        const value = d[field];
+        if (value?.toLowerCase().includes(filterText)) {
+          matchCounts[value] = (matchCounts[value] || new Set()).add(
+            d.machine_id,
+          );
+        }
+      }
+    });
+
+    return Object.entries(matchCounts)
+      .sort()
+      .map(([value, machines]) => [value, machines.size]);
+  }
+
   function updateFilterSuggestions() {
     const rawText = dataFilterInput.value.toLowerCase().trim();
     const isNegated = rawText.startsWith("!");
@@ -1181,30 +1350,19 @@ export function initializeApp(loadedData, testSuiteDescriptors) {
       suggestionsOverlay.style.maxWidth = `${calculatedMaxWidth}px`;
     }
 
-    const matchCounts = {};
-    const matchingMachines = new Set();
-    loadedResults.forEach((d) => {
-      for (const field of kSearchableDataFields) {
-        const value = d[field];
-        if (value?.toLowerCase().includes(filterText)) {
-          matchCounts[value] = (matchCounts[value] || new Set()).add(
-            d.machine_id,
-          );
-          matchingMachines.add(d.machine_id);
-        }
-      }
-    });
+    const sortedMatches = searchIndex
+      ? searchIndex.dataValueSuggestions(filterText)
+      : scanFilterSuggestions(filterText);
 
-    if (Object.keys(matchCounts).length === 0) {
+    if (sortedMatches.length === 0) {
       suggestionsOverlay.style.display = "none";
       return;
     }
 
     let html = `<ul>`;
-    const sortedMatches = Object.entries(matchCounts).sort();
-    for (const [match, matches] of sortedMatches) {
+    for (const [match, numMachines] of sortedMatches) {
       const highlightedMatch = highlightMatch(match, filterText);
-      html += `<li>${highlightedMatch} (${matches.size})</li>`;
+      html += `<li>${highlightedMatch} (${numMachines})</li>`;
     }
     html += "</ul>";
 
@@ -1212,7 +1370,7 @@ export function initializeApp(loadedData, testSuiteDescriptors) {
     suggestionsOverlay.style.display = "block";
   }
 
-  function handleFilterChange() {
+  async function handleFilterChange() {
     let anchorTestName = null;
     let previousTopOffset = null;
     const allCurrentCharts = Array.from(
@@ -1235,7 +1393,7 @@ export function initializeApp(loadedData, testSuiteDescriptors) {
 
     updateURLFromState(anchorTestName);
 
-    renderAllCharts();
+    await renderAllCharts();
 
     requestAnimationFrame(() => {
       let targetChart = document.querySelector(
@@ -1327,9 +1485,10 @@ export function initializeApp(loadedData, testSuiteDescriptors) {
 
   initializeVersionRange();
 
-  renderAllCharts();
-
-  if (initialAnchor) {
+  renderAllCharts().then(() => {
+    if (!initialAnchor) {
+      return;
+    }
     setTimeout(() => {
       const targetChart = document.querySelector(
         `[data-test-name="${initialAnchor}"]`,
@@ -1338,5 +1497,5 @@ export function initializeApp(loadedData, testSuiteDescriptors) {
         targetChart.scrollIntoView({ behavior: "auto", block: "start" });
       }
     }, 100);
-  }
+  });
 }
@@ -15,20 +15,153 @@ function expandTrendEnum(val) {
   }
 }
 
+function expandChangePointEnum(val) {
+  // Keep in sync with changepoints.py
+  switch (val) {
+    case "R":
+      return "Step regression";
+    case "I":
+      return "Step improvement";
+    default:
+      return "";
+  }
+}
+
+// Keep in sync with compact_format.py
+const kCompactFormatName = "xemu-perf-compact";
+const kCompactFormatVersion = 2;
+
+export function deltaDecode(values) {
+  const ret = new Array(values.length);
+  let previous = 0;
+  for (let i = 0; i < values.length; ++i) {
+    const delta = values[i];
+    if (delta === null) {
+      ret[i] = null;
+      continue;
+    }
+    previous += delta;
+    ret[i] = previous;
+  }
+  return ret;
+}
+
+/** Reconstructs the rows of a compact columnar results file. */
+function decodeCompactResults(rawData) {
+  if (rawData.format_version !== kCompactFormatVersion) {
+    throw new Error(
+      `Unsupported results format version ${rawData.format_version}`,
+    );
+  }
+
+  const { strings, tags, columns } = rawData;
+
+  const versions = rawData.versions.map((v) => {
+    const version_obj = new XemuVersion(v.xemu_version_obj);
+    const associated_tag = tags[version_obj.compare_name];
+    if (associated_tag) {
+      version_obj.setTag(associated_tag);
+    }
+    return {
+      xemu_version: v.xemu_version,
+      xemu_version_obj: version_obj,
+      xemu_short_version: version_obj.toString(),
+    };
+  });
+
+  const total_us = deltaDecode(columns.total_us);
+  const average_us = deltaDecode(columns.average_us);
+  const max_us = deltaDecode(columns.max_us);
+  const min_us = deltaDecode(columns.min_us);
+  const inner_max_us = deltaDecode(columns.inner_max_us);
+  const inner_min_us = deltaDecode(columns.inner_min_us);
+  const iterations = columns.iterations;
+  const p50_us = columns.p50_us;
+  const p90_us = columns.p90_us;
+  const stddev_us = columns.stddev_us;
+  const trendCodes = columns.trend;
+  const changePointCodes = columns.change_point;
+
+  const results = new Array(rawData.row_count);
+  for (let i = 0; i < rawData.row_count; ++i) {
+    // Derived values must be calculated identically to flatten_result.
+    const average_us_exmax =
+      iterations[i] > 1
+        ? (total_us[i] - max_us[i]) / (iterations[i] - 1)
+        : average_us[i];
+
+    const row = {
+      suite: strings[columns.suite[i]],
+      test_name: strings[columns.test_name[i]],
+      average_us: average_us[i],
+      total_us: total_us[i],
+      max_us: max_us[i],
+      min_us: min_us[i],
+      error_plus_us: max_us[i] - average_us[i],
+      error_minus_us: average_us[i] - min_us[i],
+      average_us_exmax: average_us_exmax,
+      iterations: iterations[i],
+      ...versions[columns.version[i]],
+      xemu_tag: strings[columns.xemu_tag[i]],
+      renderer: strings[columns.renderer[i]],
+      iso: strings[columns.iso[i]],
+      ...rawData.machines[columns.machine[i]],
+      trend: expandTrendEnum(trendCodes ? strings[trendCodes[i]] : "N"),
+      change_point: expandChangePointEnum(
+        changePointCodes ? strings[changePointCodes[i]] : "N",
+      ),
+    };
+
+    if (inner_max_us[i] !== null) {
+      const inner_average_us =
+        (total_us[i] - max_us[i] - min_us[i]) / (iterations[i] - 2);
+      row.inner_max_us = inner_max_us[i];
+      row.inner_min_us = inner_min_us[i];
+      row.inner_average_us = inner_average_us;
+      row.error_plus_inner_us = inner_max_us[i] - inner_average_us;
+      row.error_minus_inner_us = inner_average_us - inner_min_us[i];
+      row.error_plus_us_exmax = inner_max_us[i] - average_us_exmax;
+    }
+
+    if (p50_us[i] !== null) {
+      row.p50_us = p50_us[i];
+      row.p90_us = p90_us[i];
+      row.stddev_us = stddev_us[i];
+    }
+
+    results[i] = row;
+  }
+
+  return {
+    tags: tags,
+    results: results,
+  };
+}
+
 export function expandData(rawData) {
+  if (rawData.format === kCompactFormatName) {
+    return decodeCompactResults(rawData);
+  }
+
   const results = rawData.results;
   const tags = rawData.tags;
+  const versions = new Map();
   const updated = results.map((d) => {
-    const version_obj = new XemuVersion(d.xemu_version_obj);
-    const associated_tag = tags[version_obj.compare_name];
-    if (associated_tag) {
-      version_obj.setTag(associated_tag);
+    let version_obj = versions.get(d.xemu_version);
+    if (!version_obj) {
+      version_obj = new XemuVersion(d.xemu_version_obj);
+      const associated_tag = tags[version_obj.compare_name];
+      if (associated_tag) {
+        version_obj.setTag(associated_tag);
+      }
+      versions.set(d.xemu_version, version_obj);
     }
     return {
       ...d,
       xemu_version_obj: version_obj,
       xemu_short_version: version_obj.toString(),
       trend: expandTrendEnum(d.trend),
+      change_point: expandChangePointEnum(d.change_point),
     };
   });
 
@@ -38,6 +171,256 @@ export function expandData(rawData) {
   };
 }
 
+// Keep in sync with summary.py
+const kSummaryFormatName = "xemu-perf-summary";
+const kSummaryFormatVersion = 2;
+
+/** Creates XemuVersion instances, applying any associated friendly tags. */
+function buildVersions(versionObjects, tags) {
+  return versionObjects.map((v) => {
+    const version = new XemuVersion(v);
+    const associated_tag = tags[version.compare_name];
+    if (associated_tag) {
+      version.setTag(associated_tag);
+    }
+    return version;
+  });
+}
+
+// Keep in sync with renderer.py
+const kManifestFormatName = "xemu-perf-manifest";
+const kManifestFormatVersion = 1;
+
+/** Groups the indices of the given rows by test name. */
+function groupRowIndicesByTestName(rows) {
+  const ret = new Map();
+  rows.forEach((d, index) => {
+    const indices = ret.get(d.test_name);
+    if (indices) {
+      indices.push(index);
+    } else {
+      ret.set(d.test_name, [index]);
+    }
+  });
+  return ret;
+}
+
+/** Returns the rows of the given tests in their original order. */
+function rowsOfTests(rows, rowIndicesByTestName, testNames) {
+  const indices = [];
+  for (const testName of testNames) {
+    for (const index of rowIndicesByTestName.get(testName) ?? []) {
+      indices.push(index);
+    }
+  }
+  indices.sort((a, b) => a - b);
+  return indices.map((index) => rows[index]);
+}
+
+/** Provides access to results that were loaded in their entirety. */
+export class InMemoryResults {
+  constructor(data) {
+    this.results = data.results;
+    this.rowIndicesByTestName = null;
+  }
+
+  /** Returns all the loaded rows. */
+  loadedRows() {
+    return this.results;
+  }
+
+  /** Returns the xemu versions for which results are available. */
+  versions() {
+    const versionMap = new Map();
+    this.results.forEach((d) => {
+      versionMap.set(d.xemu_version_obj.compare_name, d.xemu_version_obj);
+    });
+    return Array.from(versionMap.values());
+  }
+
+  /**
+   * Returns the rows that may match the given test filter. If the names of the
+   * matching tests are known (e.g., from the search index), only their rows
+   * are returned.
+   */
+  async rowsMatchingTestFilter(_filterText, matchingTestNames = null) {
+    if (!matchingTestNames) {
+      return this.results;
+    }
+    if (!this.rowIndicesByTestName) {
+      this.rowIndicesByTestName = groupRowIndicesByTestName(this.results);
+    }
+    return rowsOfTests(
+      this.results,
+      this.rowIndicesByTestName,
+      matchingTestNames,
+    );
+  }
+}
+
+/** Provides access to results that are split into shards fetched on demand. */
+export class ShardedResults {
+  constructor(manifest, fetchJSON) {
+    this.manifest = manifest;
+    this.fetchJSON = fetchJSON;
+    this.shardPromises = new Map();
+    this.loadedShards = new Map();
+    this.shardRowIndicesByTestName = new Map();
+  }
+
+  loadedRows() {
+    return this.manifest.shards
+      .filter((shard) => this.loadedShards.has(shard.file))
+      .flatMap((shard) => this.loadedShards.get(shard.file));
+  }
+
+  versions() {
+    return buildVersions(this.manifest.versions, this.manifest.tags);
+  }
+
+  loadShard(shard) {
+    let promise = this.shardPromises.get(shard.file);
+    if (!promise) {
+      promise = this.fetchJSON(shard.file).then((data) => {
+        const rows = expandData(data).results;
+        this.loadedShards.set(shard.file, rows);
+        return rows;
+      });
+      promise.catch(() => this.shardPromises.delete(shard.file));
+      this.shardPromises.set(shard.file, promise);
+    }
+    return promise;
+  }
+
+  /**
+   * Fetches any shards containing tests whose names include the given filter
+   * text and returns their rows in manifest order. If the names of the
+   * matching tests are known (e.g., from the search index), only their rows
+   * are returned.
+   */
+  async rowsMatchingTestFilter(filterText, matchingTestNames = null) {
+    const shards = this.manifest.shards.filter(
+      (shard) =>
+        !filterText ||
+        shard.test_names.some((name) =>
+          matchingTestNames
+            ? matchingTestNames.has(name)
+            : name.toLowerCase().includes(filterText),
+        ),
+    );
+
+    const shardRows = await Promise.all(
+      shards.map((shard) => this.loadShard(shard)),
+    );
+    if (!matchingTestNames) {
+      return shardRows.flat();
+    }
+
+    return shards.flatMap((shard, index) => {
+      let rowIndicesByTestName = this.shardRowIndicesByTestName.get(
+        shard.file,
+      );
+      if (!rowIndicesByTestName) {
+        rowIndicesByTestName = groupRowIndicesByTestName(shardRows[index]);
+        this.shardRowIndicesByTestName.set(shard.file, rowIndicesByTestName);
+      }
+      return rowsOfTests(
+        shardRows[index],
+        rowIndicesByTestName,
+        matchingTestNames,
+      );
+    });
+  }
+}
+
+/** Wraps the content of the top level results file in a results provider. */
+export function createResultsProvider(rawData, fetchJSON) {
+  if (rawData.format === kManifestFormatName) {
+    if (rawData.format_version !== kManifestFormatVersion) {
+      throw new Error(
+        `Unsupported manifest format version ${rawData.format_version}`,
+      );
+    }
+    return new ShardedResults(rawData, fetchJSON);
+  }
+  return new InMemoryResults(expandData(rawData));
+}
+
+/**
+ * Totals the precomputed summary aggregates by the category used by the given
+ * slicing scheme, considering only versions between startVersion and
+ * endVersion (inclusive).
+ *
+ * Returns null if the aggregates are in an unsupported format.
+ */
+export function summarizeAggregates(
+  summary,
+  selectedSchemeKey,
+  scheme,
+  excludeOutliers,
+  startVersion,
+  endVersion,
+) {
+  if (
+    summary.format !== kSummaryFormatName ||
+    summary.format_version !== kSummaryFormatVersion
+  ) {
+    return null;
+  }
+
+  const versions = buildVersions(summary.versions, summary.tags);
+  const versionInRange = versions.map(
+    (v) =>
+      v.localeCompare(startVersion) >= 0 && v.localeCompare(endVersion) <= 0,
+  );
+
+  const { cells, machines } = summary;
+  const sums = excludeOutliers
+    ? cells.sum_average_us_exmax
+    : cells.sum_average_us;
+  const mins = excludeOutliers
+    ? cells.min_average_us_exmax
+    : cells.min_average_us;
+  const maxes = excludeOutliers
+    ? cells.max_average_us_exmax
+    : cells.max_average_us;
+
+  const means = {};
+  for (let i = 0; i < cells.count.length; ++i) {
+    const versionIndex = cells.version[i];
+    if (!versionInRange[versionIndex]) {
+      continue;
+    }
+
+    const machine = machines[cells.machine[i]];
+    const raw_category =
+      scheme.field === "xemu_version_obj"
+        ? versions[versionIndex]
+        : machine[scheme.field];
+    const category =
+      selectedSchemeKey === "by-version"
+        ? raw_category.compare_name
+        : raw_category;
+    if (!means[category]) {
+      means[category] = {
+        raw_category: raw_category,
+        total_us: 0,
+        min_us: Infinity,
+        max_us: -Infinity,
+        count: 0,
+        machine_ids: new Set(),
+      };
+    }
+    means[category].total_us += sums[i];
+    means[category].min_us = Math.min(means[category].min_us, mins[i]);
+    means[category].max_us = Math.max(means[category].max_us, maxes[i]);
+    means[category].count += cells.count[i];
+    means[category].machine_ids.add(machine.machine_id);
+  }
+
+  return means;
+}
+
 export function processData(rawData, excludeMaxOutlier) {
   return rawData.map((d) => {
     let average_us = d.average_us;
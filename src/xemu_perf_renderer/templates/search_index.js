@@ -0,0 +1,127 @@
+import { deltaDecode } from "./data.js";
+
+// Keep in sync with search_index.py
+const kSearchIndexFormatName = "xemu-perf-search-index";
+const kSearchIndexFormatVersion = 1;
+
+/** Returns the values present in both of the given ascending arrays. */
+function intersectSorted(a, b) {
+  const ret = [];
+  let i = 0;
+  let j = 0;
+  while (i < a.length && j < b.length) {
+    if (a[i] < b[j]) {
+      ++i;
+    } else if (a[i] > b[j]) {
+      ++j;
+    } else {
+      ret.push(a[i]);
+      ++i;
+      ++j;
+    }
+  }
+  return ret;
+}
+
+/**
+ * Finds the terms of one section of the search index (e.g., test names) that
+ * contain a given text, using the n-gram postings precomputed by the renderer.
+ */
+class TermIndex {
+  constructor(section, maxGramLength) {
+    this.terms = section.terms;
+    this.counts = section.counts;
+    this.encodedGrams = section.grams;
+    this.maxGramLength = maxGramLength;
+    this.postings = new Map();
+    this.lowercaseTerms = null;
+  }
+
+  posting(gram) {
+    let termIds = this.postings.get(gram);
+    if (!termIds) {
+      const encoded = this.encodedGrams[gram];
+      termIds = encoded ? deltaDecode(encoded) : [];
+      this.postings.set(gram, termIds);
+    }
+    return termIds;
+  }
+
+  /** Returns the IDs of the terms containing the given lowercase text. */
+  matchingTermIds(text) {
+    if (!text) {
+      return this.terms.map((_term, index) => index);
+    }
+    if (text.length <= this.maxGramLength) {
+      return this.posting(text);
+    }
+
+    const postings = [];
+    for (let i = 0; i + this.maxGramLength <= text.length; ++i) {
+      postings.push(this.posting(text.substring(i, i + this.maxGramLength)));
+    }
+    postings.sort((a, b) => a.length - b.length);
+    const candidates = postings.reduce(intersectSorted);
+
+    // The candidates contain every n-gram of the text, but not necessarily
+    // contiguously.
+    if (!this.lowercaseTerms) {
+      this.lowercaseTerms = this.terms.map((term) => term.toLowerCase());
+    }
+    return candidates.filter((id) => this.lowercaseTerms[id].includes(text));
+  }
+
+  /** Returns the terms containing the given lowercase text. */
+  matchingTerms(text) {
+    return this.matchingTermIds(text).map((id) => this.terms[id]);
+  }
+}
+
+/**
+ * Answers the report's test name and data filters from the search index
+ * emitted by the renderer, in time independent of the number of rows.
+ */
+export class SearchIndex {
+  constructor(rawData) {
+    if (
+      rawData.format !== kSearchIndexFormatName ||
+      rawData.format_version !== kSearchIndexFormatVersion
+    ) {
+      throw new Error(
+        `Unsupported search index format ${rawData.format} version ${rawData.format_version}`,
+      );
+    }
+
+    this.testNames = new TermIndex(
+      rawData.test_names,
+      rawData.max_gram_length,
+    );
+    this.dataValues = new TermIndex(
+      rawData.data_values,
+      rawData.max_gram_length,
+    );
+  }
+
+  /** Returns the set of test names containing the given lowercase text. */
+  matchingTestNames(text) {
+    return new Set(this.testNames.matchingTerms(text));
+  }
+
+  /**
+   * Returns the set of searchable data values (e.g., GPU names or trends)
+   * containing the given lowercase text.
+   */
+  matchingDataValues(text) {
+    return new Set(this.dataValues.matchingTerms(text));
+  }
+
+  /**
+   * Returns [value, number of machines] for each searchable data value
+   * containing the given lowercase text, ordered by value.
+   */
+  dataValueSuggestions(text) {
+    return this.dataValues
+      .matchingTermIds(text)
+      .map((id) => [this.dataValues.terms[id], this.dataValues.counts[id]]);
+  }
+}
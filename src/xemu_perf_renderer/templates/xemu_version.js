@@ -9,6 +9,9 @@ export class XemuVersion {
     this.build_type = version_obj.build_type;
     this.short_name = version_obj.short;
     this.compare_name = version_obj.compare;
+    // Position of this version amongst all the versions in the dataset, in
+    // semantic version order. See VersionCatalog in data.py.
+    this.ordinal = version_obj.ordinal ?? null;
     this.friendlyName = null;
 
     if (!this.short_name || !this.compare_name) {
@@ -28,6 +31,9 @@ export class XemuVersion {
   }
 
   localeCompare(other) {
+    if (this.ordinal !== null && other.ordinal !== null) {
+      return this.ordinal - other.ordinal;
+    }
     return this.compare_name.localeCompare(other.compare_name);
   }
 }
@@ -0,0 +1,360 @@
+"""Bundling and minification of the site's static JavaScript and CSS.
+
+Everything here is deliberately conservative pure Python, suitable for the hand written sources in `templates`: the
+minifiers remove comments and insignificant whitespace but never rename or reorder anything, and the bundler
+understands only the static `import {...} from "./module.js"` and `export <declaration>` forms used by those sources.
+"""
+
+from __future__ import annotations
+
+import posixpath
+import re
+import string
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+_JS_WORD_CHARS = frozenset(string.ascii_letters + string.digits + "_$\\")
+_JS_DIGITS = frozenset(string.digits)
+
+_JS_WHITESPACE = frozenset(" \t\r\n\f\v\u00a0\u2028\u2029\ufeff")
+
+# A `/` following one of these characters or keywords begins a regular expression literal rather than a division, unless
+# the character ends a `++` or `--` operator, which can only be followed by a `/` when it is postfix.
+_REGEX_PRECEDING_CHARS = frozenset("(,=:[!&|?{};+-*%<>~^")
+_INCREMENT_OPERATORS = ("++", "--")
+_REGEX_PRECEDING_KEYWORDS = frozenset(
+    {
+        "await",
+        "case",
+        "delete",
+        "do",
+        "else",
+        "in",
+        "instanceof",
+        "new",
+        "of",
+        "return",
+        "throw",
+        "typeof",
+        "void",
+        "yield",
+    }
+)
+
+# A line break directly after or before one of these characters can never end a statement, so it may be removed without
+# affecting automatic semicolon insertion. Any other line break is kept.
+_NEWLINE_INSENSITIVE_AFTER = frozenset("{([,;")
+_NEWLINE_INSENSITIVE_BEFORE = frozenset(")]},;")
+
+_IMPORT_RE = re.compile(
+    r'^import\s*\{(?P<names>[^}]*)\}\s*from\s*"(?P<module>[^"]+)"[ \t]*;?[ \t]*(?:\n|$)',
+    re.MULTILINE,
+)
+_EXPORT_RE = re.compile(
+    r"^export\s+(?=(?:async\s+)?(?:function\b\s*\*?|class\b|const\b|let\b|var\b)\s*(?P<name>[A-Za-z_$][\w$]*))",
+    re.MULTILINE,
+)
+_UNSUPPORTED_MODULE_SYNTAX_RE = re.compile(r"^(?:import|export)\b", re.MULTILINE)
+_IMPORT_SPECIFIER_RE = re.compile(r"(?P<name>[A-Za-z_$][\w$]*)(?:\s+as\s+(?P<alias>[A-Za-z_$][\w$]*))?")
+
+_CSS_STRING_PATTERN = r"\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*'"
+_CSS_STRING_RE = re.compile(_CSS_STRING_PATTERN, re.DOTALL)
+_CSS_COMMENT_OR_STRING_RE = re.compile(rf"/\*.*?\*/|{_CSS_STRING_PATTERN}", re.DOTALL)
+_CSS_WHITESPACE_RE = re.compile(r"\s+")
+_CSS_SPACE_AROUND_PUNCTUATION_RE = re.compile(r"\s*([{};,>])\s*")
+_CSS_SPACE_AFTER_COLON_RE = re.compile(r":\s+")
+
+
+def _is_js_word_char(char: str) -> bool:
+    return char in _JS_WORD_CHARS or ord(char) > 0x7F  # noqa: PLR2004 Magic value used in comparison
+
+
+class _JsMinifier:
+    def __init__(self, source: str):
+        self.source = source
+        self.pos = 0
+        self.output: list[str] = []
+        # The last token and character emitted and, if the last token was an identifier, keyword, or number, that token.
+        self.last_token = ""
+        self.last_char = ""
+        self.last_word = ""
+        # Whitespace seen since the last token: "", " ", or "\n" if it included a line break.
+        self.pending_whitespace = ""
+
+    def _emit(self, token: str, *, word: str = ""):
+        first = token[0]
+        if self.pending_whitespace and self.last_char:
+            if self.pending_whitespace == "\n" and not (
+                self.last_char in _NEWLINE_INSENSITIVE_AFTER or first in _NEWLINE_INSENSITIVE_BEFORE
+            ):
+                self.output.append("\n")
+            elif (
+                (_is_js_word_char(self.last_char) and _is_js_word_char(first))
+                or (self.last_char == first and first in "+-")
+                or (self.last_char == "/" and first in "/*")
+                or (first == "." and self.last_word[:1] in _JS_DIGITS)
+            ):
+                # Removing the space would merge the tokens (e.g., "a + +b" -> "a++b" or "1 .toString()" ->
+                # "1.toString()").
+                self.output.append(" ")
+        self.pending_whitespace = ""
+
+        self.output.append(token)
+        self.last_token = token
+        self.last_char = token[-1]
+        self.last_word = word
+
+    def _line(self, pos: int) -> int:
+        return self.source.count("\n", 0, pos) + 1
+
+    def _scan_string(self, start: int) -> int:
+        quote = self.source[start]
+        pos = start + 1
+        while pos < len(self.source):
+            char = self.source[pos]
+            if char == "\\":
+                pos += 2
+                continue
+            if char == quote:
+                return pos + 1
+            if char == "\n":
+                break
+            pos += 1
+        msg = f"Unterminated string at line {self._line(start)}"
+        raise ValueError(msg)
+
+    def _scan_template(self, start: int) -> tuple[int, bool]:
+        """Scans template literal text from its opening backtick or the `}` closing a substitution.
+
+        Returns the end of the scanned text and whether it ended the template (rather than starting a substitution).
+        """
+        pos = start + 1
+        while pos < len(self.source):
+            char = self.source[pos]
+            if char == "\\":
+                pos += 2
+                continue
+            if char == "`":
+                return pos + 1, True
+            if char == "$" and self.source.startswith("{", pos + 1):
+                return pos + 2, False
+            pos += 1
+        msg = f"Unterminated template literal at line {self._line(start)}"
+        raise ValueError(msg)
+
+    def _scan_regex(self, start: int) -> int:
+        pos = start + 1
+        in_class = False
+        while pos < len(self.source):
+            char = self.source[pos]
+            if char == "\\":
+                pos += 2
+                continue
+            if char == "\n":
+                break
+            if char == "[":
+                in_class = True
+            elif char == "]":
+                in_class = False
+            elif char == "/" and not in_class:
+                pos += 1
+                while pos < len(self.source) and _is_js_word_char(self.source[pos]):
+                    pos += 1
+                return pos
+            pos += 1
+        msg = f"Unterminated regular expression at line {self._line(start)}"
+        raise ValueError(msg)
+
+    def _regex_allowed(self) -> bool:
+        if self.last_token in _INCREMENT_OPERATORS:
+            return False
+        return (
+            not self.last_char
+            or self.last_char in _REGEX_PRECEDING_CHARS
+            or self.last_word in _REGEX_PRECEDING_KEYWORDS
+        )
+
+    def minify(self) -> str:
+        source = self.source
+        # The brace depth within each enclosing template literal substitution.
+        substitution_depths: list[int] = []
+
+        while self.pos < len(source):
+            start = self.pos
+            char = source[start]
+
+            if char in _JS_WHITESPACE:
+                if char in "\n\u2028\u2029":
+                    self.pending_whitespace = "\n"
+                elif not self.pending_whitespace:
+                    self.pending_whitespace = " "
+                self.pos += 1
+
+            elif source.startswith("//", start):
+                end = source.find("\n", start)
+                self.pos = len(source) if end < 0 else end
+                if not self.pending_whitespace:
+                    self.pending_whitespace = " "
+
+            elif source.startswith("/*", start):
+                end = source.find("*/", start + 2)
+                if end < 0:
+                    msg = f"Unterminated comment at line {self._line(start)}"
+                    raise ValueError(msg)
+                if "\n" in source[start:end]:
+                    self.pending_whitespace = "\n"
+                elif not self.pending_whitespace:
+                    self.pending_whitespace = " "
+                self.pos = end + 2
+
+            elif char in "'\"":
+                self.pos = self._scan_string(start)
+                self._emit(source[start : self.pos])
+
+            elif char == "`" or (char == "}" and substitution_depths and not substitution_depths[-1]):
+                if char == "}":
+                    substitution_depths.pop()
+                self.pos, closed = self._scan_template(start)
+                self._emit(source[start : self.pos])
+                if not closed:
+                    substitution_depths.append(0)
+
+            elif char == "/" and self._regex_allowed():
+                self.pos = self._scan_regex(start)
+                self._emit(source[start : self.pos])
+
+            elif _is_js_word_char(char):
+                end = start + 1
+                while end < len(source) and _is_js_word_char(source[end]):
+                    end += 1
+                self.pos = end
+                self._emit(source[start:end], word=source[start:end])
+
+            elif source.startswith(_INCREMENT_OPERATORS, start):
+                self.pos += 2
+                self._emit(source[start : self.pos])
+
+            else:
+                if substitution_depths and char == "{":
+                    substitution_depths[-1] += 1
+                elif substitution_depths and char == "}":
+                    substitution_depths[-1] -= 1
+                self.pos += 1
+                self._emit(char)
+
+        if substitution_depths:
+            msg = f"Unterminated template literal at line {self._line(len(source))}"
+            raise ValueError(msg)
+        return "".join(self.output) + "\n"
+
+
+def minify_js(source: str) -> str:
+    """Removes comments and insignificant whitespace from JavaScript source.
+
+    Line breaks that could end a statement are kept, so automatic semicolon insertion behaves as in the original.
+    """
+    return _JsMinifier(source).minify()
+
+
+def _minify_css_text(text: str) -> str:
+    """Minifies stylesheet text that contains no comments or strings."""
+    text = _CSS_WHITESPACE_RE.sub(" ", text)
+    text = _CSS_SPACE_AROUND_PUNCTUATION_RE.sub(r"\1", text)
+    return _CSS_SPACE_AFTER_COLON_RE.sub(":", text).replace(";}", "}")
+
+
+def minify_css(source: str) -> str:
+    """Removes comments and insignificant whitespace from a stylesheet."""
+    # Comments are replaced by a space, as they may separate tokens.
+    source = _CSS_COMMENT_OR_STRING_RE.sub(
+        lambda match: " " if match.group().startswith("/*") else match.group(), source
+    )
+
+    output = []
+    position = 0
+    for match in _CSS_STRING_RE.finditer(source):
+        output.append(_minify_css_text(source[position : match.start()]))
+        output.append(match.group())
+        position = match.end()
+    output.append(_minify_css_text(source[position:]))
+
+    return "".join(output).strip() + "\n"
+
+
+def _module_variable(index: int) -> str:
+    return f"__bundled_module_{index}"
+
+
+def bundle_modules(modules: Mapping[str, str], entry: str) -> str:
+    """Combines ES modules into a single module with no imports, returning its source.
+
+    `modules` maps each module's path (as it would be resolved relative to the site root, e.g., "data.js") to its
+    source. The entry module and every module it transitively imports are wrapped in functions that are evaluated in
+    dependency order, each returning its exports, and imports are replaced by destructuring the exports of the imported
+    module. Raises ValueError if a module is missing, imports are circular, or unsupported module syntax is used.
+    """
+    order: list[str] = []
+    bodies: dict[str, str] = {}
+    imports: dict[str, list[tuple[str, str]]] = {}
+    exports: dict[str, list[str]] = {}
+    visiting: set[str] = set()
+
+    def _visit(path: str, importer: str | None):
+        if path in bodies:
+            return
+        if path in visiting:
+            msg = f"Circular import of '{path}'"
+            raise ValueError(msg)
+        source = modules.get(path)
+        if source is None:
+            msg = f"Module '{path}' imported by '{importer}' does not exist" if importer else f"No module '{path}'"
+            raise ValueError(msg)
+        visiting.add(path)
+
+        module_imports: list[tuple[str, str]] = []
+
+        def _replace_import(match: re.Match[str]) -> str:
+            dependency = posixpath.normpath(posixpath.join(posixpath.dirname(path), match["module"]))
+            _visit(dependency, path)
+            specifiers = []
+            for specifier in filter(None, (value.strip() for value in match["names"].split(","))):
+                specifier_match = _IMPORT_SPECIFIER_RE.fullmatch(specifier)
+                if not specifier_match:
+                    msg = f"Unsupported import specifier '{specifier}' in '{path}'"
+                    raise ValueError(msg)
+                name, alias = specifier_match["name"], specifier_match["alias"]
+                specifiers.append(f"{name}: {alias}" if alias else name)
+            module_imports.append((dependency, ", ".join(specifiers)))
+            return ""
+
+        body = _IMPORT_RE.sub(_replace_import, source)
+        exports[path] = [match["name"] for match in _EXPORT_RE.finditer(body)]
+        body = _EXPORT_RE.sub("", body)
+
+        unsupported = _UNSUPPORTED_MODULE_SYNTAX_RE.search(body)
+        if unsupported:
+            line = body.splitlines()[body.count("\n", 0, unsupported.start())]
+            msg = f"Unsupported module syntax in '{path}': {line.strip()}"
+            raise ValueError(msg)
+
+        visiting.discard(path)
+        bodies[path] = body
+        imports[path] = module_imports
+        order.append(path)
+
+    _visit(entry, None)
+
+    variables = {path: _module_variable(index) for index, path in enumerate(order)}
+    output = []
+    for path in order:
+        output.append(f"// {path}")
+        declaration = "" if path == entry else f"const {variables[path]} = "
+        output.append(f"{declaration}(() => {{")
+        output.extend(f"const {{ {names} }} = {variables[dependency]};" for dependency, names in imports[path])
+        output.append(bodies[path].strip("\n"))
+        if path != entry:
+            output.append(f"return {{ {', '.join(exports[path])} }};")
+        output.append("})();")
+    return "\n".join(output) + "\n"
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from statistics import NormalDist
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from xemu_perf_renderer.util.trends import factorize
+
+if TYPE_CHECKING:
+    from collections.abc import Container, Iterable, Sequence
+
+DEFAULT_NUM_RESAMPLES = 1000
+DEFAULT_CONFIDENCE = 0.95
+
+# Upper bound on the number of resampled values held by a worker at once.
+_MAX_BLOCK_ELEMENTS = 1 << 22
+
+
+class _Grouping:
+    """Precomputed arrangement used to reduce the columns of a matrix by group code."""
+
+    def __init__(self, codes: np.ndarray):
+        self.codes = codes
+        self.order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[self.order]
+        self.starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        self.sizes = np.diff(np.r_[self.starts, len(codes)])
+
+    def means(self, matrix: np.ndarray) -> np.ndarray:
+        """Returns the mean of the columns of each group for every row of the given matrix."""
+        return np.add.reduceat(matrix[:, self.order], self.starts, axis=1) / self.sizes
+
+
+@dataclass
+class RawSamples:
+    """The raw per-iteration timings of every (xemu version, machine, test) result.
+
+    The samples of all results are concatenated into `values`, those of result `i` being
+    `values[offsets[i]:offsets[i] + lengths[i]]`. Every result has at least one sample.
+    """
+
+    values: np.ndarray
+    offsets: np.ndarray
+    lengths: np.ndarray
+    # Code of the (machine, test) series of each result, by which results are normalized.
+    series_ids: np.ndarray
+    # Index into `versions` of each result.
+    version_ids: np.ndarray
+    versions: list[str]
+
+    @classmethod
+    def from_results(cls, results: Iterable[dict[str, Any]], versions: Container[str] | None = None) -> RawSamples:
+        """Collects the raw samples from the given loaded result files, optionally limited to the given versions.
+
+        Results without raw samples contribute their average excluding the maximum as a single sample.
+        """
+        values: list[float] = []
+        lengths: list[int] = []
+        series_keys: list[tuple[str, str]] = []
+        result_versions: list[str] = []
+
+        for result in results:
+            version = result["xemu_version"]
+            if versions is not None and version not in versions:
+                continue
+            for test_result in result.get("results", []):
+                samples = test_result.get("raw_results")
+                if not samples:
+                    iterations = test_result["iterations"]
+                    samples = [
+                        (test_result["total_us"] - test_result["max_us"]) / (iterations - 1)
+                        if iterations > 1
+                        else test_result["average_us"]
+                    ]
+                values.extend(samples)
+                lengths.append(len(samples))
+                series_keys.append((result["machine_id"], test_result["name"]))
+                result_versions.append(version)
+
+        lengths_array = np.array(lengths, dtype=np.int64)
+        unique_versions, version_ids = factorize(result_versions)
+        _unique_series, series_ids = factorize(series_keys)
+        return cls(
+            values=np.array(values, dtype=np.float64),
+            offsets=np.cumsum(lengths_array) - lengths_array,
+            lengths=lengths_array,
+            series_ids=series_ids,
+            version_ids=version_ids,
+            versions=unique_versions,
+        )
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def without_maxima(self) -> RawSamples:
+        """Returns a copy from which the (first) maximum sample of each result having more than one has been removed.
+
+        The mean of each result's remaining samples is its average excluding the maximum (`average_us_exmax`).
+        """
+        result_of_value = np.repeat(np.arange(len(self)), self.lengths)
+        maxima = np.maximum.reduceat(self.values, self.offsets)
+        is_max = np.flatnonzero(self.values == maxima[result_of_value])
+        max_results = result_of_value[is_max]
+        first_max = is_max[np.r_[True, max_results[1:] != max_results[:-1]]]
+
+        keep = np.ones(len(self.values), dtype=bool)
+        keep[first_max[self.lengths > 1]] = False
+        lengths = self.lengths - (self.lengths > 1)
+        return RawSamples(
+            values=self.values[keep],
+            offsets=np.cumsum(lengths) - lengths,
+            lengths=lengths,
+            series_ids=self.series_ids,
+            version_ids=self.version_ids,
+            versions=self.versions,
+        )
+
+
+def _means(values: np.ndarray, offsets: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Returns the mean of each result's samples, along the last axis of `values`."""
+    return np.add.reduceat(values, offsets, axis=-1) / lengths
+
+
+def _version_scores(estimates: np.ndarray, series: _Grouping, versions: _Grouping) -> np.ndarray:
+    """Normalizes each estimate by the mean of its series and averages the normalized values by version.
+
+    Mirrors `analyze.rank_versions` for each row of `estimates`.
+    """
+    baselines = series.means(estimates)[:, series.codes]
+    return versions.means(estimates / baselines)
+
+
+def _bootstrap_version_scores(samples: RawSamples, num_resamples: int, seed: np.random.SeedSequence) -> np.ndarray:
+    """Returns a (num_resamples, len(versions)) array of version scores computed from resampled iterations.
+
+    `samples` must already exclude the maximum of each result (see `RawSamples.without_maxima`).
+    """
+    rng = np.random.default_rng(seed)
+    series = _Grouping(samples.series_ids)
+    versions = _Grouping(samples.version_ids)
+
+    # The result and bounds of every slot in `values`, each of which is redrawn from the samples of its result.
+    slot_results = np.repeat(np.arange(len(samples)), samples.lengths)
+    slot_offsets = samples.offsets[slot_results].astype(np.int32)
+    slot_lengths = samples.lengths[slot_results].astype(np.int32)
+    slot_max_index = slot_lengths - 1
+    slot_lengths_f32 = slot_lengths.astype(np.float32)
+
+    scores = np.empty((num_resamples, len(samples.versions)))
+    block_size = max(1, _MAX_BLOCK_ELEMENTS // max(1, len(samples.values)))
+    for block_start in range(0, num_resamples, block_size):
+        block_end = min(block_start + block_size, num_resamples)
+
+        # Scaling single precision uniforms is substantially faster than `Generator.integers` with per-element bounds.
+        # The clamp guards against a product rounding up to the length of the result.
+        uniforms = rng.random((block_end - block_start, len(slot_lengths)), dtype=np.float32)
+        uniforms *= slot_lengths_f32
+        draws = uniforms.astype(np.int32)
+        np.minimum(draws, slot_max_index, out=draws)
+        draws += slot_offsets
+
+        estimates = _means(samples.values[draws], samples.offsets, samples.lengths)
+        scores[block_start:block_end] = _version_scores(estimates, series, versions)
+    return scores
+
+
+@dataclass
+class BootstrapResult:
+    versions: list[str]
+    # The normalized score of each version calculated from the original samples.
+    scores: np.ndarray
+    # (num_resamples, len(versions)) scores calculated from resampled iterations.
+    replicates: np.ndarray
+    # The number of results contributing to the score of each version.
+    num_results: np.ndarray
+
+    def score_intervals(self, confidence: float = DEFAULT_CONFIDENCE) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the lower and upper bounds of the bias-corrected confidence interval of each version's score."""
+        return _bias_corrected_intervals(self.scores, self.replicates, confidence)
+
+    def delta_intervals(
+        self, pairs: Sequence[tuple[str, str]], confidence: float = DEFAULT_CONFIDENCE
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the change in score from the first to the second version of each pair and its confidence interval.
+
+        Scores are normalized durations, so a positive delta means that the second version is slower.
+        """
+        index = {version: i for i, version in enumerate(self.versions)}
+        first = np.array([index[a] for a, _b in pairs], dtype=np.int64)
+        second = np.array([index[b] for _a, b in pairs], dtype=np.int64)
+
+        deltas = self.scores[second] - self.scores[first]
+        low, high = _bias_corrected_intervals(
+            deltas, self.replicates[:, second] - self.replicates[:, first], confidence
+        )
+        return deltas, low, high
+
+
+def _bias_corrected_intervals(
+    estimates: np.ndarray, replicates: np.ndarray, confidence: float
+) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the bias-corrected (BC) percentile interval of each estimate from its column of bootstrap replicates.
+
+    The percentiles are shifted by the median bias of the replicates, i.e., by the fraction of them that fall below the
+    estimate, so that the interval is not displaced when the replicates are skewed relative to the estimate.
+    """
+    normal = NormalDist()
+    num_resamples = len(replicates)
+    below = (replicates < estimates).sum(axis=0) + 0.5 * (replicates == estimates).sum(axis=0)
+    # Bound the fraction away from 0 and 1, at which the correction is infinite.
+    fractions = np.clip(below / num_resamples, 0.5 / num_resamples, 1 - 0.5 / num_resamples)
+
+    z_alpha = normal.inv_cdf((1 - confidence) / 2)
+    low = np.empty(len(estimates))
+    high = np.empty(len(estimates))
+    for i, fraction in enumerate(fractions):
+        bias = normal.inv_cdf(fraction)
+        low[i], high[i] = np.quantile(
+            replicates[:, i], [normal.cdf(2 * bias + z_alpha), normal.cdf(2 * bias - z_alpha)]
+        )
+    return low, high
+
+
+def bootstrap_version_scores(
+    samples: RawSamples, num_resamples: int = DEFAULT_NUM_RESAMPLES, *, seed: int = 0, jobs: int = 1
+) -> BootstrapResult:
+    """Estimates the sampling distribution of each version's normalized score by resampling raw iterations.
+
+    The iterations of every result, excluding its maximum, are resampled with replacement and the resulting averages
+    (i.e., `average_us_exmax`) are normalized and averaged by version as in `analyze.rank_versions`. The maximum is
+    excluded before resampling, rather than from each resample, since outliers drawn more than once would otherwise
+    bias the resampled averages upward. The resamples are split across `jobs` worker processes, each
+    seeded from `seed`, so results are reproducible for a given seed and number of jobs.
+    """
+    if not len(samples):
+        msg = "No results to resample"
+        raise ValueError(msg)
+    if len(samples.values) > np.iinfo(np.int32).max:
+        msg = "Too many samples to resample"
+        raise ValueError(msg)
+
+    samples = samples.without_maxima()
+    estimates = _means(samples.values, samples.offsets, samples.lengths)
+    scores = _version_scores(
+        estimates[np.newaxis, :], _Grouping(samples.series_ids), _Grouping(samples.version_ids)
+    ).ravel()
+
+    jobs = max(1, min(jobs, num_resamples))
+    seeds = np.random.SeedSequence(seed).spawn(jobs)
+    counts = [num_resamples // jobs + (1 if i < num_resamples % jobs else 0) for i in range(jobs)]
+    if jobs == 1:
+        replicates = _bootstrap_version_scores(samples, counts[0], seeds[0])
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            replicates = np.concatenate(
+                list(executor.map(_bootstrap_version_scores, [samples] * jobs, counts, seeds)), axis=0
+            )
+
+    return BootstrapResult(
+        versions=samples.versions,
+        scores=scores,
+        replicates=replicates,
+        num_results=np.bincount(samples.version_ids, minlength=len(samples.versions)),
+    )
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import itertools
+import math
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from xemu_perf_renderer.util.trends import TREND_MIN_CHANGE_PERCENTAGE, SortedSeries
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+# Minimum change in mean, as a fraction of the mean before the change, for a change point to be reported.
+CHANGE_POINT_MIN_CHANGE_PERCENTAGE = TREND_MIN_CHANGE_PERCENTAGE
+
+# Minimum number of versions on either side of a change point, so that a single outlying result is not reported as two
+# changes.
+CHANGE_POINT_MIN_SEGMENT_LENGTH = 2
+
+# Lower bound on the noise level of a series as a fraction of its median, so that series with near identical values do
+# not have every small fluctuation treated as a change.
+_MIN_RELATIVE_NOISE = 0.01
+
+# Scale factor converting the median absolute deviation of successive differences to a standard deviation.
+_MAD_TO_SIGMA = 1 / (0.6745 * math.sqrt(2))
+
+# Keep in sync with expandChangePointEnum in data.js
+NO_CHANGE_POINT = "N"
+IMPROVEMENT_CHANGE_POINT = "I"
+REGRESSION_CHANGE_POINT = "R"
+
+
+@dataclass
+class ChangePoint:
+    """A shift in the mean of a (test, machine) series between two consecutive versions."""
+
+    test_name: str
+    machine_id: str
+    # Input index of a row of the last version before the change.
+    before_row: int
+    # Input index of a row of the first version after the change.
+    after_row: int
+    # Mean of the versions in the segments on either side of the change.
+    before_mean: float
+    after_mean: float
+
+    @property
+    def change(self) -> float:
+        """The relative change in mean. Values are durations, so a positive change is a regression."""
+        return self.after_mean / self.before_mean - 1 if self.before_mean else math.inf
+
+
+def pelt(values: Sequence[float], penalty: float, min_segment_length: int = 1) -> list[int]:
+    """Segments the given values into runs of constant mean using the Pruned Exact Linear Time method.
+
+    Minimizes the total squared deviation of each segment from its mean plus `penalty` per segment, returning the index
+    at which each segment after the first begins. Candidate segment starts that can no longer be optimal are pruned, so
+    the run time is linear in the number of values when changes are spread through the series.
+    """
+    n = len(values)
+    if n < 2 * min_segment_length:
+        return []
+
+    sums = [0.0]
+    sums_squared = [0.0]
+    for value in values:
+        sums.append(sums[-1] + value)
+        sums_squared.append(sums_squared[-1] + value * value)
+
+    best = [math.inf] * (n + 1)
+    best[0] = -penalty
+    previous_start = [0] * (n + 1)
+    candidates = [0]
+
+    for end in range(min_segment_length, n + 1):
+        # Segment starts become eligible once they are `min_segment_length` behind the end.
+        newly_eligible = end - min_segment_length
+        if newly_eligible >= min_segment_length:
+            candidates.append(newly_eligible)
+
+        # best[start] plus the squared deviation of values[start:end] from their mean.
+        end_sum = sums[end]
+        end_sum_squared = sums_squared[end]
+        costs = [
+            best[start] + end_sum_squared - sums_squared[start] - (end_sum - sums[start]) ** 2 / (end - start)
+            for start in candidates
+        ]
+        minimum = min(costs)
+        best[end] = minimum + penalty
+        previous_start[end] = candidates[costs.index(minimum)]
+
+        candidates = [start for start, cost in zip(candidates, costs, strict=True) if cost <= minimum + penalty]
+
+    change_points = []
+    start = previous_start[n]
+    while start > 0:
+        change_points.append(start)
+        start = previous_start[start]
+    change_points.reverse()
+    return change_points
+
+
+def _significant_change_points(
+    values: np.ndarray, change_points: list[int], min_change_percentage: float
+) -> list[tuple[int, float, float]]:
+    """Merges segments whose means differ by less than `min_change_percentage`.
+
+    Returns (index, mean before, mean after) for each remaining change point.
+    """
+    segments = list(itertools.pairwise([0, *change_points, len(values)]))
+
+    merged: list[tuple[int, int]] = [segments[0]]
+    for start, end in segments[1:]:
+        previous_start, previous_end = merged[-1]
+        before = values[previous_start:previous_end].mean()
+        after = values[start:end].mean()
+        if before and abs(after / before - 1) >= min_change_percentage:
+            merged.append((start, end))
+        else:
+            merged[-1] = (previous_start, end)
+
+    return [
+        (start, float(values[previous_start:previous_end].mean()), float(values[start:end].mean()))
+        for (previous_start, previous_end), (start, end) in itertools.pairwise(merged)
+    ]
+
+
+def detect_change_points(
+    test_names: Sequence[str],
+    machine_ids: Sequence[str],
+    sort_keys: Sequence[Any],
+    values: Sequence[float],
+    min_change_percentage: float = CHANGE_POINT_MIN_CHANGE_PERCENTAGE,
+    min_segment_length: int = CHANGE_POINT_MIN_SEGMENT_LENGTH,
+) -> tuple[np.ndarray, list[ChangePoint]]:
+    """Finds the versions at which the mean of each (test, machine) series shifts.
+
+    Series are grouped and ordered as in `classify_trends`. Rows with the same sort key are averaged into a single point
+    and each series of points is segmented by `pelt`, with the squared deviations normalized by a robust estimate of
+    the series' noise and a penalty of 2 log(n) per change (the Bayesian information criterion). Adjacent segments
+    whose means differ by less than `min_change_percentage` are then merged.
+
+    Returns the change point code of each input row, marking the rows of the first version after a change, and the
+    change points themselves.
+    """
+    num_rows = len(values)
+    codes = np.full(num_rows, NO_CHANGE_POINT, dtype="<U1")
+    if not num_rows:
+        return codes, []
+
+    series = SortedSeries(test_names, machine_ids, sort_keys)
+    y = np.asarray(values, dtype=np.float64)[series.order]
+
+    # Collapse rows of each series that share a sort key into a single point.
+    point_starts = np.flatnonzero(
+        np.r_[True, (series.index[1:] != series.index[:-1]) | (series.sort_codes[1:] != series.sort_codes[:-1])]
+    )
+    point_sizes = np.diff(np.r_[point_starts, num_rows])
+    point_means = np.add.reduceat(y, point_starts) / point_sizes
+    point_series = series.index[point_starts]
+    series_point_starts = np.searchsorted(point_series, np.arange(len(series.starts)))
+    series_point_ends = np.r_[series_point_starts[1:], len(point_starts)]
+
+    change_points: list[ChangePoint] = []
+    for first_point, end_point in zip(series_point_starts.tolist(), series_point_ends.tolist(), strict=True):
+        num_points = end_point - first_point
+        if num_points < 2 * min_segment_length:
+            continue
+
+        points = point_means[first_point:end_point]
+        noise = np.median(np.abs(np.diff(points))) * _MAD_TO_SIGMA
+        noise = max(noise, abs(float(np.median(points))) * _MIN_RELATIVE_NOISE)
+        if not noise:
+            continue
+
+        candidates = pelt((points / noise).tolist(), 2 * math.log(num_points), min_segment_length)
+        if not candidates:
+            continue
+
+        for index, before_mean, after_mean in _significant_change_points(points, candidates, min_change_percentage):
+            after_point = first_point + index
+            after_start = point_starts[after_point]
+            after_end = after_start + point_sizes[after_point]
+            before_row = int(series.order[point_starts[after_point - 1]])
+            after_row = int(series.order[after_start])
+
+            code = REGRESSION_CHANGE_POINT if after_mean > before_mean else IMPROVEMENT_CHANGE_POINT
+            codes[series.order[after_start:after_end]] = code
+            change_points.append(
+                ChangePoint(
+                    test_name=test_names[after_row],
+                    machine_id=machine_ids[after_row],
+                    before_row=before_row,
+                    after_row=after_row,
+                    before_mean=before_mean,
+                    after_mean=after_mean,
+                )
+            )
+
+    return codes, change_points
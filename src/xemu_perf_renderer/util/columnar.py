@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import math
+from array import array
+from collections.abc import Callable, Hashable, Iterable, Iterator, Sequence
+from typing import Any, overload
+
+from xemu_perf_renderer.util.machines import MACHINE_FIELDS, MachineRegistry
+
+# Integer timing fields present in every flattened row.
+_INT_FIELDS = (
+    "average_us",
+    "total_us",
+    "max_us",
+    "min_us",
+    "error_plus_us",
+    "error_minus_us",
+)
+
+# Timing fields that are only present for rows with enough raw samples to exclude outliers.
+_INNER_INT_FIELDS = ("inner_max_us", "inner_min_us")
+_INNER_FLOAT_FIELDS = (
+    "inner_average_us",
+    "error_plus_inner_us",
+    "error_minus_inner_us",
+    "error_plus_us_exmax",
+)
+
+# Statistics of the raw samples that are only present for rows with at least two samples. Missing values are stored as
+# NaN.
+DISTRIBUTION_FIELDS = ("p50_us", "p90_us", "stddev_us")
+
+# Fields stored as codes into the shared string table.
+_STRING_FIELDS = ("suite", "test_name", "xemu_tag", "renderer", "iso")
+
+
+class DimensionTable:
+    """Interns hashable values, assigning each distinct value a dense integer code."""
+
+    def __init__(self):
+        self.values: list[Any] = []
+        self._codes: dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def intern(self, value: Hashable) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+
+    def code(self, value: Hashable) -> int | None:
+        """Returns the code for the given value, or None if it has never been interned."""
+        return self._codes.get(value)
+
+
+class ColumnarResults:
+    """Stores flattened result rows as typed numeric arrays and dictionary-encoded dimension codes.
+
+    Timing values are held in `array`s rather than per-row dicts, and strings and versions are stored once in dimension
+    tables and machine environments in a `MachineRegistry`, each referenced by integer codes. `rows()` provides a
+    read-only view that reconstructs the dict rows produced by `flatten_result` for consumers that have not been
+    converted.
+    """
+
+    def __init__(self):
+        self.strings = DimensionTable()
+        # xemu_version strings. The corresponding `XemuVersion.to_object` dicts are held in `version_objects`.
+        self.versions = DimensionTable()
+        self.machines = MachineRegistry()
+
+        self.int_columns: dict[str, array] = {field: array("q") for field in (*_INT_FIELDS, *_INNER_INT_FIELDS)}
+        self.int_columns["iterations"] = array("L")
+        self.float_columns: dict[str, array] = {
+            field: array("d") for field in ("average_us_exmax", *_INNER_FLOAT_FIELDS, *DISTRIBUTION_FIELDS)
+        }
+        self.has_inner = bytearray()
+
+        self.string_codes: dict[str, array] = {field: array("L") for field in _STRING_FIELDS}
+        self.version_codes = array("L")
+        self.machine_codes = array("L")
+
+        # Additional string columns attached after loading (e.g., trend classifications).
+        self.extra_columns: dict[str, array] = {}
+
+        self.version_objects: list[dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self.version_codes)
+
+    def append(self, row: dict[str, Any]):
+        """Appends a single row as produced by `flatten_result`."""
+        for field in _INT_FIELDS:
+            self.int_columns[field].append(row[field])
+        self.int_columns["iterations"].append(row["iterations"])
+        self.float_columns["average_us_exmax"].append(row["average_us_exmax"])
+
+        has_inner = "inner_average_us" in row
+        self.has_inner.append(has_inner)
+        for field in _INNER_INT_FIELDS:
+            self.int_columns[field].append(row[field] if has_inner else 0)
+        for field in _INNER_FLOAT_FIELDS:
+            self.float_columns[field].append(row[field] if has_inner else math.nan)
+        for field in DISTRIBUTION_FIELDS:
+            self.float_columns[field].append(row.get(field, math.nan))
+
+        for field in _STRING_FIELDS:
+            self.string_codes[field].append(self.strings.intern(row[field]))
+
+        version_code = self.versions.intern(row["xemu_version"])
+        if version_code == len(self.version_objects):
+            self.version_objects.append(dict(row["xemu_version_obj"]))
+        self.version_codes.append(version_code)
+
+        self.machine_codes.append(self.machines.register(row["environment"]))
+
+    def extend(self, rows: Iterable[dict[str, Any]]):
+        for row in rows:
+            self.append(row)
+
+    def set_column(self, name: str, values: Sequence[str]):
+        """Attaches a string column, which will be appended to each row in the compatibility view."""
+        if len(values) != len(self):
+            msg = f"Column '{name}' has {len(values)} values but there are {len(self)} rows"
+            raise ValueError(msg)
+        self.extra_columns[name] = array("L", (self.strings.intern(value) for value in values))
+
+    def version(self, index: int) -> str:
+        return self.versions.values[self.version_codes[index]]
+
+    def version_object(self, index: int) -> dict[str, Any]:
+        return self.version_objects[self.version_codes[index]]
+
+    def column(self, name: str) -> Sequence[Any]:
+        """Returns the decoded values of the given field for every row, or None for rows that do not have the field."""
+        if name in self.int_columns:
+            if name in _INNER_INT_FIELDS:
+                return [
+                    value if flag else None for value, flag in zip(self.int_columns[name], self.has_inner, strict=False)
+                ]
+            return self.int_columns[name]
+
+        if name == "average_us_exmax":
+            return [
+                exmax if iterations > 1 else average
+                for exmax, iterations, average in zip(
+                    self.float_columns[name],
+                    self.int_columns["iterations"],
+                    self.int_columns["average_us"],
+                    strict=False,
+                )
+            ]
+
+        if name in DISTRIBUTION_FIELDS:
+            return [None if math.isnan(value) else value for value in self.float_columns[name]]
+
+        if name in self.float_columns:
+            return [
+                value if flag else None for value, flag in zip(self.float_columns[name], self.has_inner, strict=False)
+            ]
+
+        string_codes = self.string_codes.get(name, self.extra_columns.get(name))
+        if string_codes is not None:
+            strings = self.strings.values
+            return [strings[code] for code in string_codes]
+
+        if name == "xemu_version":
+            versions = self.versions.values
+            return [versions[code] for code in self.version_codes]
+
+        if name == "xemu_version_obj":
+            version_objects = self.version_objects
+            return [version_objects[code] for code in self.version_codes]
+
+        if name == "environment" or name in MACHINE_FIELDS:
+            values = self.machines.environments if name == "environment" else self.machines.field_values(name)
+            return [values[code] for code in self.machine_codes]
+
+        return [None] * len(self)
+
+    def column_getter(self, name: str) -> Callable[[int], Any]:
+        """Returns a function that decodes the value of the given field, as `column` would, from the row at an index."""
+        if name in self.int_columns:
+            int_column = self.int_columns[name]
+            if name in _INNER_INT_FIELDS:
+                return lambda index: int_column[index] if self.has_inner[index] else None
+            return int_column.__getitem__
+
+        if name == "average_us_exmax":
+            exmax = self.float_columns[name]
+            iterations = self.int_columns["iterations"]
+            average = self.int_columns["average_us"]
+            return lambda index: exmax[index] if iterations[index] > 1 else average[index]
+
+        if name in DISTRIBUTION_FIELDS:
+            distribution_column = self.float_columns[name]
+            return lambda index: None if math.isnan(distribution_column[index]) else distribution_column[index]
+
+        if name in self.float_columns:
+            float_column = self.float_columns[name]
+            return lambda index: float_column[index] if self.has_inner[index] else None
+
+        string_codes = self.string_codes.get(name, self.extra_columns.get(name))
+        if string_codes is not None:
+            strings = self.strings.values
+            return lambda index: strings[string_codes[index]]
+
+        if name == "xemu_version":
+            return self.version
+
+        if name == "xemu_version_obj":
+            return self.version_object
+
+        if name == "environment" or name in MACHINE_FIELDS:
+            values = self.machines.environments if name == "environment" else self.machines.field_values(name)
+            return lambda index: values[self.machine_codes[index]]
+
+        return lambda _index: None
+
+    def row(self, index: int) -> dict[str, Any]:
+        """Reconstructs the dict form of the row at the given index."""
+        strings = self.strings.values
+        string_codes = self.string_codes
+        int_columns = self.int_columns
+        float_columns = self.float_columns
+
+        iterations = int_columns["iterations"][index]
+        row: dict[str, Any] = {
+            "suite": strings[string_codes["suite"][index]],
+            "test_name": strings[string_codes["test_name"][index]],
+        }
+        for field in _INT_FIELDS:
+            row[field] = int_columns[field][index]
+        row["average_us_exmax"] = float_columns["average_us_exmax"][index] if iterations > 1 else row["average_us"]
+        row["iterations"] = iterations
+        row["xemu_version"] = self.version(index)
+        row["xemu_version_obj"] = self.version_object(index)
+        for field in ("xemu_tag", "renderer", "iso"):
+            row[field] = strings[string_codes[field][index]]
+        row["environment"] = self.machines.environment(self.machine_codes[index])
+
+        if self.has_inner[index]:
+            for field in _INNER_INT_FIELDS:
+                row[field] = int_columns[field][index]
+            for field in _INNER_FLOAT_FIELDS:
+                row[field] = float_columns[field][index]
+
+        for field in DISTRIBUTION_FIELDS:
+            value = float_columns[field][index]
+            if not math.isnan(value):
+                row[field] = value
+
+        for name, codes in self.extra_columns.items():
+            row[name] = strings[codes[index]]
+
+        return row
+
+    def rows(self) -> ColumnarRowView:
+        return ColumnarRowView(self)
+
+
+class ColumnarRowView(Sequence[dict[str, Any]]):
+    """Read-only sequence of dict rows reconstructed on demand from a `ColumnarResults`.
+
+    Modifications to the returned dicts are not persisted; use `ColumnarResults.set_column` instead.
+    """
+
+    def __init__(self, columns: ColumnarResults):
+        self._columns = columns
+
+    def __len__(self) -> int:
+        return len(self._columns)
+
+    @overload
+    def __getitem__(self, index: int) -> dict[str, Any]: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[dict[str, Any]]: ...
+
+    def __getitem__(self, index: int | slice) -> dict[str, Any] | list[dict[str, Any]]:
+        if isinstance(index, slice):
+            return [self._columns.row(i) for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            msg = "Row index out of range"
+            raise IndexError(msg)
+        return self._columns.row(index)
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        for index in range(len(self)):
+            yield self._columns.row(index)
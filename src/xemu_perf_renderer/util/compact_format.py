@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Protocol
+
+from xemu_perf_renderer.util.columnar import DISTRIBUTION_FIELDS, DimensionTable
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+# Keep in sync with data.js
+COMPACT_FORMAT_NAME = "xemu-perf-compact"
+COMPACT_FORMAT_VERSION = 2
+
+# Fields encoded as codes into the shared string table.
+_STRING_FIELDS = ("suite", "test_name", "xemu_tag", "renderer", "iso", "trend", "change_point")
+
+# String fields attached by analysis, which are omitted if they have not been calculated.
+_OPTIONAL_STRING_FIELDS = ("trend", "change_point")
+
+# Integer microsecond fields, encoded as the difference from the previous non-null value in the column.
+_DELTA_FIELDS = ("total_us", "average_us", "max_us", "min_us", "inner_max_us", "inner_min_us")
+
+# Fields that are transmitted verbatim.
+_RAW_FIELDS = ("iterations",)
+
+# Raw sample statistics, which cannot be derived from the other fields. These are rounded to `_FLOAT_DIGITS` decimal
+# places, well below the resolution of the measurements, to keep the encoding small.
+_FLOAT_FIELDS = DISTRIBUTION_FIELDS
+_FLOAT_DIGITS = 1
+
+# The remaining fields of a flattened row (error bars, averages excluding outliers) are derived from the transmitted
+# values by the decoder in data.js.
+
+
+class ColumnSource(Protocol):
+    """Provides per-field access to flattened results (e.g., `FlatResults`).
+
+    In addition to the fields of the flattened rows, `environment` must provide the `MachineEnvironment` of each row.
+    """
+
+    friendly_names: dict[str, str]
+
+    def column(self, name: str) -> Sequence[Any]: ...
+
+
+def delta_encode(values: Sequence[int | None]) -> list[int | None]:
+    """Replaces each value with its difference from the previous non-null value. Nulls are preserved."""
+    ret: list[int | None] = []
+    previous = 0
+    for value in values:
+        if value is None:
+            ret.append(None)
+            continue
+        ret.append(value - previous)
+        previous = value
+    return ret
+
+
+def encode_compact(results: ColumnSource, indices: Sequence[int] | None = None) -> dict[str, Any]:
+    """Encodes the given results into the compact columnar wire format decoded by `expandData` in data.js.
+
+    Strings, versions, and machine descriptions are emitted once in tables and referenced by index from per-field
+    column arrays. If `indices` is given, only the rows at those indices are encoded.
+    """
+
+    def _column(name: str) -> Sequence[Any]:
+        values = results.column(name)
+        if indices is None:
+            return values
+        return [values[index] for index in indices]
+
+    strings = DimensionTable()
+    columns: dict[str, list[Any]] = {}
+
+    for field in _STRING_FIELDS:
+        values = _column(field)
+        if field in _OPTIONAL_STRING_FIELDS and not any(value is not None for value in values):
+            continue
+        columns[field] = [strings.intern(value) for value in values]
+
+    versions = DimensionTable()
+    version_table: list[dict[str, Any]] = []
+    version_codes = []
+    for version, version_obj in zip(_column("xemu_version"), _column("xemu_version_obj"), strict=True):
+        code = versions.intern(version)
+        if code == len(version_table):
+            version_table.append({"xemu_version": version, "xemu_version_obj": version_obj})
+        version_codes.append(code)
+    columns["version"] = version_codes
+
+    machines = DimensionTable()
+    machine_table: list[dict[str, Any]] = []
+    machine_codes = []
+    for environment in _column("environment"):
+        code = machines.intern(environment)
+        if code == len(machine_table):
+            machine_table.append(environment.to_dict())
+        machine_codes.append(code)
+    columns["machine"] = machine_codes
+
+    for field in _DELTA_FIELDS:
+        columns[field] = delta_encode(_column(field))
+
+    for field in _RAW_FIELDS:
+        columns[field] = list(_column(field))
+
+    for field in _FLOAT_FIELDS:
+        columns[field] = [None if value is None else round(value, _FLOAT_DIGITS) for value in _column(field)]
+
+    return {
+        "format": COMPACT_FORMAT_NAME,
+        "format_version": COMPACT_FORMAT_VERSION,
+        "row_count": len(version_codes),
+        "tags": results.friendly_names,
+        "strings": strings.values,
+        "versions": version_table,
+        "machines": machine_table,
+        "columns": columns,
+    }
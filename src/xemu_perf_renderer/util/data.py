@@ -1,14 +1,39 @@
 from __future__ import annotations
 
-# ruff: noqa: PLR2004 Magic value used in comparison
+import functools
 import glob
+import itertools
 import json
 import os
 import re
-from collections import defaultdict
+from array import array
+from collections import defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from dataclasses import dataclass
 from enum import StrEnum
-from typing import Any
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from xemu_perf_renderer.util import profiling
+from xemu_perf_renderer.util.columnar import ColumnarResults
+from xemu_perf_renderer.util.machines import (
+    MACHINE_FIELDS,
+    HardwareChange,
+    MachineRegistry,
+    find_hardware_changes,
+    machine_environment,
+    parse_gpu_info,
+)
+from xemu_perf_renderer.util.packed_results import TIMING_FIELDS, PackedResults, is_pack_file
+from xemu_perf_renderer.util.query import ResultIndex
+from xemu_perf_renderer.util.result_cache import content_digest
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator, Sequence
+
+    from xemu_perf_renderer.util.query import ResultQuery
+    from xemu_perf_renderer.util.result_cache import ResultCache
 
 _GITHASHSTRING = r"[a-f0-9]+"
 _XEMU_VERSION_CAPTURE = r"(\d+)\.(\d+)\.(\d+)"
@@ -172,6 +197,22 @@ class XemuVersion:
             compare_name=builder.compare_name,
         )
 
+    @property
+    def sort_key(self) -> tuple[Any, ...]:
+        """Orders versions by version number and then by build number, with releases preceding dev builds.
+
+        Fork builds do not carry a meaningful version number and are ordered after all other versions.
+        """
+        return (
+            self.type == XemuVersionType.FORK,
+            self.major,
+            self.minor,
+            self.patch,
+            -1 if self.build is None else self.build,
+            self.branch or "",
+            self.git_hash,
+        )
+
     def to_object(self) -> dict[str, Any]:
         return {
             "major": self.major,
@@ -186,81 +227,372 @@ class XemuVersion:
         }
 
 
-class FlatResults:
-    def __init__(self, flat_results: list[dict[str, Any]]):
-        def _patch_gpu_renderer(gpu: str, cpu: str) -> str:
-            """Replace generic integrated graphics messages with CPU info."""
-            return cpu if gpu == "AMD Radeon (TM) Graphics" else gpu
+@functools.cache
+def _parse_version(version_string: str) -> XemuVersion:
+    return XemuVersion.parse(version_string)
+
+
+class VersionCatalog:
+    """Interns the xemu versions present in a set of results.
+
+    Each distinct version string is parsed once and assigned an ordinal, its position amongst all of the versions in
+    the catalog when sorted by `XemuVersion.sort_key`. Ordinals are dense and are reassigned if versions are added.
+    """
+
+    def __init__(self, version_strings: Iterable[str] = ()):
+        self._versions: dict[str, XemuVersion] = {}
+        self._ordinals: dict[str, int] | None = None
+        self._version_objects: dict[str, dict[str, Any]] = {}
+        self.update(version_strings)
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+    def __contains__(self, version_string: object) -> bool:
+        return version_string in self._versions
+
+    def update(self, version_strings: Iterable[str]):
+        for version_string in version_strings:
+            self.parse(version_string)
+
+    def parse(self, version_string: str) -> XemuVersion:
+        """Returns the interned `XemuVersion` for the given version string, adding it to the catalog if necessary."""
+        version = self._versions.get(version_string)
+        if version is None:
+            version = _parse_version(version_string)
+            self._versions[version_string] = version
+            self._ordinals = None
+            self._version_objects.clear()
+        return version
+
+    def sorted(self) -> list[str]:
+        """Returns the version strings in the catalog in ordinal order."""
+        return sorted(
+            self._versions, key=lambda version_string: (self._versions[version_string].sort_key, version_string)
+        )
+
+    def ordinal(self, version_string: str) -> int:
+        self.parse(version_string)
+        if self._ordinals is None:
+            self._ordinals = {version: ordinal for ordinal, version in enumerate(self.sorted())}
+        return self._ordinals[version_string]
+
+    def ordinal_range(self, start_version: str | None = None, end_version: str | None = None) -> tuple[int, int]:
+        """Returns the inclusive range of ordinals between the given versions (full version strings or short names).
+
+        Raises ValueError if either version is not in the catalog.
+        """
+        start = 0
+        end = len(self) - 1
+        if start_version:
+            ordinals = self.ordinals_matching(start_version)
+            if not ordinals:
+                msg = f"Unknown xemu version '{start_version}'"
+                raise ValueError(msg)
+            start = ordinals[0]
+        if end_version:
+            ordinals = self.ordinals_matching(end_version)
+            if not ordinals:
+                msg = f"Unknown xemu version '{end_version}'"
+                raise ValueError(msg)
+            end = ordinals[-1]
+        return start, end
+
+    def ordinals_matching(self, name: str) -> list[int]:
+        """Returns the ordinals of versions whose full version string or short name is the given name."""
+        return sorted(
+            self.ordinal(version_string)
+            for version_string, version in self._versions.items()
+            if name in {version_string, version.short_name}
+        )
+
+    def version_object(self, version_string: str) -> dict[str, Any]:
+        """Returns the `XemuVersion.to_object` form of the given version with its ordinal added."""
+        ret = self._version_objects.get(version_string)
+        if ret is None:
+            ret = self.parse(version_string).to_object()
+            ret["ordinal"] = self.ordinal(version_string)
+            self._version_objects[version_string] = ret
+        return ret
+
+
+# Quantiles of the raw samples of each test, keyed by the name of the flattened field.
+_RAW_SAMPLE_QUANTILES = (("p50_us", 0.5), ("p90_us", 0.9))
+
+# Minimum number of raw samples for the inner (outlier excluded) fields and for the sample distribution fields.
+_MIN_INNER_SAMPLES = 4
+_MIN_DISTRIBUTION_SAMPLES = 2
+
+# Number of result files flattened together, and the number handed to a worker process at a time when loading in
+# parallel.
+_FLATTEN_BATCH_FILES = 256
+_FILES_PER_TASK = 16
+
+
+def raw_sample_statistics(values: np.ndarray, offsets: np.ndarray) -> dict[str, np.ndarray]:
+    """Computes statistics of the raw samples of each test, those of test `i` being `values[offsets[i]:offsets[i + 1]]`.
+
+    Returns arrays of the second smallest and second largest sample (`inner_min_us`, `inner_max_us`), the linearly
+    interpolated quantiles in `_RAW_SAMPLE_QUANTILES`, and the sample standard deviation (`stddev_us`). Values for tests
+    with too few samples are unspecified.
+    """
+    counts = np.diff(offsets)
+    num_tests = len(counts)
+    statistics = {
+        "inner_min_us": np.zeros(num_tests, dtype=values.dtype),
+        "inner_max_us": np.zeros(num_tests, dtype=values.dtype),
+        **{field: np.full(num_tests, np.nan) for field, _quantile in _RAW_SAMPLE_QUANTILES},
+        "stddev_us": np.full(num_tests, np.nan),
+    }
+
+    # Nearly every test has the same number of samples, so the tests are processed in groups of equal sample count,
+    # each of which is sorted as a single matrix.
+    for count in np.unique(counts).tolist():
+        if count < _MIN_DISTRIBUTION_SAMPLES:
+            continue
+
+        tests = np.flatnonzero(counts == count)
+        samples = np.sort(values[offsets[tests, np.newaxis] + np.arange(count)], axis=1)
+
+        statistics["inner_min_us"][tests] = samples[:, 1]
+        statistics["inner_max_us"][tests] = samples[:, -2]
+        for field, quantile in _RAW_SAMPLE_QUANTILES:
+            position = (count - 1) * quantile
+            lower = int(position)
+            upper = min(lower + 1, count - 1)
+            statistics[field][tests] = samples[:, lower] + (samples[:, upper] - samples[:, lower]) * (position - lower)
+        statistics["stddev_us"][tests] = samples.std(axis=1, ddof=1)
+
+    return statistics
+
+
+def _flatten_columns(
+    results: Sequence[dict[str, Any]],
+    result_rows: np.ndarray,
+    test_names: Sequence[str],
+    timings: dict[str, np.ndarray],
+    raw_values: np.ndarray,
+    raw_offsets: np.ndarray,
+) -> list[dict[str, Any]]:
+    """Produces the flattened rows of the tests of the given loaded result files from their columns.
+
+    The tests of `results[i]` are rows `result_rows[i]:result_rows[i + 1]` of `test_names` and `timings`. Derived values
+    are computed for all rows at once.
+    """
+    iterations, total_us, average_us, min_us, max_us = (timings[field] for field in TIMING_FIELDS)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        average_excluding_max = (total_us - max_us) / (iterations - 1)
+        average_excluding_outliers = (total_us - max_us - min_us) / (iterations - 2)
+
+    raw_counts = np.diff(raw_offsets)
+    statistics = raw_sample_statistics(raw_values, raw_offsets)
+
+    # Fields shared by every row of a result file, in the order in which they appear in the flattened rows.
+    result_fields = []
+    for result in results:
+        version = result["xemu_version"]
+        xemu_tag: str = result.get("xemu_tag", "")
+        if xemu_tag:
+            xemu_tag = xemu_tag.removeprefix("https://github.com/")
+        result_fields.append(
+            {
+                "xemu_version": version,
+                "xemu_version_obj": _parse_version(version).to_object(),
+                "xemu_tag": xemu_tag,
+                "renderer": result["renderer"],
+                "iso": result["iso"],
+                # The fields describing the machine are held by an environment shared by every row of the file, and
+                # by the rows of any other file produced by the same environment.
+                "environment": machine_environment(result),
+            }
+        )
+    row_results = np.repeat(np.arange(len(results)), np.diff(result_rows))
+
+    flattened_results = []
+    for (
+        result_index,
+        name,
+        num_iterations,
+        total,
+        average,
+        minimum,
+        maximum,
+        exmax,
+        inner_average,
+        num_samples,
+        inner_min,
+        inner_max,
+        p50,
+        p90,
+        stddev,
+    ) in zip(
+        row_results.tolist(),
+        test_names,
+        iterations.tolist(),
+        total_us.tolist(),
+        average_us.tolist(),
+        min_us.tolist(),
+        max_us.tolist(),
+        average_excluding_max.tolist(),
+        average_excluding_outliers.tolist(),
+        raw_counts.tolist(),
+        statistics["inner_min_us"].tolist(),
+        statistics["inner_max_us"].tolist(),
+        statistics["p50_us"].tolist(),
+        statistics["p90_us"].tolist(),
+        statistics["stddev_us"].tolist(),
+        strict=True,
+    ):
+        # Single iteration results keep the integer average.
+        average_exmax = exmax if num_iterations > 1 else average
+        flattened = {
+            "suite": name.split("::")[0] if "::" in name else "N/A",
+            "test_name": name,
+            "average_us": average,
+            "total_us": total,
+            "max_us": maximum,
+            "min_us": minimum,
+            "error_plus_us": maximum - average,
+            "error_minus_us": average - minimum,
+            "average_us_exmax": average_exmax,
+            "iterations": num_iterations,
+        }
+        flattened.update(result_fields[result_index])
+
+        if num_samples >= _MIN_INNER_SAMPLES:
+            flattened["inner_max_us"] = inner_max
+            flattened["inner_min_us"] = inner_min
+            flattened["inner_average_us"] = inner_average
+            flattened["error_plus_inner_us"] = inner_max - inner_average
+            flattened["error_minus_inner_us"] = inner_average - inner_min
+            flattened["error_plus_us_exmax"] = inner_max - average_exmax
+
+        if num_samples >= _MIN_DISTRIBUTION_SAMPLES:
+            flattened["p50_us"] = p50
+            flattened["p90_us"] = p90
+            flattened["stddev_us"] = stddev
+
+        flattened_results.append(flattened)
+
+    return flattened_results
+
+
+def flatten_results_by_file(results: Sequence[dict[str, Any]]) -> list[list[dict[str, Any]]]:
+    """Flattens the test results within the given loaded result files into one row per test, grouped by file.
+
+    The timing values and raw samples of every test are gathered into arrays so that the derived values and raw sample
+    statistics of all of the files are computed together.
+    """
+    test_names: list[str] = []
+    timings: dict[str, list[int]] = {field: [] for field in TIMING_FIELDS}
+    raw_values: list[int] = []
+    raw_offsets = [0]
+    result_rows = [0]
+
+    for result in results:
+        for test_result in result.get("results", []):
+            test_names.append(test_result["name"])
+            for field in TIMING_FIELDS:
+                timings[field].append(test_result[field])
+            raw_values.extend(test_result.get("raw_results", ()))
+            raw_offsets.append(len(raw_values))
+        result_rows.append(len(test_names))
+
+    rows = _flatten_columns(
+        results,
+        np.array(result_rows, dtype=np.int64),
+        test_names,
+        {field: np.array(values, dtype=np.int64) for field, values in timings.items()},
+        np.array(raw_values, dtype=np.int64),
+        np.array(raw_offsets, dtype=np.int64),
+    )
+    return [rows[start:end] for start, end in itertools.pairwise(result_rows)]
+
 
-        self.flattened_results = []
+def flatten_results(results: Sequence[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Flattens the test results within the given loaded result files into one row per test.
+
+    See `flatten_results_by_file`.
+    """
+    return [row for rows in flatten_results_by_file(results) for row in rows]
+
+
+def flatten_result(result: dict[str, Any]) -> list[dict[str, Any]]:
+    """Flattens the test results within a single loaded result file into one row per test."""
+    return flatten_results([result])
+
+
+def _batched(items: Iterable[Any], batch_size: int) -> Iterator[list[Any]]:
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, batch_size)):
+        yield batch
+
+
+def _iter_flattened_batches(results: Iterable[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+    """Flattens the given loaded result files a batch of files at a time."""
+    for batch in _batched(results, _FLATTEN_BATCH_FILES):
+        yield from flatten_results(batch)
+
+
+class FlatResults:
+    def __init__(
+        self,
+        flat_results: Iterable[dict[str, Any]] = (),
+        *,
+        flattened_results: Iterable[dict[str, Any]] | None = None,
+        columnar: bool = False,
+    ):
+        """Flattens the given loaded result files.
+
+        `flattened_results` may be used to provide rows that have already been flattened (e.g., via
+        `iter_flattened_results`), in which case `flat_results` is ignored. Both are consumed incrementally, so in
+        columnar mode only the flattened rows of a batch of result files need be held in dict form at once.
+
+        If `columnar` is True, rows are stored in a `ColumnarResults` and `flattened_results` is a read-only view that
+        reconstructs each row on access. Use `column` and `set_column` to read and annotate rows efficiently.
+
+        The versions present in the results are interned in `versions`, and the environments of the machines that
+        produced them in `machines`.
+        """
+        rows = _iter_flattened_batches(flat_results) if flattened_results is None else flattened_results
+
+        self.columns: ColumnarResults | None
+        self.flattened_results: Sequence[dict[str, Any]]
+        with profiling.stage("load_rows"):
+            if columnar:
+                self.columns = ColumnarResults()
+                self.columns.extend(rows)
+                self.flattened_results = self.columns.rows()
+            else:
+                self.columns = None
+                self.flattened_results = list(rows)
+
+            self.machines: MachineRegistry
+            self._machine_codes: Sequence[int]
+            if self.columns is not None:
+                self.machines = self.columns.machines
+                self._machine_codes = self.columns.machine_codes
+            else:
+                self.machines = MachineRegistry()
+                self._machine_codes = array(
+                    "L", (self.machines.register(row["environment"]) for row in self.flattened_results)
+                )
+        profiling.count("load_rows", rows=len(self.flattened_results))
+
+        self._query_index: ResultIndex | None = None
+
+        version_strings = self.column("xemu_version")
+        self.versions = VersionCatalog(dict.fromkeys(version_strings))
 
         friendly_names = defaultdict(set)
-        for result in flat_results:
-            machine_info = result["machine_info"]
-            for test_result in result.get("results", []):
-                iterations = test_result["iterations"]
-                max_us = test_result["max_us"]
-                min_us = test_result["min_us"]
-                total_us = test_result["total_us"]
-                average_us = test_result["average_us"]
-
-                average_excluding_max = (total_us - max_us) / (iterations - 1) if iterations > 1 else average_us
-                error_plus_us = max_us - average_us
-                error_minus_us = average_us - min_us
-
-                version = result["xemu_version"]
-                xemu_version_obj = XemuVersion.parse(version)
-
-                xemu_tag: str = result.get("xemu_tag", "")
-                if xemu_tag:
-                    xemu_tag = xemu_tag.removeprefix("https://github.com/")
-                    friendly_names[xemu_version_obj].add(xemu_tag)
-
-                flattened = {
-                    "suite": test_result["name"].split("::")[0] if "::" in test_result["name"] else "N/A",
-                    "test_name": test_result["name"],
-                    "average_us": average_us,
-                    "total_us": total_us,
-                    "max_us": max_us,
-                    "min_us": min_us,
-                    "error_plus_us": error_plus_us,
-                    "error_minus_us": error_minus_us,
-                    "average_us_exmax": average_excluding_max,
-                    "iterations": iterations,
-                    "xemu_version": version,
-                    "xemu_version_obj": xemu_version_obj.to_object(),
-                    "xemu_tag": xemu_tag,
-                    "renderer": result["renderer"],
-                    "iso": result["iso"],
-                    "os_system": machine_info["os_system"],
-                    "cpu_manufacturer": machine_info["cpu_manufacturer"],
-                    "cpu_freq_max": machine_info["cpu_freq_max"],
-                    "gpu_vendor": result["gpu_vendor"],
-                    "gpu_renderer": _patch_gpu_renderer(result["gpu_renderer"], machine_info["cpu_manufacturer"]),
-                    "machine_id": result["machine_id"],
-                    "machine_id_with_renderer": result["machine_id_with_renderer"],
-                    "display_refresh_rate_hz": machine_info.get("display_refresh_rate_hz"),
-                }
-
-                raw_results = sorted(test_result.get("raw_results", []))
-                if raw_results and len(raw_results) > 3:
-                    inner_max_us = raw_results[-2]
-                    inner_min_us = raw_results[1]
-                    average_excluding_outliers = (total_us - max_us - min_us) / (iterations - 2)
-
-                    flattened["inner_max_us"] = inner_max_us
-                    flattened["inner_min_us"] = inner_min_us
-                    flattened["inner_average_us"] = average_excluding_outliers
-
-                    flattened["error_plus_inner_us"] = inner_max_us - average_excluding_outliers
-                    flattened["error_minus_inner_us"] = average_excluding_outliers - inner_min_us
-
-                    flattened["error_plus_us_exmax"] = inner_max_us - average_excluding_max
-
-                self.flattened_results.append(flattened)
+        for version_string, xemu_tag in zip(version_strings, self.column("xemu_tag"), strict=True):
+            if xemu_tag:
+                friendly_names[version_string].add(xemu_tag)
 
         self.friendly_names = {}
-        for version, tags in friendly_names.items():
+        for version_string, tags in friendly_names.items():
+            version = self.versions.parse(version_string)
             if version.type == XemuVersionType.RELEASE:
                 continue
 
@@ -271,42 +603,328 @@ class FlatResults:
 
             self.friendly_names[version.compare_name] = f"fork-{best_tag}"
 
+    def column(self, name: str) -> Sequence[Any]:
+        """Returns the value of the given field for every row, or None for rows that do not have the field.
+
+        In addition to the fields of the flattened rows, `xemu_version_ordinal` provides the ordinal of each row's
+        version in `versions`. `xemu_version_obj` values are taken from `versions` and include the ordinal. `machine`
+        provides the ID of each row's environment in `machines`, whose fields may also be read individually.
+        """
+        if name == "xemu_version_ordinal":
+            return [self.versions.ordinal(version) for version in self.column("xemu_version")]
+        if name == "xemu_version_obj":
+            return [self.versions.version_object(version) for version in self.column("xemu_version")]
+
+        if name == "machine":
+            return self._machine_codes
+        if name == "environment" or name in MACHINE_FIELDS:
+            values = self.machines.environments if name == "environment" else self.machines.field_values(name)
+            return [values[code] for code in self._machine_codes]
+
+        if self.columns is not None:
+            return self.columns.column(name)
+        return [row.get(name) for row in self.flattened_results]
+
+    def column_getter(self, name: str) -> Callable[[int], Any]:
+        """Returns a function that reads the value of the given field, as `column` would, from the row at an index."""
+        if name in {"xemu_version_ordinal", "xemu_version_obj"}:
+            version = self.column_getter("xemu_version")
+            convert = self.versions.ordinal if name == "xemu_version_ordinal" else self.versions.version_object
+            return lambda index: convert(version(index))
+
+        if name == "machine":
+            return self._machine_codes.__getitem__
+        if name == "environment" or name in MACHINE_FIELDS:
+            values = self.machines.environments if name == "environment" else self.machines.field_values(name)
+            codes = self._machine_codes
+            return lambda index: values[codes[index]]
+
+        if self.columns is not None:
+            return self.columns.column_getter(name)
+        rows = self.flattened_results
+        return lambda index: rows[index].get(name)
+
+    def hardware_changes(self) -> list[HardwareChange]:
+        """Returns each point at which the hardware of a machine differs from its results for the preceding version."""
+        return find_hardware_changes(
+            self.column("environment"), self.column("xemu_version"), self.column("xemu_version_ordinal")
+        )
+
+    def query(self) -> ResultQuery:
+        """Returns a query over every row, building the `ResultIndex` on first use. See `ResultQuery`."""
+        if self._query_index is None:
+            self._query_index = ResultIndex(self)
+        return self._query_index.query()
+
+    def set_column(self, name: str, values: Sequence[str]):
+        """Sets the given string field on every row."""
+        if self.columns is not None:
+            self.columns.set_column(name, values)
+            return
+
+        for row, value in zip(self.flattened_results, values, strict=True):
+            row[name] = value
+
 
 def _expand_gpu_info(result: dict[str, Any]):
-    result["gpu_vendor"] = None
-    result["gpu_renderer"] = None
-    result["gpu_gl_version"] = None
-    result["gpu_glsl_version"] = None
-
-    for line in result["xemu_machine_info"].splitlines():
-        entry = line.split(": ", maxsplit=1)
-        if len(entry) != 2:
+    result.update(parse_gpu_info(result["xemu_machine_info"]))
+
+
+def _parse_result(content: bytes, result_file: str) -> dict[str, Any]:
+    with profiling.stage("parse_json"):
+        result = json.loads(content)
+    profiling.count("parse_json", num_bytes=len(content))
+    with profiling.stage("expand_gpu_info"):
+        _expand_gpu_info(result)
+    # The stable machine ID + renderer backend is the json file without the ".json"
+    result["machine_id_with_renderer"] = os.path.basename(result_file)[:-5]
+    # The renderer backend is one of "-GL" or "-VK"
+    result["machine_id"] = os.path.basename(result_file)[:-8]
+    return result
+
+
+def _flatten_result_contents(contents: Sequence[bytes], result_files: Sequence[str]) -> list[list[dict[str, Any]]]:
+    """Parses and flattens the content of the given result files together, returning the rows of each file."""
+    results = [_parse_result(content, result_file) for content, result_file in zip(contents, result_files, strict=True)]
+    with profiling.stage("flatten"):
+        rows_by_file = flatten_results_by_file(results)
+    profiling.count("flatten", rows=sum(len(rows) for rows in rows_by_file))
+    return rows_by_file
+
+
+def flatten_packed_results(pack: PackedResults) -> list[dict[str, Any]]:
+    """Produces the rows of `flatten_results` for every result file in the given pack directly from its arrays."""
+    test_names = pack.test_names
+    return _flatten_columns(
+        pack.documents,
+        pack.entry_rows,
+        [test_names[code] for code in pack.name_codes.tolist()],
+        pack.timings,
+        pack.raw_values,
+        pack.raw_offsets,
+    )
+
+
+def _find_result_files(results_dirs: list[str]) -> Iterator[tuple[str, str]]:
+    """Yields (results_dir, result_file) for every result JSON file in the given directories."""
+    for results_dir in results_dirs:
+        with profiling.stage("find_result_files"):
+            result_files = glob.glob("**/*.json", root_dir=results_dir, recursive=True)
+        for result_file in result_files:
+            yield results_dir, result_file
+
+
+def _iter_sources(results_paths: list[str]) -> Iterator[tuple[list[str], str | None]]:
+    """Groups the given results paths into runs of directories and individual pack files, preserving their order.
+
+    Yields ([results_dir, ...], None) for each run of directories and ([], pack_file) for each pack file.
+    """
+    results_dirs: list[str] = []
+    for path in results_paths:
+        if not is_pack_file(path):
+            results_dirs.append(path)
+            continue
+        if results_dirs:
+            yield results_dirs, None
+            results_dirs = []
+        yield [], path
+    if results_dirs:
+        yield results_dirs, None
+
+
+def is_results_source(path: str) -> bool:
+    """Returns True if the given path is a directory of result JSON files or a pack file written by `write_pack`."""
+    return os.path.isdir(path) or is_pack_file(path)
+
+
+def iter_results(results_dirs: list[str]) -> Iterator[dict[str, Any]]:
+    """Yields each benchmark result JSON file from the given directories, loading one file at a time.
+
+    Paths that are pack files produced by `write_pack` are read in place of a directory.
+    """
+    for source_dirs, pack_file in _iter_sources(results_dirs):
+        if pack_file:
+            with PackedResults(pack_file) as pack:
+                yield from pack.iter_results()
             continue
 
-        key, value = entry
-        if key == "GL_VENDOR":
-            result["gpu_vendor"] = value
-        elif key == "GL_RENDERER":
-            result["gpu_renderer"] = value
-        elif key == "GL_VERSION":
-            result["gpu_gl_version"] = value
-        elif key == "GL_SHADING_LANGUAGE_VERSION":
-            result["gpu_glsl_version"] = value
+        for results_dir, result_file in _find_result_files(source_dirs):
+            with profiling.stage("read_files"), open(os.path.join(results_dir, result_file), "rb") as infile:
+                content = infile.read()
+            profiling.count("read_files", num_bytes=len(content))
+            yield _parse_result(content, result_file)
 
 
 def load_results(results_dirs: list[str]) -> list[dict[str, Any]]:
-    """Loads benchmark result JSON files from the given directories."""
-    results = []
+    """Loads benchmark result JSON files from the given directories or pack files."""
+    return list(iter_results(results_dirs))
+
+
+def _read_result_file(full_path: str) -> bytes:
+    with profiling.stage("read_files"), open(full_path, "rb") as infile:
+        content = infile.read()
+    profiling.count("read_files", num_bytes=len(content))
+    return content
+
+
+def _load_flattened_result_files(full_paths: Sequence[str], cache: ResultCache | None) -> list[list[dict[str, Any]]]:
+    """Loads and flattens the given result files together, returning the rows of each file.
+
+    If a `ResultCache` is provided, only files that are missing from the cache or have changed are parsed.
+    """
+    rows_by_file: list[list[dict[str, Any]] | None] = []
+    missing_indices: list[int] = []
+    missing_contents: list[bytes] = []
+    for full_path in full_paths:
+        rows, content = cache.get_or_read(full_path) if cache is not None else (None, _read_result_file(full_path))
+        if rows is None:
+            missing_indices.append(len(rows_by_file))
+            missing_contents.append(content)
+        rows_by_file.append(rows)
+
+    if missing_indices:
+        missing_paths = [full_paths[index] for index in missing_indices]
+        loaded = _flatten_result_contents(missing_contents, missing_paths)
+        for index, full_path, content, rows in zip(
+            missing_indices, missing_paths, missing_contents, loaded, strict=True
+        ):
+            rows_by_file[index] = rows
+            if cache is not None:
+                cache.put(full_path, rows, content_digest(content))
+
+    return [rows or [] for rows in rows_by_file]
+
+
+def load_flattened_result_file(full_path: str, *, cache: ResultCache | None = None) -> list[dict[str, Any]]:
+    """Loads and flattens a single benchmark result JSON file, consulting the given `ResultCache` if provided."""
+    return _load_flattened_result_files([full_path], cache)[0]
+
+
+def _load_flattened_result_files_with_digests(
+    full_paths: list[str], contents: list[bytes] | None
+) -> list[tuple[list[dict[str, Any]], str]]:
+    """Loads and flattens the given files together, returning the rows of each file and the digest of its content.
+
+    `contents` holds the content of each file if it has already been read, e.g., by `ResultCache.get_or_read`.
+    """
+    if contents is None:
+        contents = []
+        for full_path in full_paths:
+            with open(full_path, "rb") as infile:
+                contents.append(infile.read())
+    rows_by_file = _flatten_result_contents(contents, full_paths)
+    return [(rows, content_digest(content)) for rows, content in zip(rows_by_file, contents, strict=True)]
+
+
+def _iter_flattened_result_files_parallel(
+    full_paths: list[str], cache: ResultCache | None, jobs: int
+) -> Iterator[list[dict[str, Any]]]:
+    """Loads and flattens the given files across a pool of worker processes, yielding the rows of each file in the order
+    of `full_paths`.
+
+    Files are handed to workers in batches of `_FILES_PER_TASK`, omitting those whose rows are cached. Workers read the
+    files themselves unless a cache is provided, in which case the content read to validate each cache entry is passed
+    on. At most a few batches per worker are loaded ahead of the consumer so that memory use does not grow with the
+    number of files.
+    """
+    max_loading = jobs * 2
+    pending: deque[
+        tuple[list[str], list[list[dict[str, Any]] | None], Future[list[tuple[list[dict[str, Any]], str]]] | None]
+    ] = deque()
+    num_loading = 0
+
+    def _finish(
+        batch: list[str],
+        cached_rows: list[list[dict[str, Any]] | None],
+        future: Future[list[tuple[list[dict[str, Any]], str]]] | None,
+    ) -> Iterator[list[dict[str, Any]]]:
+        loaded = iter(future.result() if future is not None else ())
+        for full_path, rows in zip(batch, cached_rows, strict=True):
+            if rows is not None:
+                yield rows
+                continue
+            loaded_rows, digest = next(loaded)
+            if cache is not None:
+                cache.put(full_path, loaded_rows, digest)
+            yield loaded_rows
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for batch in _batched(full_paths, _FILES_PER_TASK):
+            cached_rows: list[list[dict[str, Any]] | None] = []
+            missing: list[str] = []
+            missing_contents: list[bytes] | None = None
+            if cache is None:
+                cached_rows = [None] * len(batch)
+                missing = batch
+            else:
+                missing_contents = []
+                for full_path in batch:
+                    rows, content = cache.get_or_read(full_path)
+                    cached_rows.append(rows)
+                    if rows is None:
+                        missing.append(full_path)
+                        missing_contents.append(content)
+            future = (
+                executor.submit(_load_flattened_result_files_with_digests, missing, missing_contents)
+                if missing
+                else None
+            )
+            pending.append((batch, cached_rows, future))
+            if future is not None:
+                num_loading += 1
+
+            while pending and (pending[0][2] is None or num_loading >= max_loading):
+                entry = pending.popleft()
+                if entry[2] is not None:
+                    num_loading -= 1
+                yield from _finish(*entry)
+
+        while pending:
+            yield from _finish(*pending.popleft())
+
+
+def iter_flattened_results(
+    results_dirs: list[str], *, cache: ResultCache | None = None, jobs: int = 1
+) -> Iterator[dict[str, Any]]:
+    """Yields the flattened rows of the benchmark result JSON files in the given directories.
+
+    Files are loaded and flattened in batches (split across worker processes if `jobs` is greater than 1) and each
+    parsed document is discarded once its rows have been yielded, so memory use is bounded by the size of a few batches
+    rather than by the total size of the results. Rows are always yielded in the same order.
+
+    If a `ResultCache` is provided, only files that are new or have changed since the cache was last saved are parsed.
+    The cache is saved once all rows have been yielded.
+
+    Paths that are pack files produced by `write_pack` are flattened directly from the pack, bypassing the cache.
+    """
+    for source_dirs, pack_file in _iter_sources(results_dirs):
+        if pack_file:
+            with PackedResults(pack_file) as pack, profiling.stage("flatten"):
+                rows = flatten_packed_results(pack)
+            profiling.count("flatten", rows=len(rows))
+            yield from rows
+            continue
 
-    for results_dir in results_dirs:
-        for result_file in glob.glob("**/*.json", root_dir=results_dir, recursive=True):
-            with open(os.path.join(results_dir, result_file), "rb") as infile:
-                result = json.load(infile)
-                _expand_gpu_info(result)
-                # The stable machine ID + renderer backend is the json file without the ".json"
-                result["machine_id_with_renderer"] = os.path.basename(result_file)[:-5]
-                # The renderer backend is one of "-GL" or "-VK"
-                result["machine_id"] = os.path.basename(result_file)[:-8]
-                results.append(result)
-
-    return results
+        full_paths = [
+            os.path.join(results_dir, result_file) for results_dir, result_file in _find_result_files(source_dirs)
+        ]
+        if jobs > 1:
+            for rows in _iter_flattened_result_files_parallel(full_paths, cache, jobs):
+                yield from rows
+        else:
+            for batch in _batched(full_paths, _FLATTEN_BATCH_FILES):
+                for rows in _load_flattened_result_files(batch, cache):
+                    yield from rows
+
+    if cache is not None:
+        cache.save()
+
+
+def load_flattened_results(
+    results_dirs: list[str], *, cache: ResultCache | None = None, jobs: int = 1
+) -> list[dict[str, Any]]:
+    """Loads and flattens benchmark result JSON files from the given directories.
+
+    See `iter_flattened_results`.
+    """
+    return list(iter_flattened_results(results_dirs, cache=cache, jobs=jobs))
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import functools
+import itertools
+from dataclasses import dataclass, fields
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+
+# Keys of the lines of `xemu_machine_info` describing the GPU, and the result fields they are stored in.
+_GPU_INFO_KEYS = {
+    "GL_VENDOR": "gpu_vendor",
+    "GL_RENDERER": "gpu_renderer",
+    "GL_VERSION": "gpu_gl_version",
+    "GL_SHADING_LANGUAGE_VERSION": "gpu_glsl_version",
+}
+
+
+@dataclass(frozen=True, slots=True)
+class MachineEnvironment:
+    """Describes the machine and environment that produced a result file, as displayed by the report.
+
+    Environments are immutable and, when created by `machine_environment`, equal environments are the same object, so
+    the rows of every result file produced by the same environment share a single instance.
+    """
+
+    os_system: str
+    cpu_manufacturer: str
+    cpu_freq_max: float
+    gpu_vendor: str | None
+    gpu_renderer: str | None
+    machine_id: str
+    machine_id_with_renderer: str
+    display_refresh_rate_hz: float | None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {field: getattr(self, field) for field in MACHINE_FIELDS}
+
+    @property
+    def hardware(self) -> tuple[Any, ...]:
+        return tuple(getattr(self, field) for field in HARDWARE_FIELDS)
+
+
+# Fields describing the machine and environment that produced a result, in the order in which they appear in rows
+# reconstructed by `ColumnarResults.row` and in the emitted machine tables.
+MACHINE_FIELDS = tuple(field.name for field in fields(MachineEnvironment))
+
+# Fields of a `MachineEnvironment` that identify the hardware of a machine. Other fields, such as the display refresh
+# rate, may legitimately differ between runs on the same hardware.
+HARDWARE_FIELDS = ("cpu_manufacturer", "cpu_freq_max", "gpu_vendor", "gpu_renderer")
+
+
+def _patch_gpu_renderer(gpu: str | None, cpu: str) -> str | None:
+    """Replace generic integrated graphics messages with CPU info."""
+    return cpu if gpu == "AMD Radeon (TM) Graphics" else gpu
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_gpu_info_lines(text: str) -> tuple[tuple[str, str], ...]:
+    ret = {}
+    for line in text.splitlines():
+        key, separator, value = line.partition(": ")
+        if separator and key in _GPU_INFO_KEYS:
+            ret[_GPU_INFO_KEYS[key]] = value
+    return tuple(ret.items())
+
+
+def parse_gpu_info(xemu_machine_info: str) -> dict[str, str | None]:
+    """Extracts the GPU description from the `xemu_machine_info` log text of a result file.
+
+    The GPU lines follow the build information, which differs for every xemu version, but are otherwise identical for
+    each run on the same machine. Only the text from the first GPU line onward is parsed, and parsed once per distinct
+    text.
+    """
+    ret: dict[str, str | None] = dict.fromkeys(_GPU_INFO_KEYS.values())
+    if xemu_machine_info.startswith("GL_"):
+        start = 0
+    else:
+        start = xemu_machine_info.find("\nGL_") + 1
+        if not start:
+            return ret
+    ret.update(_parse_gpu_info_lines(xemu_machine_info[start:]))
+    return ret
+
+
+@functools.lru_cache(maxsize=4096)
+def _normalized_environment(
+    os_system: str,
+    cpu_manufacturer: str,
+    cpu_freq_max: float,
+    gpu_vendor: str | None,
+    gpu_renderer: str | None,
+    machine_id: str,
+    machine_id_with_renderer: str,
+    display_refresh_rate_hz: float | None,
+) -> MachineEnvironment:
+    return MachineEnvironment(
+        os_system=os_system,
+        cpu_manufacturer=cpu_manufacturer,
+        cpu_freq_max=cpu_freq_max,
+        gpu_vendor=gpu_vendor,
+        gpu_renderer=_patch_gpu_renderer(gpu_renderer, cpu_manufacturer),
+        machine_id=machine_id,
+        machine_id_with_renderer=machine_id_with_renderer,
+        display_refresh_rate_hz=display_refresh_rate_hz,
+    )
+
+
+def machine_environment(result: dict[str, Any]) -> MachineEnvironment:
+    """Returns the normalized environment of a loaded result file (see `data.iter_results`).
+
+    Environments are normalized once per distinct set of values and shared by every result file having them.
+    """
+    machine_info = result["machine_info"]
+    return _normalized_environment(
+        machine_info["os_system"],
+        machine_info["cpu_manufacturer"],
+        machine_info["cpu_freq_max"],
+        result["gpu_vendor"],
+        result["gpu_renderer"],
+        result["machine_id"],
+        result["machine_id_with_renderer"],
+        machine_info.get("display_refresh_rate_hz"),
+    )
+
+
+class MachineRegistry:
+    """Assigns a dense ID to each distinct `MachineEnvironment`, by which rows refer to the machine that produced them.
+
+    A machine (identified by `machine_id_with_renderer`) has one environment per distinct configuration it has run
+    with, e.g., a new ID is assigned if its GPU is replaced. See `find_hardware_changes`.
+    """
+
+    def __init__(self):
+        self.environments: list[MachineEnvironment] = []
+        self._ids: dict[MachineEnvironment, int] = {}
+        self._dicts: list[dict[str, Any]] = []
+        # The most recently registered environment and its ID. Consecutive rows usually come from the same result file.
+        self._last: tuple[MachineEnvironment | None, int] = (None, 0)
+
+    def __len__(self) -> int:
+        return len(self.environments)
+
+    def register(self, environment: MachineEnvironment) -> int:
+        """Returns the ID of the given environment, assigning one if it has not been seen before."""
+        last_environment, last_code = self._last
+        if environment is last_environment:
+            return last_code
+
+        code = self._ids.get(environment)
+        if code is None:
+            code = len(self.environments)
+            self._ids[environment] = code
+            self.environments.append(environment)
+            self._dicts.append(environment.to_dict())
+        self._last = (environment, code)
+        return code
+
+    def environment(self, code: int) -> MachineEnvironment:
+        return self.environments[code]
+
+    def as_dict(self, code: int) -> dict[str, Any]:
+        """Returns the fields of the environment with the given ID. The returned dict must not be modified."""
+        return self._dicts[code]
+
+    def field_values(self, name: str) -> list[Any]:
+        """Returns the value of the given `MACHINE_FIELDS` entry for each environment, indexed by ID."""
+        return [getattr(environment, name) for environment in self.environments]
+
+
+@dataclass(frozen=True)
+class HardwareChange:
+    """A change in the hardware of a machine between its results for two consecutive xemu versions."""
+
+    machine_id_with_renderer: str
+    previous_version: str
+    version: str
+    previous: MachineEnvironment
+    current: MachineEnvironment
+
+    @property
+    def changed_fields(self) -> list[str]:
+        return [
+            field
+            for field, before, after in zip(HARDWARE_FIELDS, self.previous.hardware, self.current.hardware, strict=True)
+            if before != after
+        ]
+
+
+def find_hardware_changes(
+    environments: Iterable[MachineEnvironment], versions: Iterable[str], ordinals: Iterable[int]
+) -> list[HardwareChange]:
+    """Finds each point at which a machine's hardware differs from that of its results for the preceding xemu version.
+
+    The arguments are per-row columns (e.g., of a `FlatResults`), whose values are only examined once per result file.
+    Changes are ordered by machine and then by version.
+    """
+    runs = sorted(
+        {
+            (environment.machine_id_with_renderer, ordinal, version, environment)
+            for environment, version, ordinal in zip(environments, versions, ordinals, strict=True)
+        },
+        key=lambda run: run[:2],
+    )
+
+    changes = []
+    for machine_id_with_renderer, machine_runs in itertools.groupby(runs, key=lambda run: run[0]):
+        for (_machine, _ordinal, previous_version, previous), (_, _, version, current) in itertools.pairwise(
+            machine_runs
+        ):
+            if previous.hardware != current.hardware:
+                changes.append(HardwareChange(machine_id_with_renderer, previous_version, version, previous, current))
+    return changes
+
+
+def hardware_change_points(
+    environments: Sequence[MachineEnvironment], before_rows: Iterable[int], after_rows: Iterable[int]
+) -> list[bool]:
+    """Returns whether the hardware differs between the rows of each pair, e.g., either side of a change point."""
+    return [
+        environments[before].hardware != environments[after].hardware
+        for before, after in zip(before_rows, after_rows, strict=True)
+    ]
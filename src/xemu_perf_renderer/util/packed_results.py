@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+import bisect
+import json
+import logging
+import mmap
+import os
+import struct
+from array import array
+from typing import TYPE_CHECKING, Any, BinaryIO, Self
+
+import numpy as np
+
+from xemu_perf_renderer.util import profiling
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Sequence
+
+logger = logging.getLogger(__name__)
+
+PACK_MAGIC = b"XPRPACK\x00"
+
+# Increment whenever the layout of pack files changes. Packs of other versions must be rebuilt from the JSON results.
+PACK_FORMAT_VERSION = 1
+
+# Magic, format version, and the offset and length of the metadata section.
+_HEADER = struct.Struct("<8sIxxxxQQ")
+
+# Arrays are aligned so that they may be viewed in place regardless of their element type.
+_ALIGNMENT = 64
+
+# Per-test timing fields stored as int64 arrays, in the order in which they appear in result files.
+TIMING_FIELDS = ("iterations", "total_us", "average_us", "min_us", "max_us")
+
+# Each entry of the index addresses one result file by codes into the sorted `versions`, `machines`, and `renderers`
+# tables, so the index is ordered by (xemu version, machine ID, renderer).
+_INDEX_DTYPE = np.dtype([("version", "<u4"), ("machine", "<u4"), ("renderer", "<u4"), ("entry", "<u4")])
+
+
+def is_pack_file(path: str) -> bool:
+    """Returns True if the given path is a packed results file."""
+    if not os.path.isfile(path):
+        return False
+    with open(path, "rb") as infile:
+        return infile.read(len(PACK_MAGIC)) == PACK_MAGIC
+
+
+class _StringTable:
+    def __init__(self):
+        self.values: list[str] = []
+        self._codes: dict[str, int] = {}
+
+    def intern(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+
+
+def _write_array(outfile: BinaryIO, values: np.ndarray) -> dict[str, Any]:
+    """Writes the given array at the next aligned offset, returning its description for the metadata section."""
+    padding = -outfile.tell() % _ALIGNMENT
+    outfile.write(b"\0" * padding)
+    offset = outfile.tell()
+    outfile.write(values.tobytes())
+    dtype = values.dtype.descr if values.dtype.names else values.dtype.str
+    return {"dtype": dtype, "offset": offset, "count": len(values)}
+
+
+def _read_dtype(description: str | list[list[str]]) -> np.dtype:
+    """Returns the dtype described by the metadata written by `_write_array`."""
+    if isinstance(description, list):
+        return np.dtype([(name, field_type) for name, field_type in description])
+    return np.dtype(description)
+
+
+def write_pack(results: Iterable[dict[str, Any]], pack_file: str) -> tuple[int, int]:
+    """Writes the given loaded result files (e.g., from `data.iter_results`) to a single pack file.
+
+    The document of each result file other than its test results is kept in a JSON metadata section. The test results
+    of every file are concatenated into columns of per-test timing values and test name codes, and the raw samples of
+    every test are concatenated into a single array addressed by per-test offsets. Result files keep their input order,
+    and an index sorted by (xemu version, machine ID, renderer) maps each key to its file.
+
+    Returns the number of files and tests written.
+    """
+    names = _StringTable()
+    name_codes = array("L")
+    timings = {field: array("q") for field in TIMING_FIELDS}
+    has_raw = bytearray()
+    raw_offsets = array("q", [0])
+    raw_values = array("q")
+    entry_rows = array("q", [0])
+    documents: list[dict[str, Any]] = []
+    keys: list[tuple[str, str, str]] = []
+
+    for result in results:
+        test_results = result.get("results")
+        # The results are replaced by a placeholder so that the keys of the document keep their order.
+        documents.append({key: None if key == "results" else value for key, value in result.items()})
+        keys.append((result["xemu_version"], result["machine_id"], result["renderer"]))
+
+        for test_result in test_results or []:
+            name_codes.append(names.intern(test_result["name"]))
+            for field in TIMING_FIELDS:
+                timings[field].append(test_result[field])
+            samples = test_result.get("raw_results")
+            has_raw.append(samples is not None)
+            raw_values.extend(samples or [])
+            raw_offsets.append(len(raw_values))
+        entry_rows.append(len(name_codes))
+
+    versions = sorted({version for version, _machine, _renderer in keys})
+    machines = sorted({machine for _version, machine, _renderer in keys})
+    renderers = sorted({renderer for _version, _machine, renderer in keys})
+    index = np.array(
+        sorted(
+            (
+                bisect.bisect_left(versions, version),
+                bisect.bisect_left(machines, machine),
+                bisect.bisect_left(renderers, renderer),
+                entry,
+            )
+            for entry, (version, machine, renderer) in enumerate(keys)
+        ),
+        dtype=_INDEX_DTYPE,
+    )
+
+    temp_file = f"{pack_file}.tmp"
+    with open(temp_file, "wb") as outfile:
+        outfile.write(b"\0" * _HEADER.size)
+        arrays = {
+            "index": _write_array(outfile, index),
+            "entry_rows": _write_array(outfile, np.frombuffer(entry_rows, dtype="<i8")),
+            "name_codes": _write_array(outfile, np.array(name_codes, dtype="<u4")),
+            "has_raw": _write_array(outfile, np.frombuffer(has_raw, dtype=np.uint8)),
+            "raw_offsets": _write_array(outfile, np.frombuffer(raw_offsets, dtype="<i8")),
+            "raw_values": _write_array(outfile, np.frombuffer(raw_values, dtype="<i8")),
+        }
+        for field in TIMING_FIELDS:
+            arrays[field] = _write_array(outfile, np.frombuffer(timings[field], dtype="<i8"))
+
+        metadata = json.dumps(
+            {
+                "arrays": arrays,
+                "test_names": names.values,
+                "versions": versions,
+                "machines": machines,
+                "renderers": renderers,
+                "documents": documents,
+            },
+            separators=(",", ":"),
+        ).encode("utf-8")
+        metadata_offset = outfile.tell()
+        outfile.write(metadata)
+
+        outfile.seek(0)
+        outfile.write(_HEADER.pack(PACK_MAGIC, PACK_FORMAT_VERSION, metadata_offset, len(metadata)))
+    os.replace(temp_file, pack_file)
+
+    return len(documents), len(name_codes)
+
+
+class PackedResults:
+    """Read-only view of a pack file written by `write_pack`.
+
+    The file is memory mapped and every numeric array is a view into the mapping, so opening a pack reads only its
+    metadata and the timing values are paged in as they are used. Arrays remain valid until `close` is called.
+
+    Tests are addressed by row, the rows of result file `entry` being `entry_rows[entry]:entry_rows[entry + 1]`.
+    """
+
+    def __init__(self, pack_file: str):
+        self.pack_file = pack_file
+
+        with profiling.stage("read_pack"):
+            with open(pack_file, "rb") as infile:
+                self._mmap = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+
+            magic, format_version, metadata_offset, metadata_length = (
+                _HEADER.unpack_from(self._mmap) if len(self._mmap) >= _HEADER.size else (b"", 0, 0, 0)
+            )
+            if magic != PACK_MAGIC:
+                self._mmap.close()
+                msg = f"'{pack_file}' is not a packed results file"
+                raise ValueError(msg)
+            if format_version != PACK_FORMAT_VERSION:
+                self._mmap.close()
+                msg = f"'{pack_file}' has format version {format_version}, expected {PACK_FORMAT_VERSION}"
+                raise ValueError(msg)
+
+            metadata = json.loads(self._mmap[metadata_offset : metadata_offset + metadata_length])
+        profiling.count("read_pack", num_bytes=metadata_length)
+
+        self.test_names: list[str] = metadata["test_names"]
+        self.versions: list[str] = metadata["versions"]
+        self.machines: list[str] = metadata["machines"]
+        self.renderers: list[str] = metadata["renderers"]
+        self.documents: list[dict[str, Any]] = metadata["documents"]
+
+        arrays = {
+            name: np.frombuffer(
+                self._mmap, dtype=_read_dtype(info["dtype"]), count=info["count"], offset=info["offset"]
+            )
+            for name, info in metadata["arrays"].items()
+        }
+        self.index: np.ndarray = arrays["index"]
+        self.entry_rows: np.ndarray = arrays["entry_rows"]
+        self.name_codes: np.ndarray = arrays["name_codes"]
+        self.has_raw: np.ndarray = arrays["has_raw"]
+        self.raw_offsets: np.ndarray = arrays["raw_offsets"]
+        self.raw_values: np.ndarray = arrays["raw_values"]
+        self.timings: dict[str, np.ndarray] = {field: arrays[field] for field in TIMING_FIELDS}
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args: object):
+        self.close()
+
+    def close(self):
+        """Releases the pack's arrays and unmaps the file.
+
+        If arrays obtained from the pack are still referenced, the file remains mapped until they are released.
+        """
+        self.index = self.entry_rows = self.name_codes = self.has_raw = np.empty(0)
+        self.raw_offsets = self.raw_values = np.empty(0)
+        self.timings = {}
+        try:
+            self._mmap.close()
+        except BufferError:
+            logger.debug("Arrays of '%s' are still in use, deferring unmapping", self.pack_file)
+
+    @property
+    def num_entries(self) -> int:
+        """The number of result files in the pack."""
+        return len(self.documents)
+
+    @property
+    def num_rows(self) -> int:
+        """The number of test results in the pack."""
+        return len(self.name_codes)
+
+    def raw_results(self, row: int) -> np.ndarray:
+        """Returns the raw samples of the given test result."""
+        return self.raw_values[self.raw_offsets[row] : self.raw_offsets[row + 1]]
+
+    def select(
+        self, *, version: str | None = None, machine_id: str | None = None, renderer: str | None = None
+    ) -> list[int]:
+        """Returns the result file entries matching all of the given keys, in index order."""
+        index = self.index
+        if version is not None:
+            code = bisect.bisect_left(self.versions, version)
+            if code == len(self.versions) or self.versions[code] != version:
+                return []
+            start, end = np.searchsorted(index["version"], [code, code + 1])
+            index = index[start:end]
+
+        mask = np.ones(len(index), dtype=bool)
+        for field, table, value in (("machine", self.machines, machine_id), ("renderer", self.renderers, renderer)):
+            if value is None:
+                continue
+            code = bisect.bisect_left(table, value)
+            if code == len(table) or table[code] != value:
+                return []
+            mask &= index[field] == code
+
+        return index["entry"][mask].tolist()
+
+    def iter_results(self, entries: Sequence[int] | None = None) -> Iterator[dict[str, Any]]:
+        """Yields the given result file entries (all entries by default) as loaded by `data.iter_results`."""
+        test_names = self.test_names
+        columns = [(field, self.timings[field]) for field in TIMING_FIELDS]
+
+        for entry in range(self.num_entries) if entries is None else entries:
+            result = dict(self.documents[entry])
+            if "results" not in result:
+                yield result
+                continue
+
+            start, end = self.entry_rows[entry : entry + 2].tolist()
+            names = [test_names[code] for code in self.name_codes[start:end].tolist()]
+            values = [column[start:end].tolist() for _field, column in columns]
+            has_raw = self.has_raw[start:end].tolist()
+
+            test_results = []
+            for offset, name in enumerate(names):
+                test_result: dict[str, Any] = {"name": name}
+                for (field, _column), column_values in zip(columns, values, strict=True):
+                    test_result[field] = column_values[offset]
+                if has_raw[offset]:
+                    test_result["raw_results"] = self.raw_results(start + offset).tolist()
+                test_results.append(test_result)
+
+            result["results"] = test_results
+            yield result
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import cProfile
+import json
+import logging
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Any
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+if TYPE_CHECKING:
+    import argparse
+    from collections.abc import Iterator
+
+logger = logging.getLogger(__name__)
+
+PROFILE_REPORT_FORMAT_VERSION = 1
+
+_BYTES_PER_MB = 1024 * 1024
+
+
+def _peak_rss_mb() -> float | None:
+    """Returns the peak resident set size of this process so far."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere.
+    return max_rss / _BYTES_PER_MB if sys.platform == "darwin" else max_rss / 1024
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    wall_s: float = 0
+    cpu_s: float = 0
+    rows: int = 0
+    bytes: int = 0
+    peak_rss_mb: float | None = None
+    peak_traced_mb: float | None = None
+
+
+@dataclass
+class _OpenStage:
+    stats: StageStats
+    wall_start: float
+    cpu_start: float
+    peak_traced: int = 0
+    profile: cProfile.Profile | None = None
+
+
+@dataclass
+class StageProfiler:
+    """Records the wall time, CPU time, row and byte counts, and peak memory use of named pipeline stages.
+
+    A stage may be entered repeatedly, in which case its statistics accumulate, and stages may nest, in which case the
+    time of the inner stage is included in that of the outer one. Work done in worker processes is not included.
+
+    If `trace_memory` is True, the peak memory allocated by Python during each stage is recorded via `tracemalloc`,
+    which slows allocation heavy stages considerably. If `profile_stages` is True, each outermost stage is run under
+    `cProfile` so that the hottest one may be written out by `write_hottest_profile`.
+    """
+
+    trace_memory: bool = False
+    profile_stages: bool = False
+    stages: dict[str, StageStats] = field(default_factory=dict)
+    _open_stages: list[_OpenStage] = field(default_factory=list)
+    _profiles: dict[str, cProfile.Profile] = field(default_factory=dict)
+    _wall_start: float = field(default_factory=time.perf_counter)
+    _cpu_start: float = field(default_factory=time.process_time)
+
+    def __post_init__(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _update_traced_peaks(self):
+        """Propagates the traced memory peak since the last stage transition to every open stage."""
+        if not self.trace_memory:
+            return
+        _current, peak = tracemalloc.get_traced_memory()
+        for open_stage in self._open_stages:
+            open_stage.peak_traced = max(open_stage.peak_traced, peak)
+        tracemalloc.reset_peak()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageStats]:
+        """Records the execution of the enclosed block as the given stage."""
+        stats = self.stages.setdefault(name, StageStats())
+        self._update_traced_peaks()
+
+        profile = None
+        if self.profile_stages and not self._open_stages:
+            profile = self._profiles.setdefault(name, cProfile.Profile())
+            profile.enable()
+
+        open_stage = _OpenStage(
+            stats=stats, wall_start=time.perf_counter(), cpu_start=time.process_time(), profile=profile
+        )
+        self._open_stages.append(open_stage)
+        try:
+            yield stats
+        finally:
+            stats.calls += 1
+            stats.wall_s += time.perf_counter() - open_stage.wall_start
+            stats.cpu_s += time.process_time() - open_stage.cpu_start
+            if profile is not None:
+                profile.disable()
+
+            self._update_traced_peaks()
+            self._open_stages.pop()
+            if self.trace_memory:
+                stats.peak_traced_mb = max(stats.peak_traced_mb or 0, open_stage.peak_traced / _BYTES_PER_MB)
+            stats.peak_rss_mb = _peak_rss_mb()
+
+    def count(self, name: str, *, rows: int = 0, num_bytes: int = 0):
+        """Adds to the number of rows and bytes processed by the given stage."""
+        stats = self.stages.setdefault(name, StageStats())
+        stats.rows += rows
+        stats.bytes += num_bytes
+
+    def report(self) -> dict[str, Any]:
+        return {
+            "format_version": PROFILE_REPORT_FORMAT_VERSION,
+            "command": sys.argv,
+            "total": {
+                "wall_s": time.perf_counter() - self._wall_start,
+                "cpu_s": time.process_time() - self._cpu_start,
+                "peak_rss_mb": _peak_rss_mb(),
+            },
+            "stages": {name: asdict(stats) for name, stats in self.stages.items()},
+        }
+
+    def write_report(self, report_file: str):
+        """Writes the statistics of every stage to the given file as JSON."""
+        os.makedirs(os.path.dirname(os.path.abspath(report_file)), exist_ok=True)
+        with open(report_file, "w", encoding="utf-8") as outfile:
+            json.dump(self.report(), outfile, indent=2)
+
+    def write_hottest_profile(self, stats_file: str) -> str | None:
+        """Writes the cProfile statistics of the outermost stage with the greatest wall time, returning its name.
+
+        The statistics are written in `pstats` format to the given file and as text to the same path with ".txt"
+        appended.
+        """
+        if not self._profiles:
+            return None
+
+        hottest = max(self._profiles, key=lambda name: self.stages[name].wall_s)
+        profile = self._profiles[hottest]
+        profile.dump_stats(stats_file)
+        with open(f"{stats_file}.txt", "w", encoding="utf-8") as outfile:
+            pstats.Stats(profile, stream=outfile).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(50)
+        return hottest
+
+
+_active_profiler: StageProfiler | None = None
+
+
+@contextmanager
+def activate(profiler: StageProfiler | None) -> Iterator[StageProfiler | None]:
+    """Installs the given profiler as the destination of `stage` and `count` for the enclosed block."""
+    global _active_profiler  # noqa: PLW0603 Using the global statement to update a variable is discouraged
+    previous = _active_profiler
+    _active_profiler = profiler
+    try:
+        yield profiler
+    finally:
+        _active_profiler = previous
+
+
+@contextmanager
+def stage(name: str) -> Iterator[StageStats | None]:
+    """Records the enclosed block as the given stage of the active profiler, if any."""
+    if _active_profiler is None:
+        yield None
+        return
+
+    with _active_profiler.stage(name) as stats:
+        yield stats
+
+
+def count(name: str, *, rows: int = 0, num_bytes: int = 0):
+    """Adds to the number of rows and bytes processed by the given stage of the active profiler, if any."""
+    if _active_profiler is not None:
+        _active_profiler.count(name, rows=rows, num_bytes=num_bytes)
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Adds the options consumed by `profile_from_args` to the given parser."""
+    parser.add_argument(
+        "--profile",
+        metavar="report_file",
+        help="Write the wall time, CPU time, row and byte counts, and peak memory use of each pipeline stage to the "
+        "given file as JSON.",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Also record the peak memory allocated during each stage via tracemalloc. Slows allocation heavy stages.",
+    )
+    parser.add_argument(
+        "--profile-hottest",
+        metavar="stats_file",
+        help="Run each stage under cProfile and write the statistics of the slowest one to the given file in pstats "
+        "format, with a text summary alongside it.",
+    )
+
+
+@contextmanager
+def profile_from_args(args: argparse.Namespace) -> Iterator[StageProfiler | None]:
+    """Profiles the enclosed block as requested by the options added by `add_arguments`, writing out the results."""
+    if not args.profile and not args.profile_hottest:
+        yield None
+        return
+
+    profiler = StageProfiler(trace_memory=args.profile_memory, profile_stages=bool(args.profile_hottest))
+    with activate(profiler):
+        yield profiler
+
+    if args.profile:
+        profiler.write_report(args.profile)
+        logger.info("Wrote profile report to '%s'", args.profile)
+    if args.profile_hottest:
+        hottest = profiler.write_hottest_profile(args.profile_hottest)
+        if hottest:
+            logger.info("Wrote cProfile statistics for stage '%s' to '%s'", hottest, args.profile_hottest)
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Collection, Iterator, Sequence
+from typing import TYPE_CHECKING, Any, overload
+
+import numpy as np
+
+from xemu_perf_renderer.util import profiling
+
+if TYPE_CHECKING:
+    from xemu_perf_renderer.util.data import FlatResults
+
+# Fields for which `ResultIndex` holds the rows having each distinct value. Rows are also indexed by version ordinal.
+# `machine` is the ID of each row's environment in `FlatResults.machines`, so grouping by it splits a machine's results
+# wherever its hardware changed.
+INDEXED_FIELDS = ("machine", "machine_id", "renderer", "suite", "test_name")
+
+_ORDINAL_FIELD = "xemu_version_ordinal"
+
+_NO_ROWS = np.empty(0, dtype=np.int64)
+
+
+class _FieldIndex:
+    """Dictionary encodes a field and holds the rows having each code, in row order."""
+
+    def __init__(self, values: Sequence[Any]):
+        self.codes_by_value: dict[Any, int] = {}
+        codes = np.fromiter(
+            (self.codes_by_value.setdefault(value, len(self.codes_by_value)) for value in values),
+            dtype=np.int64,
+            count=len(values),
+        )
+        self.values: list[Any] = list(self.codes_by_value)
+        self.codes = codes
+        # A stable sort keeps the rows of each code in ascending order.
+        self.order = np.argsort(codes, kind="stable")
+        self.starts = np.r_[0, np.cumsum(np.bincount(codes, minlength=len(self.values)))]
+
+    def rows(self, code: int) -> np.ndarray:
+        return self.order[self.starts[code] : self.starts[code + 1]]
+
+    def count(self, code: int) -> int:
+        return int(self.starts[code + 1] - self.starts[code])
+
+
+class ResultIndex:
+    """Row indexes over the rows of a `FlatResults`, built once so that queries cost time proportional to their matches.
+
+    Rows are indexed by each of the `INDEXED_FIELDS` and by version ordinal. The index reflects the rows at the time it
+    is built; `FlatResults.query` builds it on first use.
+    """
+
+    def __init__(self, results: FlatResults):
+        self.results = results
+
+        with profiling.stage("build_query_index"):
+            self.ordinals = np.asarray(results.column(_ORDINAL_FIELD), dtype=np.int64)
+            self._ordinal_order = np.argsort(self.ordinals, kind="stable")
+            self._ordinal_starts = np.searchsorted(
+                self.ordinals[self._ordinal_order], np.arange(len(results.versions) + 1)
+            )
+            self._fields = {field: _FieldIndex(results.column(field)) for field in INDEXED_FIELDS}
+        profiling.count("build_query_index", rows=len(self))
+
+    def __len__(self) -> int:
+        return len(self.ordinals)
+
+    def field(self, name: str) -> _FieldIndex:
+        index = self._fields.get(name)
+        if index is None:
+            msg = f"'{name}' is not indexed, expected one of {', '.join(INDEXED_FIELDS)}"
+            raise ValueError(msg)
+        return index
+
+    def values(self, name: str) -> list[Any]:
+        """Returns the distinct values of the given indexed field, in order of first appearance."""
+        return list(self.field(name).values)
+
+    def count(self, name: str, value: Any) -> int:
+        """Returns the number of rows having the given value of an indexed field."""
+        index = self.field(name)
+        code = index.codes_by_value.get(value)
+        return 0 if code is None else index.count(code)
+
+    def ordinal_rows(self, start: int, end: int) -> np.ndarray:
+        """Returns the rows whose version ordinal is within the given inclusive range, in row order."""
+        start = max(start, 0)
+        end = min(end, len(self.results.versions) - 1)
+        if start > end:
+            return _NO_ROWS
+        return np.sort(self._ordinal_order[self._ordinal_starts[start] : self._ordinal_starts[end + 1]])
+
+    def query(self) -> ResultQuery:
+        """Returns a query matching every row."""
+        return ResultQuery(self)
+
+
+def _codes_of(index: _FieldIndex, value: Any) -> list[int]:
+    """Returns the codes of the given value, or of each value of a collection of values, that appear in the index."""
+    values = value if isinstance(value, Collection) and not isinstance(value, str) else (value,)
+    return [code for code in (index.codes_by_value.get(item) for item in values) if code is not None]
+
+
+class ResultQuery:
+    """An immutable selection of rows of a `ResultIndex`, narrowed by chaining filters.
+
+    For example, the Vulkan results of one machine in a range of versions of a suite:
+
+        results.query().where(machine_id="...", renderer="VK", suite="...").versions("0.7.100", "0.8.50")
+
+    A query starting from every row is narrowed by its most selective indexed filter, and subsequent filters examine
+    only the rows already matched. Values are read through `column` and `select`, which return `ColumnView`s over the
+    matched rows rather than copies of them.
+    """
+
+    def __init__(self, index: ResultIndex, rows: np.ndarray | None = None):
+        self.index = index
+        # Indices of the matched rows in ascending order, or None if every row matches.
+        self._rows = rows
+
+    @property
+    def rows(self) -> np.ndarray:
+        """The indices of the matched rows in ascending order."""
+        if self._rows is None:
+            return np.arange(len(self.index), dtype=np.int64)
+        return self._rows
+
+    def __len__(self) -> int:
+        return len(self.index) if self._rows is None else len(self._rows)
+
+    def _narrow(self, rows: np.ndarray) -> ResultQuery:
+        return ResultQuery(self.index, rows)
+
+    def where(self, **criteria: Any) -> ResultQuery:
+        """Matches rows whose indexed fields have the given values.
+
+        Each value may be a single value or a collection of values, any one of which matches.
+        """
+        codes = {name: _codes_of(self.index.field(name), value) for name, value in criteria.items()}
+        if not codes:
+            return self
+
+        rows = self._rows
+        if rows is None:
+            # Start from the rows of the most selective criterion.
+            name = min(codes, key=lambda name: sum(self.index.field(name).count(code) for code in codes[name]))
+            field_index = self.index.field(name)
+            field_codes = codes.pop(name)
+            if len(field_codes) == 1:
+                rows = field_index.rows(field_codes[0])
+            else:
+                rows = np.sort(np.concatenate([field_index.rows(code) for code in field_codes] or [_NO_ROWS]))
+
+        for name, field_codes in codes.items():
+            rows = rows[np.isin(self.index.field(name).codes[rows], field_codes)]
+        return self._narrow(rows)
+
+    def ordinals(self, start: int | None = None, end: int | None = None) -> ResultQuery:
+        """Matches rows whose version ordinal is within the given inclusive range."""
+        start = 0 if start is None else start
+        end = len(self.index.results.versions) - 1 if end is None else end
+        if self._rows is None:
+            return self._narrow(self.index.ordinal_rows(start, end))
+
+        ordinals = self.index.ordinals[self._rows]
+        return self._narrow(self._rows[(ordinals >= start) & (ordinals <= end)])
+
+    def versions(self, start: str | None = None, end: str | None = None) -> ResultQuery:
+        """Matches rows between the given xemu versions (full version strings or short names), inclusive.
+
+        Raises ValueError if either version is not present in the results.
+        """
+        return self.ordinals(*self.index.results.versions.ordinal_range(start, end))
+
+    def filter(self, name: str, predicate: Callable[[Any], bool]) -> ResultQuery:
+        """Matches rows for which the given predicate is true of the value of a field."""
+        values = self.column(name)
+        return self._narrow(self.rows[np.fromiter(map(predicate, values), dtype=bool, count=len(values))])
+
+    def group_by(self, name: str) -> dict[Any, ResultQuery]:
+        """Splits the matched rows by the value of an indexed field, in order of the values' first appearance."""
+        field_index = self.index.field(name)
+        if self._rows is None:
+            return {value: self._narrow(field_index.rows(code)) for code, value in enumerate(field_index.values)}
+
+        codes = field_index.codes[self._rows]
+        order = np.argsort(codes, kind="stable")
+        unique_codes, starts = np.unique(codes[order], return_index=True)
+        ends = np.r_[starts[1:], len(order)]
+        return {
+            field_index.values[code]: self._narrow(self._rows[order[start:end]])
+            for code, start, end in zip(unique_codes.tolist(), starts.tolist(), ends.tolist(), strict=True)
+        }
+
+    def column(self, name: str) -> ColumnView:
+        """Returns the values of the given field for the matched rows, as `FlatResults.column` would."""
+        if name == _ORDINAL_FIELD:
+            ordinals = self.index.ordinals
+            return ColumnView(lambda row: int(ordinals[row]), self.rows)
+
+        if name in INDEXED_FIELDS:
+            field_index = self.index.field(name)
+            values = field_index.values
+            codes = field_index.codes
+            return ColumnView(lambda row: values[codes[row]], self.rows)
+
+        return ColumnView(self.index.results.column_getter(name), self.rows)
+
+    def select(self, *names: str) -> dict[str, ColumnView]:
+        """Returns views of the given fields for the matched rows, e.g., to construct a DataFrame."""
+        return {name: self.column(name) for name in names}
+
+
+class ColumnView(Sequence[Any]):
+    """Read-only sequence of the values of a field for a subset of rows, read from the underlying results on access."""
+
+    def __init__(self, getter: Callable[[int], Any], rows: np.ndarray):
+        self._getter = getter
+        self._rows = rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @overload
+    def __getitem__(self, index: int) -> Any: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> ColumnView: ...
+
+    def __getitem__(self, index: int | slice) -> Any:
+        if isinstance(index, slice):
+            return ColumnView(self._getter, self._rows[index])
+        return self._getter(int(self._rows[index]))
+
+    def __iter__(self) -> Iterator[Any]:
+        getter = self._getter
+        for row in self._rows.tolist():
+            yield getter(row)
+
+    def tolist(self) -> list[Any]:
+        return list(self)
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+# ruff: noqa: S301 `pickle` and modules that wrap it can be unsafe when used to deserialize untrusted data
+import functools
+import glob
+import hashlib
+import logging
+import os
+import pickle
+from dataclasses import dataclass
+from typing import Any
+
+from xemu_perf_renderer.util import profiling
+
+logger = logging.getLogger(__name__)
+
+# Increment whenever the structure of cached rows changes so that stale caches are discarded. Caches written by any
+# other revision of the package's source are also discarded (see `source_digest`).
+_CACHE_FORMAT_VERSION = 3
+
+_PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def content_digest(content: bytes) -> str:
+    """Returns the hash used to detect changes to the content of a result file."""
+    return hashlib.sha256(content).hexdigest()
+
+
+@functools.cache
+def source_digest() -> str:
+    """Returns a hash of the package's Python source, which determines the rows flattened from a result file."""
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob("**/*.py", root_dir=_PACKAGE_DIR, recursive=True)):
+        digest.update(path.replace(os.sep, "/").encode() + b"\0")
+        with open(os.path.join(_PACKAGE_DIR, path), "rb") as infile:
+            digest.update(infile.read())
+    return digest.hexdigest()
+
+
+@dataclass
+class _CacheEntry:
+    size: int
+    mtime_ns: int
+    digest: str
+    rows: list[dict[str, Any]]
+
+
+class ResultCache:
+    """Persists flattened result rows on disk so that unchanged result files need not be parsed again.
+
+    Entries are keyed by the absolute path of the result file and validated against the file's size and modification
+    time. If either differs (e.g., after a fresh git checkout), the content hash is used to decide whether the cached
+    rows are still valid.
+    """
+
+    def __init__(self, cache_file: str):
+        self.cache_file = cache_file
+        self._entries: dict[str, _CacheEntry] = {}
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+
+        self._load()
+
+    def _load(self):
+        if not os.path.isfile(self.cache_file):
+            return
+
+        try:
+            with profiling.stage("result_cache_load"), open(self.cache_file, "rb") as infile:
+                content = pickle.load(infile)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            logger.warning("Ignoring unreadable result cache '%s'", self.cache_file)
+            return
+
+        if not isinstance(content, dict) or content.get("version") != _CACHE_FORMAT_VERSION:
+            logger.info("Discarding result cache '%s' with mismatched format version", self.cache_file)
+            return
+        if content.get("source") != source_digest():
+            logger.info("Discarding result cache '%s' written by a different version of the renderer", self.cache_file)
+            return
+
+        self._entries = content["entries"]
+
+    def _lookup(self, key: str) -> tuple[list[dict[str, Any]] | None, bytes]:
+        """Returns the cached rows for the given file, or the file content if the cache entry is missing or stale."""
+        stat = os.stat(key)
+
+        entry = self._entries.get(key)
+        if entry and entry.size == stat.st_size and entry.mtime_ns == stat.st_mtime_ns:
+            self.hits += 1
+            return entry.rows, b""
+
+        with profiling.stage("read_files"), open(key, "rb") as infile:
+            content = infile.read()
+        profiling.count("read_files", num_bytes=len(content))
+
+        if entry and entry.digest == content_digest(content):
+            self.hits += 1
+            self._dirty = True
+            entry.size = stat.st_size
+            entry.mtime_ns = stat.st_mtime_ns
+            return entry.rows, b""
+
+        self.misses += 1
+        return None, content
+
+    def put(self, path: str, rows: list[dict[str, Any]], digest: str):
+        """Stores the rows loaded from the given file, whose content hashed to `digest`."""
+        key = os.path.abspath(path)
+        stat = os.stat(key)
+        self._entries[key] = _CacheEntry(size=stat.st_size, mtime_ns=stat.st_mtime_ns, digest=digest, rows=rows)
+        self._dirty = True
+
+    def get_or_read(self, path: str) -> tuple[list[dict[str, Any]] | None, bytes]:
+        """Returns the cached rows for the given file, or None and the content of the file if it is new or has changed.
+
+        Rows loaded from the content should be stored with `put`.
+        """
+        return self._lookup(os.path.abspath(path))
+
+    def save(self):
+        """Writes the cache to disk, dropping entries for files that no longer exist."""
+        stale_keys = [key for key in self._entries if not os.path.isfile(key)]
+        for key in stale_keys:
+            del self._entries[key]
+
+        logger.debug("Result cache: %d hits, %d misses, %d stale", self.hits, self.misses, len(stale_keys))
+
+        if not self._dirty and not stale_keys:
+            return
+
+        cache_dir = os.path.dirname(os.path.abspath(self.cache_file))
+        os.makedirs(cache_dir, exist_ok=True)
+
+        temp_file = f"{self.cache_file}.tmp"
+        with profiling.stage("result_cache_save"), open(temp_file, "wb") as outfile:
+            pickle.dump(
+                {"version": _CACHE_FORMAT_VERSION, "source": source_digest(), "entries": self._entries},
+                outfile,
+                pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(temp_file, self.cache_file)
+        self._dirty = False
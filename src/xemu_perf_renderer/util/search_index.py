@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from typing import TYPE_CHECKING, Any
+
+from xemu_perf_renderer.util.changepoints import IMPROVEMENT_CHANGE_POINT, REGRESSION_CHANGE_POINT
+from xemu_perf_renderer.util.compact_format import delta_encode
+from xemu_perf_renderer.util.trends import IMPROVING_TREND, STABLE_TREND, WORSENING_TREND
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from xemu_perf_renderer.util.compact_format import ColumnSource
+
+# Keep in sync with search_index.js
+SEARCH_INDEX_FORMAT_NAME = "xemu-perf-search-index"
+SEARCH_INDEX_FORMAT_VERSION = 1
+
+# Terms are indexed by each of their lowercased substrings of up to this many characters. Longer filter texts are
+# answered by intersecting the postings of their substrings of this length and checking the few remaining candidates.
+MAX_GRAM_LENGTH = 3
+
+# Row fields that are searched by the report's data filter as they are stored. Keep in sync with kSearchableDataFields
+# in app.js, which also includes the derived "xemu_short_version", "trend", and "change_point" fields.
+_DATA_FIELDS = ("cpu_manufacturer", "gpu_renderer", "gpu_vendor", "os_system", "renderer", "machine_id")
+
+# Keep in sync with expandTrendEnum and expandChangePointEnum in data.js
+_TREND_NAMES = {WORSENING_TREND: "Worsening", STABLE_TREND: "Stable", IMPROVING_TREND: "Improving"}
+_CHANGE_POINT_NAMES = {REGRESSION_CHANGE_POINT: "Step regression", IMPROVEMENT_CHANGE_POINT: "Step improvement"}
+
+
+def _grams(term: str) -> set[str]:
+    text = term.lower()
+    return {
+        text[start : start + length]
+        for length in range(1, MAX_GRAM_LENGTH + 1)
+        for start in range(len(text) - length + 1)
+    }
+
+
+def _index_terms(counts: dict[str, int]) -> dict[str, Any]:
+    """Indexes the given terms, which are sorted and referred to by their position in the sorted list.
+
+    `grams` maps each substring of up to `MAX_GRAM_LENGTH` characters to the delta encoded, ascending IDs of the terms
+    containing it.
+    """
+    terms = sorted(counts)
+    postings: dict[str, list[int]] = defaultdict(list)
+    for term_id, term in enumerate(terms):
+        for gram in _grams(term):
+            postings[gram].append(term_id)
+
+    return {
+        "terms": terms,
+        "counts": [counts[term] for term in terms],
+        "grams": {gram: delta_encode(term_ids) for gram, term_ids in sorted(postings.items())},
+    }
+
+
+def _machines_by_value(results: ColumnSource) -> dict[str, set[str]]:
+    """Returns the machines having each value of the searchable fields, as the fields are displayed by the report."""
+    # Values are displayed with the friendly name of their version, if any, as data.js does.
+    short_versions = {
+        version: results.friendly_names.get(version_object["compare"], version_object["short"])
+        for version, version_object in zip(
+            results.column("xemu_version"), results.column("xemu_version_obj"), strict=True
+        )
+    }
+
+    def _named(codes: Iterable[str | None], names: dict[str, str]) -> list[str | None]:
+        return [names.get(code) if code else None for code in codes]
+
+    columns = zip(
+        results.column("machine_id"),
+        [short_versions[version] for version in results.column("xemu_version")],
+        _named(results.column("trend"), _TREND_NAMES),
+        _named(results.column("change_point"), _CHANGE_POINT_NAMES),
+        *(results.column(field) for field in _DATA_FIELDS),
+        strict=True,
+    )
+
+    machines: dict[str, set[str]] = defaultdict(set)
+    for machine_id, *values in set(columns):
+        for value in values:
+            if value:
+                machines[value].add(machine_id)
+    return machines
+
+
+def compute_search_index(results: ColumnSource) -> dict[str, Any]:
+    """Indexes the test names and the values of the fields searched by the report's test and data filters.
+
+    Each test name is counted by its number of rows and each data value by the number of distinct machines having it,
+    the counts shown alongside the report's filter suggestions. The report answers the filters from the index rather
+    than by scanning its loaded rows.
+    """
+    return {
+        "format": SEARCH_INDEX_FORMAT_NAME,
+        "format_version": SEARCH_INDEX_FORMAT_VERSION,
+        "max_gram_length": MAX_GRAM_LENGTH,
+        "test_names": _index_terms(Counter(results.column("test_name"))),
+        "data_values": _index_terms(
+            {value: len(machine_ids) for value, machine_ids in _machines_by_value(results).items()}
+        ),
+    }
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import contextlib
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+from collections.abc import Iterator
+from typing import IO, Any
+
+from xemu_perf_renderer.util import profiling
+
+logger = logging.getLogger(__name__)
+
+BUILD_MANIFEST_FILENAME = "build_manifest.json"
+BUILD_MANIFEST_FORMAT_VERSION = 1
+
+# Number of hex digits of the content digest included in hashed filenames. Keep in sync with util/local_server.py.
+HASHED_FILENAME_DIGEST_LENGTH = 16
+
+
+def _digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def _file_digest(path: str) -> str | None:
+    try:
+        with open(path, "rb") as infile:
+            return _digest(infile.read())
+    except FileNotFoundError:
+        return None
+
+
+def _dump_json(data: dict[str, Any], outfile: IO[str], json_args: dict[str, Any]):
+    """Writes the given dict as JSON, streaming any `Iterator` values as arrays one element at a time."""
+    if not any(isinstance(value, Iterator) for value in data.values()):
+        json.dump(data, outfile, **json_args)
+        return
+
+    outfile.write("{")
+    for key_index, (key, value) in enumerate(data.items()):
+        if key_index:
+            outfile.write(",")
+        outfile.write(f"{json.dumps(key)}:")
+
+        if not isinstance(value, Iterator):
+            json.dump(value, outfile, **json_args)
+            continue
+
+        outfile.write("[")
+        for element_index, element in enumerate(value):
+            if element_index:
+                outfile.write(",")
+            json.dump(element, outfile, **json_args)
+        outfile.write("]")
+    outfile.write("}")
+
+
+class SiteWriter:
+    """Writes the files of a generated site into an output directory.
+
+    In incremental mode, a build manifest recording the digest of each artifact's uncompressed content (its input) and
+    of the file that was written (its output) is kept in the output directory. Artifacts whose content is unchanged
+    since the previous build are not rewritten, data artifacts are given content-hashed filenames so that they may be
+    cached indefinitely, and artifacts of the previous build that are no longer produced are removed by `finish`.
+
+    Static assets are always given content-hashed filenames, and outside of local site mode a gzipped copy is written
+    alongside each for hosts that serve precompressed files. Assets written by a previous build under other names are
+    removed by `finish` in either mode.
+
+    Gzipped artifacts are always written with a fixed timestamp so that identical content produces identical files.
+    """
+
+    def __init__(self, output_dir: str, *, local_site_mode: bool = False, incremental: bool = False):
+        self.output_dir = output_dir
+        self.local_site_mode = local_site_mode
+        self.incremental = incremental
+
+        self._previous_artifacts: dict[str, dict[str, str]] = self._load_manifest() if incremental else {}
+        self._artifacts: dict[str, dict[str, str]] = {}
+        # Patterns matching any content-hashed name of each asset written by this build.
+        self._asset_patterns: list[re.Pattern[str]] = []
+        self.num_written = 0
+        self.num_skipped = 0
+
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _load_manifest(self) -> dict[str, dict[str, str]]:
+        try:
+            with open(os.path.join(self.output_dir, BUILD_MANIFEST_FILENAME), encoding="utf-8") as infile:
+                manifest = json.load(infile)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError:
+            logger.warning("Ignoring unreadable build manifest in '%s'", self.output_dir)
+            return {}
+
+        if manifest.get("format_version") != BUILD_MANIFEST_FORMAT_VERSION:
+            logger.info("Ignoring build manifest with unsupported format version %s", manifest.get("format_version"))
+            return {}
+        return manifest["artifacts"]
+
+    def write_text(self, filename: str, text: str) -> str:
+        """Writes the given text to a file with the given name, returning the name."""
+        content = text.encode("utf-8")
+        self._write(filename, content, _digest(content), compress=False)
+        return filename
+
+    def write_json(self, basename: str, data: dict[str, Any], *, indent: int | None = None) -> str:
+        """Writes the given data as JSON (gzipped unless in local site mode), returning the name of the file.
+
+        `Iterator` values in `data` are serialized incrementally rather than being materialized unless in incremental
+        mode, where the name of the file includes a digest of its content.
+        """
+        json_args: dict[str, Any] = {"indent": indent} if indent else {"separators": (",", ":")}
+        extension = "json" if self.local_site_mode else "json.gz"
+
+        if not self.incremental and any(isinstance(value, Iterator) for value in data.values()):
+            # Encoding and compression are interleaved, so they are profiled as a single stage.
+            filename = f"{basename}.{extension}"
+            with profiling.stage("write_json_streamed"), self._open_for_write(filename) as outfile:
+                _dump_json(data, outfile, json_args)
+            self.num_written += 1
+            return filename
+
+        with profiling.stage("json_encode"):
+            buffer = io.StringIO()
+            _dump_json(data, buffer, json_args)
+            content = buffer.getvalue().encode("utf-8")
+        profiling.count("json_encode", num_bytes=len(content))
+        digest = _digest(content)
+
+        if self.incremental:
+            filename = f"{basename}.{digest[:HASHED_FILENAME_DIGEST_LENGTH]}.{extension}"
+        else:
+            filename = f"{basename}.{extension}"
+        self._write(filename, content, digest, compress=not self.local_site_mode)
+        return filename
+
+    def write_asset(self, basename: str, extension: str, text: str) -> str:
+        """Writes a static asset (e.g., "app", "js") under a content-hashed name, returning the name.
+
+        Unless in local site mode, the asset is also written gzipped to a file of the same name with a ".gz" suffix.
+        """
+        content = text.encode("utf-8")
+        digest = _digest(content)
+        filename = f"{basename}.{digest[:HASHED_FILENAME_DIGEST_LENGTH]}.{extension}"
+
+        self._write(filename, content, digest, compress=False)
+        if not self.local_site_mode:
+            self._write(f"{filename}.gz", content, digest, compress=True)
+
+        self._asset_patterns.append(
+            re.compile(
+                rf"{re.escape(basename)}\.[0-9a-f]{{{HASHED_FILENAME_DIGEST_LENGTH}}}\.{re.escape(extension)}(?:\.gz)?"
+            )
+        )
+        return filename
+
+    def _open_for_write(self, filename: str) -> IO[str]:
+        path = os.path.join(self.output_dir, filename)
+        if self.local_site_mode:
+            return open(path, "w", encoding="utf-8")
+        return io.TextIOWrapper(gzip.GzipFile(path, "wb", mtime=0), encoding="utf-8")
+
+    def _write(self, filename: str, content: bytes, content_digest: str, *, compress: bool):
+        path = os.path.join(self.output_dir, filename)
+
+        previous = self._previous_artifacts.get(filename)
+        if previous and previous["input"] == content_digest and _file_digest(path) == previous["output"]:
+            self._artifacts[filename] = previous
+            self.num_skipped += 1
+            return
+
+        output = content
+        if compress:
+            with profiling.stage("gzip"):
+                output = gzip.compress(content, mtime=0)
+            profiling.count("gzip", num_bytes=len(output))
+
+        temp_path = f"{path}.tmp"
+        with profiling.stage("write_files"), open(temp_path, "wb") as outfile:
+            outfile.write(output)
+        os.replace(temp_path, path)
+        profiling.count("write_files", num_bytes=len(output))
+
+        self._artifacts[filename] = {"input": content_digest, "output": _digest(output)}
+        self.num_written += 1
+
+    def finish(self):
+        """Removes artifacts of the previous build that were not produced by this one and saves the build manifest."""
+        if not self.incremental:
+            self._remove_stale_assets()
+            return
+
+        for filename in sorted(self._previous_artifacts.keys() - self._artifacts.keys()):
+            logger.debug("Removing stale artifact '%s'", filename)
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(self.output_dir, filename))
+
+        manifest = {
+            "format_version": BUILD_MANIFEST_FORMAT_VERSION,
+            "artifacts": dict(sorted(self._artifacts.items())),
+        }
+        manifest_path = os.path.join(self.output_dir, BUILD_MANIFEST_FILENAME)
+        temp_path = f"{manifest_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as outfile:
+            json.dump(manifest, outfile, indent=2)
+        os.replace(temp_path, manifest_path)
+
+        logger.info("Wrote %d artifacts, %d were unchanged", self.num_written, self.num_skipped)
+
+    def _remove_stale_assets(self):
+        """Removes other content-hashed versions of the assets written by this build.
+
+        Incremental builds remove them through the build manifest, but other builds have no record of previous names.
+        """
+        if not self._asset_patterns:
+            return
+
+        for filename in sorted(os.listdir(self.output_dir)):
+            if filename in self._artifacts or not any(pattern.fullmatch(filename) for pattern in self._asset_patterns):
+                continue
+            logger.debug("Removing stale asset '%s'", filename)
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(self.output_dir, filename))
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+from xemu_perf_renderer.util.columnar import DimensionTable
+
+if TYPE_CHECKING:
+    from xemu_perf_renderer.util.compact_format import ColumnSource
+    from xemu_perf_renderer.util.machines import MachineEnvironment
+
+# Keep in sync with data.js
+SUMMARY_FORMAT_NAME = "xemu-perf-summary"
+SUMMARY_FORMAT_VERSION = 2
+
+
+@dataclass
+class _Aggregate:
+    count: int = 0
+    sum_average_us: float = 0
+    min_average_us: float = math.inf
+    max_average_us: float = -math.inf
+    sum_average_us_exmax: float = 0
+    min_average_us_exmax: float = math.inf
+    max_average_us_exmax: float = -math.inf
+    inner_count: int = 0
+    sum_inner_average_us: float = 0
+
+
+def compute_summary_aggregates(results: ColumnSource) -> dict[str, Any]:
+    """Aggregates the given results by xemu version, machine (including renderer), and test suite.
+
+    The aggregates are sufficient for the report's summary chart to be drawn for any slicing scheme and version range
+    without loading the per-test rows.
+    """
+    versions = results.column("xemu_version")
+    version_objects = results.column("xemu_version_obj")
+    suites = results.column("suite")
+    average_us = results.column("average_us")
+    average_us_exmax = results.column("average_us_exmax")
+    inner_average_us = results.column("inner_average_us")
+    # The renderer backend is included with the machine so that the summary may be sliced by backend without the per-row
+    # data.
+    machines = list(zip(results.column("environment"), results.column("renderer"), strict=True))
+
+    aggregates: dict[tuple[str, tuple[MachineEnvironment, str], str], _Aggregate] = {}
+    version_object_by_version: dict[str, dict[str, Any]] = {}
+    for index, key in enumerate(zip(versions, machines, suites, strict=True)):
+        aggregate = aggregates.get(key)
+        if aggregate is None:
+            aggregate = _Aggregate()
+            aggregates[key] = aggregate
+            version_object_by_version.setdefault(key[0], version_objects[index])
+
+        value = average_us[index]
+        aggregate.count += 1
+        aggregate.sum_average_us += value
+        aggregate.min_average_us = min(aggregate.min_average_us, value)
+        aggregate.max_average_us = max(aggregate.max_average_us, value)
+        exmax_value = average_us_exmax[index]
+        aggregate.sum_average_us_exmax += exmax_value
+        aggregate.min_average_us_exmax = min(aggregate.min_average_us_exmax, exmax_value)
+        aggregate.max_average_us_exmax = max(aggregate.max_average_us_exmax, exmax_value)
+
+        inner_value = inner_average_us[index]
+        if inner_value is not None:
+            aggregate.inner_count += 1
+            aggregate.sum_inner_average_us += inner_value
+
+    version_table = DimensionTable()
+    machine_table = DimensionTable()
+    string_table = DimensionTable()
+
+    cells: dict[str, list[Any]] = {
+        "version": [],
+        "machine": [],
+        "suite": [],
+        "count": [],
+        "sum_average_us": [],
+        "min_average_us": [],
+        "max_average_us": [],
+        "sum_average_us_exmax": [],
+        "min_average_us_exmax": [],
+        "max_average_us_exmax": [],
+        "inner_count": [],
+        "sum_inner_average_us": [],
+    }
+    for (version, machine, suite), aggregate in aggregates.items():
+        cells["version"].append(version_table.intern(version))
+        cells["machine"].append(machine_table.intern(machine))
+        cells["suite"].append(string_table.intern(suite))
+        cells["count"].append(aggregate.count)
+        cells["sum_average_us"].append(aggregate.sum_average_us)
+        cells["min_average_us"].append(aggregate.min_average_us)
+        cells["max_average_us"].append(aggregate.max_average_us)
+        cells["sum_average_us_exmax"].append(aggregate.sum_average_us_exmax)
+        cells["min_average_us_exmax"].append(aggregate.min_average_us_exmax)
+        cells["max_average_us_exmax"].append(aggregate.max_average_us_exmax)
+        cells["inner_count"].append(aggregate.inner_count)
+        cells["sum_inner_average_us"].append(aggregate.sum_inner_average_us)
+
+    return {
+        "format": SUMMARY_FORMAT_NAME,
+        "format_version": SUMMARY_FORMAT_VERSION,
+        "tags": results.friendly_names,
+        "strings": string_table.values,
+        "versions": [version_object_by_version[version] for version in version_table.values],
+        "machines": [{**environment.to_dict(), "renderer": renderer} for environment, renderer in machine_table.values],
+        "cells": cells,
+    }
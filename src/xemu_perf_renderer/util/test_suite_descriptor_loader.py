@@ -3,10 +3,14 @@ from __future__ import annotations
 # ruff: noqa: PLC0415 `import` should be at the top-level of a file
 import json
 import logging
+import os
 from typing import Any, NamedTuple
 
 logger = logging.getLogger(__name__)
 
+# Increment whenever the structure of the descriptor cache changes so that stale caches are discarded.
+_CACHE_FORMAT_VERSION = 1
+
 
 class TestSuiteDescriptor(NamedTuple):
     """Describes one of the nxdk_pgraph_tests test suites."""
@@ -50,22 +54,89 @@ def _fuzzy_lookup_suite_descriptor(
 
 
 class TestSuiteDescriptorLoader:
-    """Loads test suite descriptors from the xemu-perf-tests project."""
+    """Loads test suite descriptors from the xemu-perf-tests project.
+
+    If a `cache_file` is provided, the registry is kept on disk along with the validators (ETag and Last-Modified)
+    returned by the server. Later loads make a conditional request and reuse the cached registry if it has not changed,
+    or if the server cannot be reached. In `offline` mode, the cached registry is used without making any request.
+    """
 
-    def __init__(self, registry_url: str):
+    def __init__(self, registry_url: str, *, cache_file: str | None = None, offline: bool = False, timeout: float = 30):
         self.registry_url = registry_url
+        self.cache_file = cache_file
+        self.offline = offline
+        self.timeout = timeout
+
+    def _load_cache(self) -> dict[str, Any] | None:
+        if not self.cache_file or not os.path.isfile(self.cache_file):
+            return None
+
+        try:
+            with open(self.cache_file, encoding="utf-8") as infile:
+                cache = json.load(infile)
+        except (OSError, json.JSONDecodeError):
+            logger.warning("Ignoring unreadable descriptor cache '%s'", self.cache_file)
+            return None
+
+        if cache.get("format_version") != _CACHE_FORMAT_VERSION or cache.get("url") != self.registry_url:
+            logger.info("Ignoring descriptor cache '%s' for a different registry or format", self.cache_file)
+            return None
+        return cache
+
+    def _save_cache(self, registry: dict[str, Any], etag: str | None, last_modified: str | None):
+        if not self.cache_file:
+            return
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_file)), exist_ok=True)
+        temp_file = f"{self.cache_file}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as outfile:
+            json.dump(
+                {
+                    "format_version": _CACHE_FORMAT_VERSION,
+                    "url": self.registry_url,
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "registry": registry,
+                },
+                outfile,
+            )
+        os.replace(temp_file, self.cache_file)
 
     def _load_registry(self) -> dict[str, Any] | None:
+        cache = self._load_cache()
+        cached_registry = cache["registry"] if cache else None
+
+        if self.offline:
+            if cached_registry is None:
+                logger.warning("Offline and no cached descriptors are available for '%s'", self.registry_url)
+            return cached_registry
+
         import requests
 
+        headers = {}
+        if cache:
+            if cache.get("etag"):
+                headers["If-None-Match"] = cache["etag"]
+            if cache.get("last_modified"):
+                headers["If-Modified-Since"] = cache["last_modified"]
+
         try:
-            response = requests.get(self.registry_url, timeout=30)
+            response = requests.get(self.registry_url, headers=headers, timeout=self.timeout)
+            if response.status_code == requests.codes.not_modified and cached_registry is not None:
+                logger.debug("Cached descriptors for '%s' are up to date", self.registry_url)
+                return cached_registry
             response.raise_for_status()
-            return json.loads(response.content)
-        except requests.exceptions.RequestException:
+            registry = json.loads(response.content)
+        except (requests.exceptions.RequestException, json.JSONDecodeError):
+            if cached_registry is not None:
+                logger.warning("Failed to load descriptor from '%s', using cached copy", self.registry_url)
+                return cached_registry
             logger.exception("Failed to load descriptor from '%s'", self.registry_url)
             return None
 
+        self._save_cache(registry, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return registry
+
     def process(self) -> dict[str, TestSuiteDescriptor]:
         """Loads the test suite descriptors from the registry URL."""
 
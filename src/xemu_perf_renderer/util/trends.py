@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from collections.abc import Hashable, Sequence
+
+# Minimum slope, as a fraction of the mean, for a series to be considered to be trending.
+TREND_MIN_CHANGE_PERCENTAGE = 0.08
+
+# Minimum number of points in a series for a trend to be calculated.
+TREND_MIN_POINTS = 3
+
+# Keep in sync with expandTrendEnum in data.js
+NO_TREND = "N"
+STABLE_TREND = "S"
+IMPROVING_TREND = "I"
+WORSENING_TREND = "W"
+
+
+def factorize(values: Sequence[Hashable]) -> tuple[list[Any], np.ndarray]:
+    """Returns the distinct values in order of first appearance and the index of each input value in that list."""
+    codes_by_value: dict[Hashable, int] = {}
+    codes = np.fromiter(
+        (codes_by_value.setdefault(value, len(codes_by_value)) for value in values), dtype=np.int64, count=len(values)
+    )
+    return list(codes_by_value), codes
+
+
+def rank(values: Sequence[Any]) -> np.ndarray:
+    """Returns the position of each input value in the sorted list of distinct values."""
+    uniques, codes = factorize(values)
+    ranks = np.empty(len(uniques), dtype=np.int64)
+    ranks[sorted(range(len(uniques)), key=lambda code: uniques[code])] = np.arange(len(uniques))
+    return ranks[codes]
+
+
+def classify_trends(
+    test_names: Sequence[str],
+    machine_ids: Sequence[str],
+    sort_keys: Sequence[Any],
+    values: Sequence[float],
+    min_change_percentage: float = TREND_MIN_CHANGE_PERCENTAGE,
+) -> np.ndarray:
+    """Classifies the trend of every (test, machine) series, returning the trend code for each input row.
+
+    Each series is ordered by `sort_keys` (ties retain their input order) and a least squares line is fit to the values
+    against their position in the series. Series whose slope exceeds `min_change_percentage` of their mean value are
+    considered worsening (or improving if the slope is negative). Series with fewer than `TREND_MIN_POINTS` points are
+    given `NO_TREND`.
+
+    All series are processed in a single batch.
+    """
+    num_rows = len(values)
+    if not num_rows:
+        return np.empty(0, dtype="<U1")
+
+    series = SortedSeries(test_names, machine_ids, sort_keys)
+    y = np.asarray(values, dtype=np.float64)[series.order]
+    x = (np.arange(num_rows) - series.starts[series.index]).astype(np.float64)
+
+    slopes, means = fit_series(series.index, x, y, len(series.starts))
+
+    thresholds = means * min_change_percentage
+    group_trends = np.full(len(series.starts), STABLE_TREND, dtype="<U1")
+    group_trends[slopes > thresholds] = WORSENING_TREND
+    group_trends[slopes < -thresholds] = IMPROVING_TREND
+    group_trends[series.sizes < TREND_MIN_POINTS] = NO_TREND
+
+    trends = np.empty(num_rows, dtype="<U1")
+    trends[series.order] = group_trends[series.index]
+    return trends
+
+
+class SortedSeries:
+    """Arranges rows into (test, machine) series, each ordered by sort key.
+
+    `order` holds the input row indices grouped by series, with each series ordered by `sort_keys` (ties retain their
+    input order). The series starting at `starts[i]` in `order` has `sizes[i]` rows, and `index` holds the series of
+    each position in `order`. `sort_codes` holds the rank of the sort key of each position in `order`.
+    """
+
+    def __init__(self, test_names: Sequence[str], machine_ids: Sequence[str], sort_keys: Sequence[Any]):
+        _, test_codes = factorize(test_names)
+        machine_uniques, machine_codes = factorize(machine_ids)
+        group_ids = test_codes * len(machine_uniques) + machine_codes
+        sort_codes = rank(sort_keys)
+
+        # lexsort is stable, so rows with identical group and sort key remain in input order.
+        self.order = np.lexsort((sort_codes, group_ids))
+        self.sort_codes = sort_codes[self.order]
+        sorted_groups = group_ids[self.order]
+
+        self.starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+        self.sizes = np.diff(np.r_[self.starts, len(self.order)])
+        self.index = np.repeat(np.arange(len(self.starts)), self.sizes)
+
+
+def fit_series(group_index: np.ndarray, x: np.ndarray, y: np.ndarray, num_groups: int) -> tuple[np.ndarray, np.ndarray]:
+    """Calculates the least squares slope and the mean of y for each group of (x, y) points."""
+    n = np.bincount(group_index, minlength=num_groups).astype(np.float64)
+    sum_x = np.bincount(group_index, weights=x, minlength=num_groups)
+    sum_y = np.bincount(group_index, weights=y, minlength=num_groups)
+    sum_xy = np.bincount(group_index, weights=x * y, minlength=num_groups)
+    sum_x_squared = np.bincount(group_index, weights=x * x, minlength=num_groups)
+    return slopes_from_sums(n, sum_x, sum_y, sum_xy, sum_x_squared), sum_y / np.maximum(n, 1)
+
+
+def slopes_from_sums(
+    n: np.ndarray, sum_x: np.ndarray, sum_y: np.ndarray, sum_xy: np.ndarray, sum_x_squared: np.ndarray
+) -> np.ndarray:
+    """Calculates least squares slopes from running sums, returning 0 where the slope is undefined."""
+    numerator = n * sum_xy - sum_x * sum_y
+    denominator = n * sum_x_squared - sum_x**2
+    safe_denominator = np.where(denominator != 0, denominator, 1.0)
+    return np.where(denominator != 0, numerator / safe_denominator, 0.0)
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import pytest
+
+from xemu_perf_renderer.util.assets import minify_js
+
+
+@pytest.mark.parametrize(
+    ("source", "expected"),
+    [
+        ("a = 1 .toString();", "a=1 .toString();\n"),
+        ("a = 1.5 .toFixed(1);", "a=1.5 .toFixed(1);\n"),
+        ("a = b .c;", "a=b.c;\n"),
+        ("a = x[1] .y;", "a=x[1].y;\n"),
+    ],
+)
+def test_minify_js_keeps_space_between_number_and_member_access(source: str, expected: str):
+    assert minify_js(source) == expected
+
+
+@pytest.mark.parametrize(
+    ("source", "expected"),
+    [
+        ("x = i++ / 2 / 3;", "x=i++/2/3;\n"),
+        ("x = i-- / 2 / 3;", "x=i--/2/3;\n"),
+        ("x = a + /b/.source;", "x=a+/b/.source;\n"),
+        ("x = a - / b /.source.length;", "x=a-/ b /.source.length;\n"),
+        ("x = a / b / c;", "x=a/b/c;\n"),
+        ("x = (a) / b / c;", "x=(a)/b/c;\n"),
+        ("return / b /.test(a);", "return/ b /.test(a);\n"),
+    ],
+)
+def test_minify_js_distinguishes_division_from_regex(source: str, expected: str):
+    assert minify_js(source) == expected
+
+
+@pytest.mark.parametrize(
+    ("source", "expected"),
+    [
+        ("a = b + +c;", "a=b+ +c;\n"),
+        ("a = b - -c;", "a=b- -c;\n"),
+        ("a = b + ++c;", "a=b+ ++c;\n"),
+        ("a = b++ + c;", "a=b++ +c;\n"),
+        ("a = b-- - c;", "a=b-- -c;\n"),
+    ],
+)
+def test_minify_js_does_not_merge_operators(source: str, expected: str):
+    assert minify_js(source) == expected
+
+
+def test_minify_js_keeps_statement_ending_line_breaks():
+    assert minify_js("let a = b\n(c)\nlet d = [\n  1,\n  2,\n]\n") == "let a=b\n(c)\nlet d=[1,2,]\n"
+
+
+def test_minify_js_removes_comments_but_not_strings():
+    source = 'const a = "// not a comment"; // comment\n/* block */ const b = `/* ${a} */`;\n'
+    assert minify_js(source) == 'const a="// not a comment";const b=`/* ${a} */`;\n'
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import base64
+import importlib.util
+import json
+import os
+import sys
+import zlib
+from typing import TYPE_CHECKING, Any
+
+import pytest
+
+if TYPE_CHECKING:
+    from types import ModuleType
+
+_SCRIPT = os.path.join(os.path.dirname(__file__), os.pardir, ".github", "scripts", "process_results_issue.py")
+
+_VERSION = "xemu-0.8.100-master-0123456789abcdef0123456789abcdef01234567"
+
+
+@pytest.fixture(scope="module")
+def script() -> ModuleType:
+    spec = importlib.util.spec_from_file_location("process_results_issue", _SCRIPT)
+    assert spec is not None
+    assert spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _result(**overrides: Any) -> dict[str, Any]:
+    result = {
+        "xemu_version": _VERSION,
+        "machine_token": "token",
+        "renderer": "GL",
+        "iso": "xemu_perf_tests.iso",
+        "xemu_machine_info": "GL_VENDOR: Vendor\nGL_RENDERER: Renderer\n",
+        "machine_info": {"cpu_manufacturer": "CPU", "os_system": "Linux", "cpu_freq_max": 3000.0},
+        "results": [
+            {
+                "name": "Suite::Test",
+                "iterations": 3,
+                "total_us": 30,
+                "average_us": 10,
+                "min_us": 5,
+                "max_us": 15,
+                "raw_results": [5, 10, 15],
+            }
+        ],
+    }
+    result.update(overrides)
+    return result
+
+
+def _issue_body(content: bytes) -> str:
+    return f"Submitted results\n\n```\n{base64.b64encode(zlib.compress(content)).decode()}\n```\n"
+
+
+def _write_issue(directory: str, name: str, body: str) -> str:
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as outfile:
+        outfile.write(body)
+    return path
+
+
+def _ingest(script: ModuleType, tmp_path, *bodies: str, **kwargs: Any) -> tuple[list[Any], str]:
+    results_dir = str(tmp_path / "results")
+    with script.BatchIngester(results_dir, **kwargs) as ingester:
+        for index, body in enumerate(bodies):
+            ingester.add_text(body.splitlines(), f"{index}.md")
+        ingester.commit()
+    return ingester.outcomes, results_dir
+
+
+def _result_file(results_dir: str) -> str:
+    return os.path.join(results_dir, _VERSION, "token-GL.json")
+
+
+def test_valid_payload_is_written(script, tmp_path):
+    outcomes, results_dir = _ingest(script, tmp_path, _issue_body(json.dumps(_result()).encode()))
+
+    assert [outcome.status for outcome in outcomes] == [script.Outcome.WRITTEN]
+    assert outcomes[0].path == _result_file(results_dir)
+    with open(_result_file(results_dir), encoding="utf-8") as infile:
+        assert json.load(infile) == _result()
+    assert sorted(os.listdir(tmp_path)) == ["results"]
+
+
+def test_identical_resubmission_is_unchanged(script, tmp_path):
+    body = _issue_body(json.dumps(_result()).encode())
+    _ingest(script, tmp_path, body)
+    outcomes, results_dir = _ingest(script, tmp_path, body)
+
+    assert [outcome.status for outcome in outcomes] == [script.Outcome.UNCHANGED]
+    assert outcomes[0].path == _result_file(results_dir)
+
+
+def test_resubmission_matching_crlf_file_is_unchanged(script, tmp_path):
+    path = _result_file(str(tmp_path / "results"))
+    os.makedirs(os.path.dirname(path))
+    existing = json.dumps(_result(), indent=4).replace("\n", "\r\n").encode()
+    with open(path, "wb") as outfile:
+        outfile.write(existing)
+
+    outcomes, _results_dir = _ingest(script, tmp_path, _issue_body(json.dumps(_result()).encode()))
+
+    assert [outcome.status for outcome in outcomes] == [script.Outcome.UNCHANGED]
+    with open(path, "rb") as infile:
+        assert infile.read() == existing
+
+
+def test_last_duplicate_in_batch_wins(script, tmp_path):
+    first = _result()
+    second = _result(iso="other.iso")
+    outcomes, results_dir = _ingest(
+        script, tmp_path, _issue_body(json.dumps(first).encode()), _issue_body(json.dumps(second).encode())
+    )
+
+    assert [outcome.status for outcome in outcomes] == [script.Outcome.WRITTEN, script.Outcome.WRITTEN]
+    with open(_result_file(results_dir), encoding="utf-8") as infile:
+        assert json.load(infile) == second
+
+
+@pytest.mark.parametrize(
+    ("body", "message"),
+    [
+        ("```\nnot base64!\n```\n", "Failed to decode payload"),
+        (_issue_body(json.dumps(_result(xemu_version="..")).encode()), "Invalid xemu_version"),
+        (_issue_body(json.dumps(_result(machine_token="../token")).encode()), "Invalid machine_token"),
+        (_issue_body(json.dumps(_result(renderer="D3D")).encode()), "Unsupported renderer"),
+        (_issue_body(b"[]"), "not a JSON object"),
+        ("No payload here\n", "No payload block found"),
+    ],
+)
+def test_invalid_payload_is_rejected(script, tmp_path, body: str, message: str):
+    outcomes, results_dir = _ingest(script, tmp_path, body)
+
+    assert [outcome.status for outcome in outcomes] == [script.Outcome.REJECTED]
+    assert message in outcomes[0].message
+    assert not os.path.exists(results_dir)
+
+
+def test_payload_over_cap_is_rejected(script, tmp_path):
+    content = json.dumps(_result(padding=" " * 4096)).encode()
+    outcomes, _results_dir = _ingest(script, tmp_path, _issue_body(content), max_payload_bytes=len(content) - 1)
+
+    assert [outcome.status for outcome in outcomes] == [script.Outcome.REJECTED]
+    assert "decompresses to more than" in outcomes[0].message
+
+
+def test_rejected_block_does_not_hide_payload(script, tmp_path):
+    body = "```\nlog output\n```\n" + _issue_body(json.dumps(_result()).encode())
+    outcomes, results_dir = _ingest(script, tmp_path, body)
+
+    assert [outcome.status for outcome in outcomes] == [script.Outcome.REJECTED, script.Outcome.WRITTEN]
+    assert os.path.isfile(_result_file(results_dir))
+
+
+def test_encode_round_trips_with_machine_token_override(script, tmp_path):
+    result = _result()
+    del result["machine_token"]
+    result_file = str(tmp_path / "result.json")
+    with open(result_file, "w", encoding="utf-8") as outfile:
+        json.dump(result, outfile)
+
+    issues_dir = tmp_path / "issues"
+    issues_dir.mkdir()
+    _write_issue(str(issues_dir), "1.md", script.encode_payload(result_file))
+    _write_issue(str(issues_dir), "2.md", script.encode_payload(result_file, "token"))
+    report_file = str(tmp_path / "report.jsonl")
+    results_dir = str(tmp_path / "results")
+
+    status = script.ingest([str(issues_dir)], results_dir, report_file)
+
+    assert status == script.EXIT_REJECTED_PAYLOADS
+    with open(report_file, encoding="utf-8") as infile:
+        report = [json.loads(line) for line in infile]
+    assert [(os.path.basename(entry["source"]), entry["status"]) for entry in report] == [
+        ("1.md", "rejected"),
+        ("2.md", "written"),
+    ]
+    with open(_result_file(results_dir), encoding="utf-8") as infile:
+        assert json.load(infile) == _result()
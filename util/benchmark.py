@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+
+# ruff: noqa: T201 `print` found
+# ruff: noqa: S311 Standard pseudo-random generators are not suitable for cryptographic purposes
+
+from __future__ import annotations
+
+import argparse
+import gc
+import glob
+import hashlib
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Any
+
+from xemu_perf_renderer.analyze import build_ranking_frame, rank_versions
+from xemu_perf_renderer.renderer import FlatResultsRenderer
+from xemu_perf_renderer.util.data import FlatResults, load_results
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+_BENCHMARK_FORMAT_VERSION = 1
+
+# Multiples of the template archive that are benchmarked by default.
+_DEFAULT_SCALES = (1, 10, 100)
+
+# Stages faster than this are not checked against `--max-regression`, as their timings are dominated by noise.
+_DEFAULT_MIN_REGRESSION_S = 0.5
+
+# Written into a generated archive once it is complete so that it may be reused by later runs.
+_GENERATED_MARKER = ".synthetic_results.json"
+
+
+@dataclass
+class StageResult:
+    wall_s: float
+    rows: int
+    rows_per_s: float
+    peak_mb: float | None
+
+
+def _perturb_result(result: dict[str, Any], rng: random.Random):
+    """Scales the timings of the given test result, keeping its aggregates consistent with its raw samples."""
+    factor = rng.uniform(0.8, 1.2)
+
+    raw_results = result.get("raw_results")
+    if not raw_results:
+        for key in ("total_us", "average_us", "min_us", "max_us"):
+            result[key] = max(1, round(result[key] * factor))
+        return
+
+    raw_results = [max(1, round(value * factor * rng.uniform(0.95, 1.05))) for value in raw_results]
+    result["raw_results"] = raw_results
+    result["iterations"] = len(raw_results)
+    result["total_us"] = sum(raw_results)
+    result["average_us"] = result["total_us"] // len(raw_results)
+    result["min_us"] = min(raw_results)
+    result["max_us"] = max(raw_results)
+
+
+def generate_synthetic_results(template_dirs: list[str], output_dir: str, scale: int, seed: int = 0) -> int:
+    """Generates a results tree `scale` times the size of the given template archives, returning the number of files.
+
+    The first copy of each template file is written unmodified. Each additional copy is attributed to a new machine
+    (so that it forms new trend series alongside the existing ones) and has its timings randomly perturbed.
+    """
+    marker_path = os.path.join(output_dir, _GENERATED_MARKER)
+    parameters = {"templates": sorted(template_dirs), "scale": scale, "seed": seed}
+    if os.path.isfile(marker_path):
+        with open(marker_path, encoding="utf-8") as infile:
+            marker = json.load(infile)
+        if marker["parameters"] == parameters:
+            logger.info("Reusing synthetic results in '%s'", output_dir)
+            return marker["num_files"]
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.makedirs(output_dir)
+
+    rng = random.Random(seed)
+    num_files = 0
+    for template_dir in template_dirs:
+        for result_file in sorted(glob.glob("**/*.json", root_dir=template_dir, recursive=True)):
+            with open(os.path.join(template_dir, result_file), "rb") as infile:
+                template = json.load(infile)
+
+            version_dir, filename = os.path.split(result_file)
+            machine_token, renderer_suffix = filename[:-5].rsplit("-", maxsplit=1)
+            os.makedirs(os.path.join(output_dir, version_dir), exist_ok=True)
+
+            for copy_index in range(scale):
+                if copy_index:
+                    token = hashlib.sha256(f"{machine_token}-{copy_index}".encode()).hexdigest()
+                    content = json.loads(json.dumps(template))
+                    for test_result in content.get("results", []):
+                        _perturb_result(test_result, rng)
+                else:
+                    token = machine_token
+                    content = template
+
+                with open(
+                    os.path.join(output_dir, version_dir, f"{token}-{renderer_suffix}.json"), "w", encoding="utf-8"
+                ) as outfile:
+                    json.dump(content, outfile, indent=2)
+                num_files += 1
+
+    with open(marker_path, "w", encoding="utf-8") as outfile:
+        json.dump({"parameters": parameters, "num_files": num_files}, outfile)
+
+    return num_files
+
+
+def _measure(func: Callable[..., Any], *args: Any, trace_memory: bool) -> tuple[Any, float, float | None]:
+    """Invokes `func`, returning its result, the elapsed wall time in seconds, and the peak traced memory in MB."""
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+
+    peak_mb = None
+    if trace_memory:
+        _current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak_mb = peak / (1024 * 1024)
+
+    return result, elapsed, peak_mb
+
+
+def benchmark_pipeline(results_dir: str, output_dir: str, *, trace_memory: bool) -> dict[str, StageResult]:
+    """Runs each stage of the render and analyze pipeline over the given results, returning per-stage measurements."""
+    timings: dict[str, tuple[float, float | None]] = {}
+
+    def _run(stage: str, func: Callable[..., Any], *args: Any) -> Any:
+        result, wall_s, peak_mb = _measure(func, *args, trace_memory=trace_memory)
+        timings[stage] = (wall_s, peak_mb)
+        return result
+
+    docs = _run("load_results", load_results, [results_dir])
+
+    flat_results = _run("flatten", FlatResults, docs)
+    del docs
+    num_rows = len(flat_results.flattened_results)
+
+    # Includes wrapping the flattened rows, which is negligible next to the trend analysis.
+    renderer = _run("analyze", lambda rows: FlatResultsRenderer(flattened_results=rows), flat_results.flattened_results)
+    del flat_results
+
+    _run("render", renderer.render, output_dir, "index.html")
+    _run("rank_versions", lambda results: rank_versions(build_ranking_frame(results)), renderer)
+
+    return {
+        stage: StageResult(
+            wall_s=wall_s, rows=num_rows, rows_per_s=num_rows / wall_s if wall_s else 0.0, peak_mb=peak_mb
+        )
+        for stage, (wall_s, peak_mb) in timings.items()
+    }
+
+
+def _fastest(runs: list[dict[str, StageResult]]) -> dict[str, StageResult]:
+    """Returns the fastest measurement of each stage across repeated runs, which is the least affected by noise."""
+    return {stage: min((run[stage] for run in runs), key=lambda result: result.wall_s) for stage in runs[0]}
+
+
+def _print_report(scale: int, num_files: int, stages: dict[str, StageResult], baseline: dict[str, Any] | None):
+    baseline_stages = (baseline or {}).get(str(scale), {}).get("stages", {})
+
+    print(f"\n{scale}x ({num_files} files, {next(iter(stages.values())).rows} rows)")
+    print(f"  {'stage':<16}{'wall (s)':>10}{'rows/s':>14}{'peak (MB)':>12}{'vs baseline':>14}")
+    for stage, result in stages.items():
+        peak = f"{result.peak_mb:.1f}" if result.peak_mb is not None else "-"
+        comparison = "-"
+        baseline_stage = baseline_stages.get(stage)
+        if baseline_stage and baseline_stage["wall_s"]:
+            comparison = f"{(result.wall_s / baseline_stage['wall_s'] - 1) * 100:+.1f}%"
+        print(f"  {stage:<16}{result.wall_s:>10.3f}{result.rows_per_s:>14.0f}{peak:>12}{comparison:>14}")
+
+
+def _find_regressions(
+    report: dict[str, Any], baseline: dict[str, Any], max_regression: float, min_seconds: float
+) -> list[tuple[str, str, float]]:
+    """Returns (scale, stage, slowdown) for every stage whose wall time exceeds the baseline by more than the limit.
+
+    Stages that took less than `min_seconds` are not checked.
+    """
+    ret = []
+    for scale, scale_report in report.items():
+        baseline_stages = baseline.get(scale, {}).get("stages", {})
+        for stage, result in scale_report["stages"].items():
+            baseline_stage = baseline_stages.get(stage)
+            if not baseline_stage or not baseline_stage["wall_s"] or result["wall_s"] < min_seconds:
+                continue
+            slowdown = result["wall_s"] / baseline_stage["wall_s"] - 1
+            if slowdown > max_regression:
+                ret.append((scale, stage, slowdown))
+    return ret
+
+
+def _load_baseline(baseline_file: str, *, trace_memory: bool) -> dict[str, Any] | None:
+    if not os.path.isfile(baseline_file):
+        logger.warning("Baseline '%s' does not exist, results will not be compared", baseline_file)
+        return None
+
+    with open(baseline_file, encoding="utf-8") as infile:
+        baseline = json.load(infile)
+
+    if baseline.get("format_version") != _BENCHMARK_FORMAT_VERSION:
+        logger.warning("Ignoring baseline '%s' with unsupported format version", baseline_file)
+        return None
+
+    if baseline.get("trace_memory") != trace_memory:
+        # Tracing allocations slows some stages by an order of magnitude.
+        logger.warning("Ignoring baseline '%s' as it was recorded with a different memory tracing mode", baseline_file)
+        return None
+
+    if baseline.get("python") != platform.python_version():
+        logger.warning(
+            "Baseline was recorded with Python %s, timings may not be comparable", baseline.get("python", "unknown")
+        )
+
+    return baseline["scales"]
+
+
+def entrypoint():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the render and analyze pipeline against synthetic results generated from real ones."
+    )
+    parser.add_argument(
+        "--verbose",
+        "-v",
+        help="Enables verbose logging information",
+        action="store_true",
+    )
+    parser.add_argument(
+        "templates",
+        nargs="*",
+        default=["results"],
+        help="Path to the root of the results on which the synthetic results are based.",
+    )
+    parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=list(_DEFAULT_SCALES),
+        help="Multiples of the template results to benchmark.",
+    )
+    parser.add_argument(
+        "--work-dir",
+        help="Directory into which synthetic results are generated. Generated results are reused by later runs. "
+        "Defaults to a temporary directory.",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed used to perturb the synthetic results.",
+    )
+    parser.add_argument(
+        "--no-trace-memory",
+        action="store_true",
+        help="Do not measure peak memory. Tracing allocations slows allocation heavy stages.",
+    )
+    parser.add_argument(
+        "--baseline",
+        metavar="baseline_file",
+        help="Path to the results of a previous run to compare against.",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=1,
+        help="Number of times to run the pipeline at each scale. The fastest time of each stage is reported.",
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        help="Fail if any stage is slower than the baseline by more than this fraction (e.g., 0.25).",
+    )
+    parser.add_argument(
+        "--min-regression-seconds",
+        type=float,
+        default=_DEFAULT_MIN_REGRESSION_S,
+        help="Do not apply --max-regression to stages that take less than this many seconds.",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        metavar="baseline_file",
+        help="Path at which the results of this run should be saved for use as a future baseline.",
+    )
+
+    args = parser.parse_args()
+
+    log_level = logging.DEBUG if args.verbose else logging.INFO
+    logging.basicConfig(level=log_level)
+
+    template_dirs = [os.path.abspath(os.path.expanduser(p)) for p in args.templates]
+    for path in template_dirs:
+        if not os.path.isdir(path):
+            logger.error("Results directory '%s' does not exist", path)
+            return 1
+
+    if args.repeats < 1:
+        logger.error("--repeats must be at least 1")
+        return 1
+
+    trace_memory = not args.no_trace_memory
+    baseline = _load_baseline(args.baseline, trace_memory=trace_memory) if args.baseline else None
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_dir = os.path.abspath(os.path.expanduser(args.work_dir)) if args.work_dir else temp_dir
+
+        report: dict[str, Any] = {}
+        for scale in args.scales:
+            results_dir = os.path.join(work_dir, f"results-{scale}x")
+            num_files = generate_synthetic_results(template_dirs, results_dir, scale, args.seed)
+
+            output_dir = os.path.join(temp_dir, f"site-{scale}x")
+            runs = []
+            for _ in range(args.repeats):
+                runs.append(benchmark_pipeline(results_dir, output_dir, trace_memory=trace_memory))
+                shutil.rmtree(output_dir, ignore_errors=True)
+            stages = _fastest(runs)
+
+            _print_report(scale, num_files, stages, baseline)
+            report[str(scale)] = {
+                "num_files": num_files,
+                "stages": {stage: asdict(result) for stage, result in stages.items()},
+            }
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as outfile:
+            json.dump(
+                {
+                    "format_version": _BENCHMARK_FORMAT_VERSION,
+                    "python": platform.python_version(),
+                    "trace_memory": trace_memory,
+                    "scales": report,
+                },
+                outfile,
+                indent=2,
+            )
+
+    if baseline and args.max_regression is not None:
+        regressions = _find_regressions(report, baseline, args.max_regression, args.min_regression_seconds)
+        for scale, stage, slowdown in regressions:
+            logger.error("%sx %s is %.1f%% slower than the baseline", scale, stage, slowdown * 100)
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(entrypoint())
@@ -1,21 +1,32 @@
 #!/usr/bin/env python3
 
+# ruff: noqa: T201 `print` found
+
 from __future__ import annotations
 
 import argparse
+import functools
 import glob
 import json
 import logging
 import os
 import re
 import sys
-from dataclasses import dataclass
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from enum import Enum, auto
-from typing import Any
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
 
 logger = logging.getLogger(__name__)
 
-_STRIP_TESTS_REGEXES = {re.compile(r"High vertex count::MixedVtxCount-.*")}
+_DEFAULT_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_cleaner_rules.json")
+
+# Number of files handed to a worker process at a time.
+_FILES_PER_TASK = 16
 
 
 class ActionType(Enum):
@@ -28,62 +39,225 @@ class ActionType(Enum):
 class Action:
     action: ActionType = ActionType.NONE
     content: dict[str, Any] | None = None
+    # Number of results removed by each rule, keyed by the rule's pattern.
+    stripped: Counter[str] = field(default_factory=Counter)
+
+
+class Rules:
+    """Cleaning rules loaded from a JSON file of the form `{"strip_tests": ["<regex>", ...]}`.
+
+    Results whose name matches (from its start) any of the `strip_tests` patterns are removed. The patterns are
+    compiled into a single regex in which each pattern is a named alternative, so that each name is scanned once
+    regardless of the number of rules. Patterns may not define named groups of their own.
+    """
+
+    def __init__(self, strip_tests: Iterable[str]):
+        self.strip_tests = list(strip_tests)
+        self._matcher = (
+            re.compile("|".join(f"(?P<rule{index}>{pattern})" for index, pattern in enumerate(self.strip_tests)))
+            if self.strip_tests
+            else None
+        )
+
+    @classmethod
+    def load(cls, rules_file: str) -> Rules:
+        with open(rules_file, encoding="utf-8") as infile:
+            rules = json.load(infile)
+
+        strip_tests = rules.get("strip_tests", [])
+        if not isinstance(strip_tests, list) or not all(isinstance(pattern, str) for pattern in strip_tests):
+            msg = f"'strip_tests' in '{rules_file}' must be a list of regular expressions"
+            raise ValueError(msg)
+        return cls(strip_tests)
+
+    def match_strip(self, test_name: str) -> str | None:
+        """Returns the pattern of the strip rule matching the given test name, if any."""
+        if self._matcher is None:
+            return None
+
+        match = self._matcher.match(test_name)
+        if not match or not match.lastgroup:
+            return None
+        return self.strip_tests[int(match.lastgroup.removeprefix("rule"))]
+
 
+@functools.cache
+def _compile_rules(strip_tests: tuple[str, ...]) -> Rules:
+    """Returns the compiled rules for a worker process, compiling them only once per process."""
+    return Rules(strip_tests)
 
-def _clean_data(content: dict[str, Any]) -> Action:
-    results_to_strip = []
 
+def _clean_data(content: dict[str, Any], rules: Rules) -> Action:
     all_results = content.get("results", [])
-    for index, result in enumerate(all_results):
-        if any(regex.match(result["name"]) for regex in _STRIP_TESTS_REGEXES):
-            results_to_strip.append(index)
-            continue
 
-    if not results_to_strip:
+    kept_results = []
+    stripped: Counter[str] = Counter()
+    for result in all_results:
+        pattern = rules.match_strip(result["name"])
+        if pattern is None:
+            kept_results.append(result)
+        else:
+            stripped[pattern] += 1
+
+    if not stripped:
         return Action()
 
-    for index in reversed(results_to_strip):
-        all_results.pop(index)
+    content["results"] = kept_results
+
+    return Action(action=ActionType.UPDATE, content=content, stripped=stripped)
+
+
+def _serialize_like(content: dict[str, Any], original: bytes) -> bytes:
+    """Serializes the given content as JSON in the layout of the original file so that diffs are minimal.
+
+    Result files are written with a two space indent, but some have CRLF line endings or a trailing newline.
+    """
+    newline = "\r\n" if b"\r\n" in original else "\n"
+
+    indent = 2
+    second_line = original.split(b"\n", 2)[1] if original.count(b"\n") > 1 else b""
+    if second_line.startswith(b" "):
+        indent = len(second_line) - len(second_line.lstrip(b" "))
+
+    # Newlines within strings are escaped, so every newline in the output is a line break.
+    text = json.dumps(content, indent=indent, ensure_ascii=original.isascii())
+    if newline != "\n":
+        text = text.replace("\n", newline)
+    if original.endswith(b"\n"):
+        text += newline
+    return text.encode("utf-8")
+
+
+def _write_atomically(path: str, content: bytes):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as outfile:
+        outfile.write(content)
+    os.replace(temp_path, path)
+
+
+@dataclass
+class FileReport:
+    path: str
+    action: ActionType = ActionType.NONE
+    stripped: Counter[str] = field(default_factory=Counter)
+    # Whether the file was rewritten. False for unchanged files and in dry-run mode.
+    written: bool = False
+
+
+def _clean_file(full_path: str, strip_tests: tuple[str, ...], dry_run: bool) -> FileReport:  # noqa: FBT001 Boolean-typed positional argument in function definition
+    with open(full_path, "rb") as infile:
+        original = infile.read()
+
+    action = _clean_data(json.loads(original), _compile_rules(strip_tests))
+    report = FileReport(path=full_path, action=action.action, stripped=action.stripped)
+
+    if action.action == ActionType.NONE:
+        return report
+
+    if action.action == ActionType.UPDATE:
+        content = _serialize_like(action.content or {}, original)
+        if content != original and not dry_run:
+            _write_atomically(full_path, content)
+            report.written = True
+        return report
 
-    content["results"] = all_results
+    if action.action == ActionType.DELETE:
+        raise NotImplementedError
 
-    return Action(action=ActionType.UPDATE, content=content)
+    msg = f"Unsupported action {action}"
+    raise NotImplementedError(msg)
+
+
+def _print_report(reports: list[FileReport], num_files: int, *, dry_run: bool):
+    changed = [report for report in reports if report.action != ActionType.NONE]
+    totals: Counter[str] = Counter()
+    for report in sorted(changed, key=lambda report: report.path):
+        totals.update(report.stripped)
+        if dry_run:
+            details = ", ".join(f"{count} x '{pattern}'" for pattern, count in report.stripped.most_common())
+            print(f"{report.path}: would remove {details}")
+
+    verb = "Would update" if dry_run else "Updated"
+    num_updated = len(changed) if dry_run else sum(report.written for report in changed)
+    print(f"{verb} {num_updated} of {num_files} files, removing {totals.total()} results")
+    for pattern, count in totals.most_common():
+        print(f"  {count:>6}  {pattern}")
 
 
 def entrypoint():
-    parser = argparse.ArgumentParser()
+    parser = argparse.ArgumentParser(description="Removes unwanted results from result files.")
+    parser.add_argument(
+        "--verbose",
+        "-v",
+        help="Enables verbose logging information",
+        action="store_true",
+    )
     parser.add_argument(
         "results",
         nargs="+",
         help="Path to the root of the results to process.",
     )
+    parser.add_argument(
+        "--rules",
+        metavar="rules_file",
+        default=_DEFAULT_RULES_FILE,
+        help="Path to a JSON file containing the cleaning rules.",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of worker processes used to clean files. 0 uses one process per CPU.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        "-n",
+        action="store_true",
+        help="Report the changes that would be made without modifying any files.",
+    )
 
     args = parser.parse_args()
+
+    log_level = logging.DEBUG if args.verbose else logging.INFO
+    logging.basicConfig(level=log_level)
+
+    try:
+        rules = Rules.load(args.rules)
+    except (OSError, ValueError, re.error):
+        logger.exception("Failed to load rules from '%s'", args.rules)
+        return 1
+
     result_paths = [os.path.abspath(os.path.expanduser(p)) for p in args.results]
+
+    full_paths = []
     for results_dir in result_paths:
         if not os.path.isdir(results_dir):
             logger.error("Results directory '%s' does not exist", results_dir)
             return 1
+        full_paths.extend(
+            os.path.join(results_dir, result_file)
+            for result_file in glob.glob("**/*.json", root_dir=results_dir, recursive=True)
+        )
+    num_files = len(full_paths)
 
-        for result_file in glob.glob("**/*.json", root_dir=results_dir, recursive=True):
-            full_path = os.path.join(results_dir, result_file)
-            with open(full_path, "rb") as infile:
-                result = json.load(infile)
-
-            action = _clean_data(result)
-            if action.action == ActionType.NONE:
-                continue
-
-            if action.action == ActionType.UPDATE:
-                with open(full_path, "w", encoding="utf-8") as outfile:
-                    json.dump(action.content, outfile, indent=2)
-                continue
-
-            if action.action == ActionType.DELETE:
-                raise NotImplementedError
+    strip_tests = tuple(rules.strip_tests)
+    jobs = args.jobs or os.cpu_count() or 1
+    if jobs > 1 and len(full_paths) > _FILES_PER_TASK:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            reports = list(
+                executor.map(
+                    _clean_file,
+                    full_paths,
+                    [strip_tests] * len(full_paths),
+                    [args.dry_run] * len(full_paths),
+                    chunksize=_FILES_PER_TASK,
+                )
+            )
+    else:
+        reports = [_clean_file(full_path, strip_tests, args.dry_run) for full_path in full_paths]
 
-            msg = f"Unsupported action {action}"
-            raise NotImplementedError(msg)
+    _print_report(reports, num_files, dry_run=args.dry_run)
 
     return 0
 
@@ -2,38 +2,297 @@
 
 # ruff: noqa: T201 `print` found
 
+from __future__ import annotations
+
 import argparse
+import datetime
+import email.utils
+import functools
 import http.server
 import os
-import socketserver
+import re
+import socket
 import sys
+import urllib.parse
+from http import HTTPStatus
+from typing import IO, Any
+
+DEFAULT_BIND_ADDRESS = "127.0.0.1"
+DEFAULT_PORT = 8000
+
+# Precompressed variants of a file, in order of preference, as (filename suffix, content coding).
+_PRECOMPRESSED_VARIANTS = ((".br", "br"), (".gz", "gzip"))
+
+# Keep in sync with HASHED_FILENAME_DIGEST_LENGTH in xemu_perf_renderer/util/site_writer.py. It is duplicated so that the
+# server runs without the renderer package or its dependencies installed.
+_HASHED_FILENAME_DIGEST_LENGTH = 16
+
+# Artifacts whose names embed a digest of their content (e.g., "results.0123456789abcdef.json.gz") never change, so
+# they may be cached indefinitely. Any other file is cached but must be revalidated before each use.
+_CONTENT_HASHED_NAME_RE = re.compile(rf"\.[0-9a-f]{{{_HASHED_FILENAME_DIGEST_LENGTH}}}\.")
+_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+_REVALIDATE_CACHE_CONTROL = "no-cache"
+
+_BYTE_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+
+_COPY_CHUNK_SIZE = 64 * 1024
+
+
+def _accepted_encodings(header: str | None) -> set[str]:
+    """Returns the content codings that an Accept-Encoding header permits, excluding those with a quality of 0."""
+    accepted = set()
+    for element in (header or "").split(","):
+        coding, _, parameters = element.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+
+        quality = 1.0
+        for parameter in parameters.split(";"):
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding)
+    return accepted
+
+
+def _parse_byte_range(header: str, size: int) -> tuple[int, int] | None:
+    """Returns the inclusive (first, last) byte positions selected by a Range header for a file of the given size.
+
+    Returns None if the header should be ignored because it is malformed or requests multiple ranges, in which case the
+    whole file is served. The returned range is empty (first > last) if it cannot be satisfied.
+    """
+    match = _BYTE_RANGE_RE.fullmatch(header.strip())
+    if not match or not any(match.groups()):
+        return None
+
+    first, last = match.groups()
+    if not first:
+        # A suffix range selecting the last `last` bytes.
+        return max(size - int(last), 0), size - 1 if int(last) else -1
+
+    if last and int(last) < int(first):
+        return None
+    return int(first), min(int(last), size - 1) if last else size - 1
+
+
+def _parse_http_date(value: str) -> float | None:
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.UTC)
+    return date.timestamp()
+
+
+class PreviewRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """Serves a generated site as a static host would.
+
+    - Precompressed `.br` and `.gz` siblings of a file are served in its place if the client accepts their encoding, and
+      files that are only stored gzipped (e.g., "results.json.gz") are served with a gzip content coding.
+    - Responses carry an ETag and Last-Modified date, and conditional requests are answered with 304 Not Modified.
+    - Single byte ranges are supported.
+    - Content-hashed artifacts are marked as immutable and other files must be revalidated.
+    """
+
+    protocol_version = "HTTP/1.1"
 
-PORT = 8000
+    def __init__(self, *args: Any, **kwargs: Any):
+        # The number of bytes of the file returned by `send_head` to be sent, or None if the whole object is sent.
+        self._content_length: int | None = None
+        super().__init__(*args, **kwargs)
 
+    def _index_file(self, path: str) -> str | None:
+        for index in ("index.html", "index.htm"):
+            index_path = os.path.join(path, index)
+            if os.path.isfile(index_path):
+                return index_path
+        return None
+
+    def _select_representation(self, path: str) -> tuple[str, str, str | None]:
+        """Returns the file to serve for the given path, its content type, and its content coding."""
+        accepted = _accepted_encodings(self.headers.get("Accept-Encoding"))
+
+        def _accepts(coding: str) -> bool:
+            return coding in accepted or "*" in accepted
+
+        if path.endswith(".gz"):
+            if _accepts("gzip"):
+                return path, self.guess_type(path.removesuffix(".gz")), "gzip"
+            return path, self.guess_type(path), None
+
+        for suffix, coding in _PRECOMPRESSED_VARIANTS:
+            if _accepts(coding) and os.path.isfile(path + suffix):
+                return path + suffix, self.guess_type(path), coding
+        return path, self.guess_type(path), None
+
+    def _is_not_modified(self, etag: str, mtime: float) -> bool:
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or etag in tags
+
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            since = _parse_http_date(if_modified_since)
+            return since is not None and int(mtime) <= since
+        return False
+
+    def _range_applies(self, etag: str, mtime: float) -> bool:
+        """Returns True unless an If-Range precondition indicates that the client's copy of the file is stale."""
+        if_range = self.headers.get("If-Range")
+        if if_range is None:
+            return True
+
+        if_range = if_range.strip()
+        if if_range.startswith(('"', "W/")):
+            # Weak validators never match If-Range.
+            return if_range == etag
+        return _parse_http_date(if_range) == int(mtime)
+
+    def _send_validators(self, etag: str, mtime: float, request_path: str):
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.date_time_string(int(mtime)))
+        cache_control = (
+            _IMMUTABLE_CACHE_CONTROL
+            if _CONTENT_HASHED_NAME_RE.search(os.path.basename(request_path))
+            else _REVALIDATE_CACHE_CONTROL
+        )
+        self.send_header("Cache-Control", cache_control)
+        self.send_header("Vary", "Accept-Encoding")
+
+    def send_head(self) -> IO[bytes] | None:  # type: ignore[override]
+        self._content_length = None
 
-class GzipHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
-    def end_headers(self):
         path = self.translate_path(self.path)
-        if path and path.endswith(".gz"):
-            self.send_header("Content-Encoding", "gzip")
+        if os.path.isdir(path):
+            index_path = self._index_file(path)
+            # Redirects to add a trailing slash and directory listings are handled as usual.
+            if index_path is None or not urllib.parse.urlsplit(self.path).path.endswith("/"):
+                return super().send_head()
+            path = index_path
+        elif path.endswith("/"):
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        file_path, content_type, content_encoding = self._select_representation(path)
+        try:
+            infile = open(file_path, "rb")  # noqa: SIM115 Closed by the caller once the body has been sent
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        try:
+            stat = os.fstat(infile.fileno())
+            size = stat.st_size
+            etag = f'"{stat.st_mtime_ns:x}-{size:x}{f"-{content_encoding}" if content_encoding else ""}"'
+
+            if self._is_not_modified(etag, stat.st_mtime):
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self._send_validators(etag, stat.st_mtime, path)
+                self.end_headers()
+                infile.close()
+                return None
+
+            first, last = 0, size - 1
+            byte_range = None
+            range_header = self.headers.get("Range")
+            if range_header and self._range_applies(etag, stat.st_mtime):
+                byte_range = _parse_byte_range(range_header, size)
+
+            if byte_range is not None:
+                first, last = byte_range
+                if first > last or first >= size:
+                    self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    infile.close()
+                    return None
+                infile.seek(first)
+                self.send_response(HTTPStatus.PARTIAL_CONTENT)
+                self.send_header("Content-Range", f"bytes {first}-{last}/{size}")
+            else:
+                self.send_response(HTTPStatus.OK)
+
+            self._content_length = last - first + 1
+            self.send_header("Content-Type", content_type)
+            if content_encoding:
+                self.send_header("Content-Encoding", content_encoding)
+            self.send_header("Content-Length", str(self._content_length))
+            self.send_header("Accept-Ranges", "bytes")
+            self._send_validators(etag, stat.st_mtime, path)
+            self.end_headers()
+        except:
+            infile.close()
+            raise
+
+        return infile
+
+    def copyfile(self, source: Any, outputfile: Any):
+        if self._content_length is None:
+            super().copyfile(source, outputfile)
+            return
+
+        remaining = self._content_length
+        while remaining > 0:
+            chunk = source.read(min(_COPY_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            outputfile.write(chunk)
+            remaining -= len(chunk)
+
+
+class PreviewServer(http.server.ThreadingHTTPServer):
+    """Serves each connection on its own thread, listening on IPv4 or IPv6 as appropriate for the bind address."""
 
-        super().end_headers()
+    def __init__(self, server_address: tuple[str, int], handler_class: Any):
+        host, port = server_address
+        self.address_family = socket.getaddrinfo(host or None, port, type=socket.SOCK_STREAM, flags=socket.AI_PASSIVE)[
+            0
+        ][0]
+        super().__init__(server_address, handler_class)
 
 
 def entrypoint():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("path", help="Root path of the server", default="")
+    parser = argparse.ArgumentParser(description="Serves a generated site for local preview.")
+    parser.add_argument("path", nargs="?", default=".", help="Root path of the server")
+    parser.add_argument(
+        "--bind",
+        "-b",
+        default=DEFAULT_BIND_ADDRESS,
+        help="Address to listen on. Use 0.0.0.0 or :: to accept connections from other machines.",
+    )
+    parser.add_argument(
+        "--port",
+        "-p",
+        type=int,
+        default=DEFAULT_PORT,
+        help="Port to listen on. 0 selects an unused port.",
+    )
 
     args = parser.parse_args()
 
-    if args.path:
-        os.chdir(os.path.abspath(os.path.expanduser(args.path)))
+    root = os.path.abspath(os.path.expanduser(args.path))
+    if not os.path.isdir(root):
+        print(f"'{root}' is not a directory", file=sys.stderr)
+        return 1
 
-    socketserver.TCPServer.allow_reuse_address = True
+    handler = functools.partial(PreviewRequestHandler, directory=root)
 
     try:
-        with socketserver.TCPServer(("", PORT), GzipHTTPRequestHandler) as httpd:
-            print(f"Serving at http://localhost:{PORT}")
+        with PreviewServer((args.bind, args.port), handler) as httpd:
+            host, port = httpd.server_address[:2]
+            if args.bind in {"", "0.0.0.0", "::"}:  # noqa: S104 Possible binding to all interfaces
+                host = "localhost"
+            elif ":" in str(host):
+                host = f"[{host}]"
+            print(f"Serving {root} at http://{host}:{port}")
             print("Press Ctrl+C to stop the server.")
 
             httpd.serve_forever()
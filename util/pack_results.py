@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+# ruff: noqa: T201 `print` found
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+
+from xemu_perf_renderer.util.data import iter_results
+from xemu_perf_renderer.util.packed_results import write_pack
+
+logger = logging.getLogger(__name__)
+
+
+def entrypoint():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Packs result JSON files into a single memory mapped file that may be passed to xemu-perf-render and "
+            "analyze.py in place of the results directories."
+        )
+    )
+    parser.add_argument(
+        "--verbose",
+        "-v",
+        help="Enables verbose logging information",
+        action="store_true",
+    )
+    parser.add_argument(
+        "results",
+        nargs="+",
+        help="Path to the root of the results to pack.",
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        metavar="pack_file",
+        required=True,
+        help="Path at which the pack file should be written.",
+    )
+
+    args = parser.parse_args()
+
+    log_level = logging.DEBUG if args.verbose else logging.INFO
+    logging.basicConfig(level=log_level)
+
+    result_paths = [os.path.abspath(os.path.expanduser(p)) for p in args.results]
+    for results_dir in result_paths:
+        if not os.path.isdir(results_dir):
+            logger.error("Results directory '%s' does not exist", results_dir)
+            return 1
+
+    pack_file = os.path.abspath(os.path.expanduser(args.output))
+    os.makedirs(os.path.dirname(pack_file), exist_ok=True)
+    num_files, num_tests = write_pack(iter_results(result_paths), pack_file)
+    print(f"Packed {num_tests} results from {num_files} files into {pack_file} ({os.path.getsize(pack_file)} bytes)")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(entrypoint())